@@ -0,0 +1,42 @@
+import argparse
+import time
+
+import numpy as np
+
+from utils.scaleFactors import BinnedLookup, fromMapJson
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script measures the throughput of the scale factor lookup '
+                                 '(utils/scaleFactors.py) for random (pt, abseta) values')
+parser.add_argument('-m', '--map_file', default=None,
+                    help='JSON map produced by stitchEfficiencyMap.py (a synthetic table is used if not passed)')
+parser.add_argument('-n', '--n_muons', default=10000000, type=int, help='The number of muons per lookup')
+parser.add_argument('-r', '--repetitions', default=5, type=int, help='The number of timed lookups')
+parser.add_argument('--overflow', default='clamp', help='The overflow policy of the lookup')
+args = parser.parse_args()
+
+if args.map_file is not None:
+    lookup = fromMapJson(args.map_file, 'RATIO', args.overflow)
+else:
+    ptEdges = [2.0, 2.5, 2.75, 3.0, 3.25, 3.5, 3.75, 4.0, 4.5, 5.0, 6.0, 8.0, 10.0, 15.0, 20.0, 30.0, 40.0]
+    absetaEdges = [0.0, 0.9, 1.2, 2.1, 2.4]
+    shape = (len(absetaEdges) - 1, len(ptEdges) - 1)
+    rand = np.random.RandomState(42)
+    lookup = BinnedLookup([absetaEdges, ptEdges], rand.uniform(0.95, 1.05, shape), rand.uniform(0, 0.02, shape),
+                          rand.uniform(0, 0.02, shape), ['abseta', 'pt'], args.overflow)
+
+rand = np.random.RandomState(1)
+coords = [rand.uniform(edges[0], edges[-1], args.n_muons) for edges in lookup.edges]
+
+for [label, lookupFunc] in [['value and errors', lookup.evaluateWithErrors], ['value only', lookup.evaluate]]:
+    timings = []
+    for i in range(args.repetitions):
+        start = time.time()
+        lookupFunc(coords)
+        timings.append(time.time() - start)
+
+    best = min(timings)
+    print('Lookup of {} muons ({}): best {:.3f} s, mean {:.3f} s -> {:.1f} M muons / s'.format(
+        args.n_muons, label, best, sum(timings) / len(timings), args.n_muons / best / 1e6))
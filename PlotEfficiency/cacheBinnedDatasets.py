@@ -0,0 +1,50 @@
+import argparse
+
+from utils.efficiencyManifest import loadManifest, getEfficiencies
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script fills the per-bin pass and fail mass histograms of all '
+                                 'efficiencies in an efficiency manifest (written by the fit configuration) into a '
+                                 'disk cache, so that refits of the same selection do not have to scan the trees again')
+parser.add_argument('manifest', help='Path to the efficiency manifest JSON file')
+parser.add_argument('-c', '--cache_dir', default='BinnedDatasetCache',
+                    help='The directory in which the cached datasets are stored')
+parser.add_argument('-s', '--max_size', default=10.0, type=float,
+                    help='The maximum size of the cache in GB. The least recently used entries are removed if exceeded')
+parser.add_argument('-e', '--efficiency_regex', default='.*',
+                    help='Only process the efficiencies whose name matches this regex')
+parser.add_argument('-l', '--entry_lists', action='store_true', default=False,
+                    help='Only visit the entries of the (cached) denominator entry lists (see makeEntryLists.py)')
+parser.add_argument('--store_dir', default=None,
+                    help='The directory in which the entry lists are stored, if not next to the input files')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely)')
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import ROOT as r
+from utils.datasetCache import BinnedDatasetCache, getCacheKey, fillBinnedDatasets
+from utils.entryLists import getChainEntryList
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+
+cache = BinnedDatasetCache(args.cache_dir, int(args.max_size * 1024**3))
+
+fillFunc = None
+if args.entry_lists:
+    fillFunc = lambda eff, fn: fillBinnedDatasets(eff, fn, getChainEntryList(eff, args.store_dir))
+
+nHits = 0
+effs = getEfficiencies(loadManifest(args.manifest), args.efficiency_regex)
+for eff in effs:
+    hit = cache.get(getCacheKey(eff)) is not None
+    path = cache.getOrFill(eff, fillFunc)
+    if hit:
+        nHits += 1
+    if args.verbosity > 0:
+        print('{} {}: {}'.format('Found' if hit else 'Filled', eff.name, path))
+
+if args.verbosity > 0:
+    print('Processed {} efficiencies, {} were already cached'.format(len(effs), nHits))
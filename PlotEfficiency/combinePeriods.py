@@ -0,0 +1,62 @@
+import argparse
+
+import numpy as np
+
+from utils.resultSets import loadResultSet, AlignedResults, combineResults, recomputeRatios, writeResultSet
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script combines the efficiencies of several run periods (pkl files '
+                                 'of createPklFile.py from separate fits of every period) into the efficiencies of '
+                                 'the whole dataset without refitting. Every bin is combined as weighted mean, either '
+                                 'weighted by the luminosity of the periods or by their statistical power (inverse '
+                                 'squared fitted errors). If all periods use the same MC sample, its efficiencies '
+                                 'have to be taken from one input with --mc_from. The ratios are recomputed from the combined DATA and MC '
+                                 'efficiencies. The output is a pkl file in the same format as the inputs')
+parser.add_argument('inputFiles', nargs='+', help='The pkl files of all periods (the first one defines the binning)')
+parser.add_argument('-o', '--output', required=True, help='The output pkl file')
+parser.add_argument('-l', '--lumis', nargs='+', type=float, default=None,
+                    help='The luminosities of the periods (in the same order as the input files). If not given, the '
+                    'periods are weighted by their statistical power')
+parser.add_argument('--mc_from', default=None, type=int,
+                    help='Take the MC efficiencies from the input file with this index (starting at 0) instead of '
+                    'combining them, e.g. when all periods use the same MC sample (whose errors are fully correlated '
+                    'and would be underestimated by combining it with itself)')
+parser.add_argument('--tolerance', default=1e-6, type=float,
+                    help='Relative tolerance within which two bin edges are considered equal')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely)')
+args = parser.parse_args()
+
+if args.lumis is not None and len(args.lumis) != len(args.inputFiles):
+    parser.error('Need one luminosity per input file')
+if args.mc_from is not None and not 0 <= args.mc_from < len(args.inputFiles):
+    parser.error('--mc_from has to be the index of one of the {} input files'.format(len(args.inputFiles)))
+
+aligned = AlignedResults([loadResultSet(fn) for fn in args.inputFiles], args.inputFiles, args.tolerance)
+if args.verbosity > 0:
+    for problem in aligned.problems:
+        print('WARNING: {}'.format(problem))
+
+[eff, errLow, errHigh, combined] = combineResults(aligned, args.lumis, args.mc_from)
+[eff, errLow, errHigh] = recomputeRatios(aligned, eff, errLow, errHigh)
+writeResultSet(args.output, aligned, eff, errLow, errHigh)
+
+if args.verbosity > 0:
+    nPeriods = len(args.inputFiles)
+    print('Combined {} bins of {} periods ({}) into {}'.format(
+        len(aligned), nPeriods, 'weighted by luminosity' if args.lumis is not None else 'weighted by statistics',
+        args.output))
+    if args.mc_from is not None:
+        print('MC efficiencies taken from {}'.format(args.inputFiles[args.mc_from]))
+    # the mc bins taken from a single input are complete with that input
+    expected = np.array([1 if args.mc_from is not None and key[2] == 'mc' else nPeriods for key in aligned.keys])
+    nCombined = combined.sum(axis=0)
+    partial = np.nonzero((nCombined > 0) & (nCombined < expected))[0]
+    print('{} bins from all periods, {} from only some periods, {} without any value'.format(
+        int(np.sum(nCombined == expected)), len(partial), int(np.sum(nCombined == 0))))
+    for iBin in partial:
+        [ID, scenario, cat, lo, hi] = aligned.keys[iBin]
+        print('  {}/{}/{} [{}, {}]: only from {}'.format(
+            ID, scenario, cat, lo, hi, ', '.join(l for [l, c] in zip(args.inputFiles, combined[:, iBin]) if c)))
@@ -0,0 +1,120 @@
+import argparse
+import os
+import sys
+
+from utils.resultSets import (loadResultSet, AlignedResults, compareToReference, flagBins, writeComparisonReport,
+                              getFlaggedGroups)
+from utils.miscHelpers import condMkDir
+
+# colors and marker styles of the result sets in the overlay plots (reference first)
+COLORS = [1, 2, 4, 8, 6, 7, 9, 28, 46, 30]
+MARKERS = [20, 21, 22, 23, 33, 34, 29, 24, 25, 26]
+
+
+def makeOverlayPlot(aligned, group, bins, flagged, outfileBase, fileEndings):
+    """
+    Draw the graphs of all result sets for the bins of the passed group into one plot, with the flagged bins
+    highlighted, and save it in all fileEndings
+    """
+    graphs = createOverlayGraphs(aligned, bins)
+    lows = [aligned.keys[i][3] for i in bins]
+    highs = [aligned.keys[i][4] for i in bins]
+    values = aligned.eff[:, bins]
+    values = values[values == values]
+    [ylow, yhigh] = [min(values.min(), 1.0) - 0.05, max(values.max(), 1.0) + 0.05] if len(values) else [0, 1.1]
+
+    canvas = r.TCanvas(outfileBase, "c", 600, 500)
+    frame = canvas.DrawFrame(min(lows), ylow, max(highs), yhigh)
+    frame.SetXTitle(group[1])
+    frame.SetYTitle("#epsilon ({})".format(group[2]))
+    frame.SetTitle(" ".join(group))
+
+    box = r.TBox()
+    box.SetFillColorAlpha(r.kRed, 0.15)
+    for iBin in flagged:
+        box.DrawBox(aligned.keys[iBin][3], ylow, aligned.keys[iBin][4], yhigh)
+
+    legend = r.TLegend(0.15, 0.15, 0.45, 0.15 + 0.05 * len(graphs))
+    legend.SetFillColor(r.kWhite)
+    for [i, graph] in enumerate(graphs):
+        graph.SetMarkerColor(COLORS[i % len(COLORS)])
+        graph.SetLineColor(COLORS[i % len(COLORS)])
+        graph.SetMarkerStyle(MARKERS[i % len(MARKERS)])
+        graph.Draw("P SAME")
+        legend.AddEntry(graph, graph.GetName(), "PL")
+    legend.Draw()
+
+    for ending in fileEndings:
+        canvas.SaveAs(".".join([outfileBase, ending]))
+    canvas.Close()
+
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script compares the efficiencies of several result sets (pkl files '
+                                 'of createPklFile.py, e.g. of different eras, reprocessings or binnings) to the first '
+                                 'one (the reference). All bins of all IDs, scenarios and categories are aligned and '
+                                 'the differences, ratios and pulls are computed at once. Bins beyond the thresholds '
+                                 'are listed in a JSON report and overlay plots are made for them')
+parser.add_argument('inputFiles', nargs='+', help='The pkl files to compare (the first one is the reference)')
+parser.add_argument('-l', '--labels', nargs='+', default=None,
+                    help='The labels of the result sets (default: the filenames)')
+parser.add_argument('-o', '--output', default='comparison.json', help='The JSON report')
+parser.add_argument('--max_pull', default=3.0, type=float, help='Flag bins with a larger absolute pull (<= 0 disables)')
+parser.add_argument('--max_diff', default=0.0, type=float,
+                    help='Flag bins with a larger absolute difference of the efficiencies (<= 0 disables)')
+parser.add_argument('--max_ratio_dev', default=0.0, type=float,
+                    help='Flag bins whose ratio to the reference deviates more from 1 (<= 0 disables)')
+parser.add_argument('--tolerance', default=1e-6, type=float,
+                    help='Relative tolerance within which two bin edges are considered equal')
+parser.add_argument('-p', '--plot_dir', default=None,
+                    help='Make overlay plots of all IDs, scenarios and categories with flagged bins in this directory')
+parser.add_argument('-f', '--file_endings', nargs='+', default=['pdf'], help='The file formats of the overlay plots')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely, 2 lists all '
+                    'flagged bins)')
+args = parser.parse_args()
+
+if len(args.inputFiles) < 2:
+    parser.error('Need at least two result sets to compare')
+labels = args.labels if args.labels is not None else args.inputFiles
+if len(labels) != len(args.inputFiles):
+    parser.error('Need one label per input file')
+
+aligned = AlignedResults([loadResultSet(fn) for fn in args.inputFiles], labels, args.tolerance)
+if args.verbosity > 0:
+    for problem in aligned.problems:
+        print('WARNING: {}'.format(problem))
+
+thresholds = dict((name, val if val > 0 else None) for [name, val] in
+                  [['max_pull', args.max_pull], ['max_diff', args.max_diff], ['max_ratio_dev', args.max_ratio_dev]])
+comparison = compareToReference(aligned)
+flags = flagBins(comparison, thresholds['max_pull'], thresholds['max_diff'], thresholds['max_ratio_dev'])
+report = writeComparisonReport(args.output, aligned, comparison, flags, thresholds)
+
+if args.verbosity > 0:
+    print('Compared {} bins of {} result sets to {}:'.format(len(aligned), len(labels) - 1, labels[0]))
+    for label in labels[1:]:
+        summary = report['summary'][label]
+        print('  {}: {} bins compared, {} flagged, max |pull| = {}'.format(label, summary['compared'],
+                                                                        summary['flagged'], summary['max_abs_pull']))
+if args.verbosity > 1:
+    for entry in report['flagged']:
+        print('{set} {ID} {scenario} {category} {bin}: {efficiency} vs {reference} (pull {pull})'.format(**entry))
+
+if args.plot_dir is None or not flags.any():
+    sys.exit(0)
+
+# import only if needed, the comparison itself does not need ROOT
+import ROOT as r
+from utils.resultSets import createOverlayGraphs
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+r.gROOT.SetBatch()
+r.gStyle.SetOptStat(0)
+
+condMkDir(args.plot_dir)
+for [group, bins, flagged] in getFlaggedGroups(aligned, flags):
+    outfileBase = os.path.join(args.plot_dir, "_".join(g.replace("/", "_over_") for g in group))
+    makeOverlayPlot(aligned, group, bins, flagged, outfileBase, args.file_endings)
@@ -0,0 +1,130 @@
+import argparse
+import json
+
+import numpy as np
+
+from utils.miscHelpers import condMkDirFile
+from utils.resultSets import loadResultSet, AlignedResults, systematicBands, writeResultSet, SYST_METHODS
+
+# the graphs in the input files of makeEfficiencyPlots.py and the categories of the pkl files they correspond to
+PLOT_GRAPHS = [['DATA', 'data'], ['MC', 'mc'], ['RATIO', 'data/mc']]
+
+
+def getColumns(aligned):
+    """
+    Get the [low edge, high edge, column] of all bins of every ID, scenario and category of the aligned results
+    """
+    columns = {}
+    for [iBin, [ID, scenario, cat, lo, hi]] in enumerate(aligned.keys):
+        columns.setdefault((ID, scenario, cat), []).append([lo, hi, iBin])
+    return columns
+
+
+def createSystGraph(graph, bins, systLow, systHigh):
+    """
+    Create a TGraphAsymmErrors with the points of the passed graph and the systematic uncertainties of the bins (list
+    of [low edge, high edge, column]) they fall into as y errors. Points without systematic uncertainty are left out
+    """
+    import ROOT as r
+    systGraph = r.TGraphAsymmErrors()
+    systGraph.SetName(graph.GetName() + '_SYST')
+    iPoint = 0
+    for i in range(graph.GetN()):
+        [x, y] = [graph.GetX()[i], graph.GetY()[i]]
+        cols = [iBin for [lo, hi, iBin] in bins if lo <= x < hi]
+        if not cols or systLow[cols[0]] != systLow[cols[0]]:
+            continue
+        systGraph.SetPoint(iPoint, x, y)
+        systGraph.SetPointError(iPoint, graph.GetErrorXlow(i), graph.GetErrorXhigh(i), systLow[cols[0]],
+                                systHigh[cols[0]])
+        iPoint += 1
+    return systGraph
+
+
+def writePlotInputs(config, plotDir, aligned, systLow, systHigh):
+    """
+    Copy the input files of makeEfficiencyPlots.py of the nominal result (listed in the configuration of
+    createPklFile.py) into plotDir and add the systematic bands of all graphs (e.g. DATA_SYST), which are drawn by
+    makeEfficiencyPlots.py if present
+    """
+    import ROOT as r
+    columns = getColumns(aligned)
+    for [fn, ID, scenario, _] in config["input_files"]["files"]:
+        infile = r.TFile.Open(config["input_files"]["path"] + fn)
+        outname = '/'.join([plotDir, fn])
+        condMkDirFile(outname)
+        outfile = r.TFile.Open(outname, 'recreate')
+        for [name, cat] in PLOT_GRAPHS:
+            graph = infile.Get(name)
+            graph.Write(name)
+            createSystGraph(graph, columns.get((ID, scenario, cat), []), systLow, systHigh).Write()
+        if infile.Get("prescaled"):
+            infile.Get("prescaled").Write("prescaled")
+        outfile.Close()
+        infile.Close()
+
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script computes the systematic uncertainties of the efficiencies '
+                                 'from variations of the fits (e.g. alternative PDFs, mass windows or separation '
+                                 'cuts). The pkl files of createPklFile.py of the nominal result and of all variations '
+                                 'are aligned bin by bin and the systematic uncertainty of every bin is computed from '
+                                 'the deviations of the variations from the nominal result (all bins at once). The '
+                                 'output is the nominal pkl file with the additional values syst_low and syst_high in '
+                                 'every bin')
+parser.add_argument('nominal', help='The pkl file of the nominal result')
+parser.add_argument('variations', nargs='+', help='The pkl files of the variations')
+parser.add_argument('-o', '--output', required=True, help='The output pkl file')
+parser.add_argument('-m', '--method', choices=SYST_METHODS, default='envelope',
+                    help='How the deviations are combined: their envelope, their rms or their sum in quadrature')
+parser.add_argument('-l', '--labels', nargs='+', default=None,
+                    help='The labels of the variations used in the output to stdout (default: the filenames)')
+parser.add_argument('--tolerance', default=1e-6, type=float,
+                    help='Relative tolerance within which two bin edges are considered equal')
+parser.add_argument('-p', '--plot_config', default=None,
+                    help='The JSON file of createPklFile.py of the nominal result. If given, its input files are '
+                    'copied into --plot_dir together with the systematic bands, to be plotted with '
+                    'makeEfficiencyPlots.py')
+parser.add_argument('--plot_dir', default='Results/Systematics/',
+                    help='The directory into which the input files of makeEfficiencyPlots.py are written')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely)')
+args = parser.parse_args()
+
+labels = args.labels if args.labels is not None else args.variations
+if len(labels) != len(args.variations):
+    parser.error('Need one label per variation')
+
+if args.plot_config is not None:
+    with open(args.plot_config, 'r') as f:
+        config = json.loads(f.read())
+    # the pkl files only contain one set of bins per ID and scenario (files differing only in scenario_add overwrite
+    # each other's bins), so their bands cannot be told apart
+    groups = [(ID, scenario) for [_, ID, scenario, _] in config["input_files"]["files"]]
+    ambiguous = sorted(set(g for g in groups if groups.count(g) > 1))
+    if ambiguous:
+        parser.error('The plot configuration has several input files (differing only in scenario_add) for {}, which '
+                     'share one set of bins in the pkl files'.format(', '.join('/'.join(g) for g in ambiguous)))
+
+aligned = AlignedResults([loadResultSet(fn) for fn in [args.nominal] + args.variations], ['nominal'] + labels,
+                         args.tolerance)
+if args.verbosity > 0:
+    for problem in aligned.problems:
+        print('WARNING: {}'.format(problem))
+
+[systLow, systHigh, dominant] = systematicBands(aligned, args.method)
+writeResultSet(args.output, aligned, aligned.eff[0], aligned.errLow[0], aligned.errHigh[0],
+               {'syst_low': systLow, 'syst_high': systHigh})
+if args.plot_config is not None:
+    writePlotInputs(config, args.plot_dir, aligned, systLow, systHigh)
+
+if args.verbosity > 0:
+    print('Computed the systematic uncertainties ({}) of {} bins from {} variations, written to {}'.format(
+        args.method, int(np.sum(systLow == systLow)), len(args.variations), args.output))
+    print('largest deviation in ({} bins without any deviation):'.format(
+        int(np.sum((dominant < 0) & (systLow == systLow)))))
+    counts = np.bincount(dominant[dominant >= 0], minlength=len(labels))
+    for [label, count] in zip(labels, counts):
+        print('{:>8} bins  {}'.format(count, label))
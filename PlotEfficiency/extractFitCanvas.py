@@ -1,13 +1,16 @@
-import ROOT as r
 from utils.recurseTFile import recurseOnFile
 from utils.miscHelpers import *
+from utils.asyncWriter import AsyncOutputWriter
+from utils.canvasArchive import ArchiveWriter, ARCHIVE_FORMATS, getArchiveName
+from utils.memoryMonitor import MemoryMonitor, restartFrom
+from utils.fitResults import FitResultFilter, FIT_RESULT_NAME, LIMIT_TOLERANCE
+from utils.configPlan import ExecutionPlan, loadConfig, EXTRACT_FIT_CANVAS_SCHEMA
+from utils.sharding import parseShard, isInShard, getShardFilename, writeManifest, readManifest
 import re
+import sys
 import json
 import argparse
 
-# Keep ROOT from polluting stdout with its info messages
-r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001")
-
 def renameFit(plotName):
     """
     rename the fit to a name that is more convenient to the eye than the auto-generated name of the TnP-Fitter
@@ -31,14 +34,24 @@ class SaveCanvasIfMatch(object):
     2) In this way the value of the current path _inside_ the file can easily be stored and changed
     """
 
-    def __init__(self, regex, extension = 'pdf', path = './'):
+    def __init__(self, regex, extension = 'pdf', path = './', writer = None, fitFilter = None, shard = None,
+                 inputFile = ''):
         """
         Initialize: store (and compile) the regex and the file extension and set the current path to empty string
+        If an AsyncOutputWriter is passed, the files are handed over to it instead of writing them directly
+        If a FitResultFilter is passed, only canvases for which it selects the fit result in the same directory are saved
+        If a shard is passed, only the canvases belonging to it (by input file and path of the canvas) are saved
         """
         self.regex = re.compile(regex)
         self.ext = extension
         self.basePath = path
         self.currentPath = ''
+        self.currentDir = None
+        self.writer = writer
+        self.fitFilter = fitFilter
+        self.shard = shard
+        self.inputFile = inputFile
+        self.saved = []
 
 
     def __call__(self, obj):
@@ -52,10 +65,18 @@ class SaveCanvasIfMatch(object):
             if self.regex.search(obj.GetName()):
                 # The TDirectory::GetPath() method returns in the format /file/on/disk:/path/in/file
                 path = self.currentPath.split(':')[1]
+                if not isInShard(self.shard, self.inputFile, '/'.join([path, obj.GetName()])):
+                    return
+                if self.fitFilter is not None and not self.fitFilter(self.getFitResult()):
+                    return
                 path = '/'.join((path.split('/')[2:])) # remove the /tpTree/ directory from the path
                 filename = ''.join([self.basePath, '/', renameFit(path), '_', obj.GetName(), '.', self.ext])
-                condMkDirFile(filename)
-                obj.SaveAs(filename)
+                if self.writer is not None:
+                    self.writer.saveAs(obj, filename)
+                else:
+                    condMkDirFile(filename)
+                    obj.SaveAs(filename)
+                self.saved.append(filename)
 
 
     def setPath(self, directory):
@@ -63,6 +84,20 @@ class SaveCanvasIfMatch(object):
         Set the internal path variable to the path of the passed TDirectory
         """
         self.currentPath = directory.GetPath()
+        self.currentDir = directory
+
+
+    def getFitResult(self):
+        """
+        Get the RooFitResult stored in the current directory (None if there is none)
+        """
+        if self.currentDir is None:
+            return None
+        fitResult = self.currentDir.Get(FIT_RESULT_NAME)
+        if not fitResult or not fitResult.InheritsFrom('RooFitResult'):
+            return None
+        r.SetOwnership(fitResult, True)
+        return fitResult
 
 
 def getOutputDir(filename, defaultdir):
@@ -75,6 +110,24 @@ def getOutputDir(filename, defaultdir):
     outdir = filename.replace("TnP_MuonID_","").replace("_data_all__", "").replace("_signal_mc__","").replace(".root", "")
     return '/'.join([defaultdir, outdir])
 
+
+def getArchiveBase(filename, defaultdir, perFile, shard=None):
+    """
+    Get the name (without extension) of the archive into which the canvases of the passed input file are saved:
+    one archive per input file or one per output directory (i.e. per ID and scenario), tagged with the shard (if any)
+    """
+    base = '/'.join([defaultdir, filename.replace(".root", "")]) if perFile else getOutputDir(filename, defaultdir)
+    return getShardFilename(base, shard)
+
+
+def getArchivePrefix(filename, perFile):
+    """
+    Get the prefix of the member names of the canvases of the passed input file in its archive. With one archive per
+    ID (and scenario) the DATA and MC files end up in the same archive with identical canvas names, so the members are
+    put into a directory named after the input file
+    """
+    return '' if perFile else filename.replace(".root", "")
+
 """
 Setup arg parser
 """
@@ -86,10 +139,66 @@ parser.add_argument('-f', '--file_extensions',
                     nargs='*')
 parser.add_argument('-o', '--output_dir',
                     help='The base directory under which all plots will be saved')
+parser.add_argument('-j', '--writer_threads', default=4, type=int,
+                    help='Number of threads that move the plots from a local temporary directory to the output directory '
+                    'in the background (0 moves them synchronously in the main thread)')
+parser.add_argument('-a', '--archive', choices=ARCHIVE_FORMATS, default=None,
+                    help='Stream the canvases into archives of this format (with an index of the members) instead of '
+                    'writing one file per canvas (see readCanvasArchive.py)')
+parser.add_argument('--archive_per', choices=['file', 'id'], default='file',
+                    help='With --archive: write one archive per input file or one per ID (and scenario), in which the '
+                    'canvases of every input file are in a directory named after the file')
+parser.add_argument('-b', '--bad_fits', action='store_true', default=False,
+                    help='Only save the canvases of fits that did not converge, have a bad covariance matrix or an '
+                    'efficiency at its limit or outside --eff_range (judged from the fit result in the same directory)')
+parser.add_argument('--min_cov_qual', default=3, type=int,
+                    help='With --bad_fits: save the canvases of fits with a covariance matrix quality below this value')
+parser.add_argument('--limit_tolerance', default=LIMIT_TOLERANCE, type=float,
+                    help='With --bad_fits: the efficiency is considered to be at its limit if it is closer to it than '
+                    'this fraction of its range')
+parser.add_argument('--eff_range', nargs=2, type=float, default=None,
+                    help='With --bad_fits: save the canvases of fits with an efficiency outside this range')
+parser.add_argument('--spot_check', default=0, type=int,
+                    help='With --bad_fits: additionally save every n-th good fit as spot check (0 disables it)')
+parser.add_argument('-m', '--memory_ceiling', default=0, type=float,
+                    help='If the memory usage (in MB) exceeds this value after processing a file, ROOT is cleaned up '
+                    'and if that does not help the script is restarted to continue with the next file (0 disables it)')
+parser.add_argument('--shard', type=parseShard, default=None,
+                    help='Only save the part i/N (0 <= i < N) of all canvases, split by input file and path of the canvas '
+                    'inside it (the split is the same on every node, all formats of a canvas are saved by the same '
+                    'shard). The manifest of the shard is tagged with it (merge them with mergeShards.py)')
+parser.add_argument('--manifest', default=None,
+                    help='Write the list of all saved canvases into this JSON file')
+parser.add_argument('--start_item', default=0, type=int, help=argparse.SUPPRESS) # used for restarting
 parser.add_argument('-v', '--verbosity', default=1, help='In- or Decrease the amount of output to stdout (0 disables it completely, 1 prints some basic information)')
+parser.add_argument('--plan', action='store_true', default=False,
+                    help='Only validate the json file, check that all inputs exist and list the outputs (without ROOT)')
 
 [args, leftovers] = parser.parse_known_args()
 
+if args.plan:
+    plan = ExecutionPlan(args.jsonFile)
+    config = loadConfig(plan, args.jsonFile)
+    if config is not None and plan.validate(config, EXTRACT_FIT_CANVAS_SCHEMA):
+        for fn in config["input_files"]:
+            plan.addInput(config["input_path"] + fn)
+            for ext in (args.file_extensions or config["file_extensions"]):
+                if args.archive is not None:
+                    plan.addOutput('{} (all canvases matching \'{}\' as {})'.format(
+                        getArchiveName(getArchiveBase(fn, args.output_dir or config["output_dir"],
+                                                      args.archive_per == 'file', args.shard), args.archive),
+                        args.name_regex or config["name_regex"], ext))
+                    continue
+                plan.addOutput('{}/*.{} (all canvases matching \'{}\')'.format(
+                    getOutputDir(fn, args.output_dir or config["output_dir"]), ext, args.name_regex or config["name_regex"]))
+        if args.manifest is not None:
+            plan.addOutput(getShardFilename(args.manifest, args.shard))
+    sys.exit(plan.report())
+
+# import after the argparsing (and the plan) to not load ROOT unnecessarily
+import ROOT as r
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # Keep ROOT from polluting stdout with its info messages
+
 """
 Read JSON file
 """
@@ -119,15 +228,52 @@ if args.verbosity > 0:
     print('Saving to directory: {}'.format(outdir))
 
 
-for ext in extensions:
-    for fn in json["input_files"]:
-        canSaver = SaveCanvasIfMatch(nameRgx, ext, getOutputDir(fn, outdir))
-        filename = json["input_path"] + fn
-        if args.verbosity > 0:
-            print('Now processing {}'.format(filename))
+if args.archive is not None:
+    # continue the archives of the previous process when restarting
+    writer = ArchiveWriter(args.archive, append=args.start_item > 0)
+else:
+    writer = AsyncOutputWriter(args.writer_threads)
+memMonitor = MemoryMonitor(args.memory_ceiling)
+manifest = getShardFilename(args.manifest, args.shard) if args.manifest is not None else None
+# continue the manifest of the previous process when restarting
+savedCanvases = readManifest(manifest) if manifest is not None and args.start_item > 0 else []
+
+items = [(ext, fn) for ext in extensions for fn in json["input_files"]]
+for iItem in range(args.start_item, len(items)):
+    [ext, fn] = items[iItem]
+    fitFilter = FitResultFilter(args.min_cov_qual, args.eff_range, args.spot_check,
+                                args.limit_tolerance) if args.bad_fits else None
+    canSaver = SaveCanvasIfMatch(nameRgx, ext, getOutputDir(fn, outdir), writer, fitFilter, args.shard,
+                                 json["input_path"] + fn)
+    if args.archive is not None:
+        writer.setArchive(getArchiveBase(fn, outdir, args.archive_per == 'file', args.shard), getOutputDir(fn, outdir),
+                          getArchivePrefix(fn, args.archive_per == 'file'))
+    filename = json["input_path"] + fn
+    if args.verbosity > 0:
+        print('Now processing {}'.format(filename))
+
+    f = r.TFile.Open(filename)
+    if f != None:
+        recurseOnFile(f, canSaver, lambda o: canSaver.setPath(o))
+        f.Close()
+        savedCanvases += canSaver.saved
+        if fitFilter is not None and args.verbosity > 0:
+            print('Saved {} of {} fits'.format(fitFilter.nSelected, fitFilter.nFits))
+    # else:
+    #     print('Could not open file: {}. Not processing it'.format(filename)) # already printed by ROOT
 
-        f = r.TFile.Open(filename)
-        if f != None:
-            recurseOnFile(f, canSaver, lambda o: canSaver.setPath(o))
-        # else:
-        #     print('Could not open file: {}. Not processing it'.format(filename)) # already printed by ROOT
+    if not memMonitor.update() and iItem + 1 < len(items):
+        failed = writer.close()
+        if manifest is not None:
+            writeManifest(manifest, savedCanvases)
+        if failed:
+            sys.exit(1)
+        restartFrom(iItem + 1)
+
+failed = writer.close()
+if manifest is not None:
+    writeManifest(manifest, savedCanvases)
+if args.verbosity > 0:
+    print(memMonitor.report())
+if failed:
+    sys.exit(1)
@@ -1,7 +1,13 @@
-import ROOT as r
+import os
+import re
+import sys
 import json
 import argparse
 from utils.TGA_utils import *
+from utils.miscHelpers import isPrescaled
+from utils.asyncWriter import AsyncOutputWriter
+from utils.configPlan import ExecutionPlan, loadConfig, EXTRACT_PLOTS_SCHEMA
+from utils.sharding import parseShard, isInShard
 
 def getGraphFromFile(infile, ID, scenario, canvasName, graphName="hxy_fit_eff"):
     """
@@ -55,9 +61,158 @@ def getCanvasName(scenario, trigger, b="0"):
 
 
 
-def processJsonFile(filename):
+def getOutputName(inp):
+    """
+    Get the name of the output file for the passed input of a json file
+    """
+    return "".join([inp["output_path"], "MuonID_", inp["ID"], "_", inp["scenario"], inp["outfile_add"], ".root"])
+
+
+def writeGraphs(outfilename, dataGraph, mcGraph, ratioGraph, prescaled, writer):
+    """
+    Store the DATA, MC and RATIO graph into a new file that is first written locally and then handed over to the
+    passed AsyncOutputWriter. If prescaled is True, the results are flagged as obtained from prescaled inputs
+    """
+    tmpfilename = writer.getTmpName(outfilename)
+    outfile = r.TFile.Open(tmpfilename, "recreate")
+    outfile.cd()
+    dataGraph.SetName("DATA")
+    dataGraph.Write()
+    mcGraph.SetName("MC")
+    mcGraph.Write()
+    ratioGraph.SetName("RATIO")
+    ratioGraph.Write()
+
+    # flag the results obtained from prescaled (quick-look) fits, so that they can be labeled when plotting
+    if prescaled:
+        r.TNamed("prescaled", "obtained from prescaled (quick-look) inputs").Write()
+
+    outfile.Write()
+    outfile.Close()
+    writer.submit(tmpfilename, outfilename)
+
+
+def collectEfficiencyGraphs(basedir, graphRgx):
+    """
+    Collect all efficiency graphs from all canvases in the 'fit_eff_plots' subdirectories of all directories in
+    basedir, reading every canvas only once.
+    Returns a dict with (directory, canvas name, graph name) as key and a copy of the graph as value. If a canvas
+    contains more than one graph with the same name, the names get a '_<index>' appended.
+    """
+    graphs = {}
+    for dirKey in basedir.GetListOfKeys():
+        effDir = dirKey.ReadObj()
+        if not effDir.InheritsFrom("TDirectory"):
+            continue
+        plotDir = effDir.GetDirectory("fit_eff_plots")
+        if not plotDir:
+            continue
+
+        for canKey in plotDir.GetListOfKeys():
+            if canKey.GetClassName() != "TCanvas":
+                continue
+            canvas = canKey.ReadObj()
+            r.SetOwnership(canvas, True)
+            nameCounts = {}
+            for prim in canvas.GetListOfPrimitives():
+                if not prim.InheritsFrom("TGraphAsymmErrors") or not graphRgx.search(prim.GetName()):
+                    continue
+                count = nameCounts.get(prim.GetName(), 0)
+                nameCounts[prim.GetName()] = count + 1
+                graphName = prim.GetName() if count == 0 else "{}_{}".format(prim.GetName(), count)
+                graph = prim.Clone()
+                r.SetOwnership(graph, True)
+                graphs[(effDir.GetName(), canKey.GetName(), graphName)] = graph
+            del canvas
+
+    return graphs
+
+
+def getBulkFileTag(filename, tagRgx):
+    """
+    Get the tag of an input file of the --bulk mode that distinguishes it from other files with the same efficiencies
+    (e.g. the abseta_0p0_0p9_pt_2p0_6p0 trail of the split pt_abseta fits), or an empty string if it has none
+    """
+    match = tagRgx.search(os.path.basename(filename))
+    return match.group(1) if match is not None else ""
+
+
+def getBulkOutputName(outputPath, key, fileTag=""):
+    """
+    Get the output filename for the graph with the passed key (directory, canvas, graph) in the --bulk mode:
+    MuonID_<directory>[_<file tag>]__<canvas>_<graph>.root, where all characters of the canvas name other than letters,
+    digits and '.' are replaced by '_'. (This differs from the names of the json mode, which only contain the ID,
+    scenario and outfile_add.)
+    """
+    [dirName, canvasName, graphName] = key
+    parts = [outputPath, "MuonID_", dirName]
+    if fileTag:
+        parts += ["_", fileTag]
+    parts += ["__", re.sub(r"[^A-Za-z0-9.]+", "_", canvasName).strip("_"), "_", graphName, ".root"]
+    return "".join(parts)
+
+
+def processBulk(dataFilename, mcFilename, basedir, outputPath, graphRgx, tagRgx, writer, outputNames):
     """
-    Process one json input file
+    Extract all efficiency graphs from the passed DATA and MC file, reading each file only once.
+    The DATA and MC graphs are matched via their directory, canvas and graph name and for every matching pair a
+    file containing the DATA, MC and RATIO graph is written.
+    outputNames contains the output filenames (and their inputs) of all previously processed files. If any output
+    name is already taken, nothing is written and None is returned, otherwise the number of written files
+    """
+    print('Now processing {} and {}'.format(dataFilename, mcFilename))
+    allGraphs = []
+    for filename in [dataFilename, mcFilename]:
+        f = r.TFile.Open(filename)
+        if f == None: # message already printed by ROOT
+            return 0
+        directory = f.GetDirectory(basedir)
+        if not directory:
+            print('{} has no directory {}'.format(filename, basedir))
+            f.Close()
+            return 0
+        allGraphs.append(collectEfficiencyGraphs(directory, graphRgx))
+        f.Close()
+    [dataGraphs, mcGraphs] = allGraphs
+
+    for key in sorted(set(dataGraphs.keys()).symmetric_difference(mcGraphs.keys())):
+        print('{} only present in {}'.format('/'.join(key), dataFilename if key in dataGraphs else mcFilename))
+
+    keys = sorted(set(dataGraphs.keys()).intersection(mcGraphs.keys()))
+    fileTag = getBulkFileTag(dataFilename, tagRgx)
+    names = {}
+    collisions = []
+    for key in keys:
+        names[key] = getBulkOutputName(outputPath, key, fileTag)
+        if names[key] in outputNames:
+            collisions.append('{} ({}) would overwrite the output of {}'.format(
+                names[key], '/'.join(key), outputNames[names[key]]))
+        outputNames[names[key]] = '{} ({})'.format(dataFilename, '/'.join(key))
+    if collisions:
+        for collision in collisions:
+            print('ERROR: {}'.format(collision))
+        return None
+
+    prescaled = isPrescaled(dataFilename) or isPrescaled(mcFilename)
+    nWritten = 0
+    for key in keys:
+        [dataGraph, mcGraph] = [dataGraphs[key], mcGraphs[key]]
+        cleanUpGraph(dataGraph)
+        ratioGraph = divideGraphs(dataGraph, mcGraph)
+        if ratioGraph is None:
+            print('Could not compute the ratio for {}'.format('/'.join(key)))
+            continue
+        writeGraphs(names[key], dataGraph, mcGraph, ratioGraph, prescaled, writer)
+        nWritten += 1
+
+    print('Extracted {} DATA/MC pairs'.format(nWritten))
+    return nWritten
+
+
+def processJsonFile(filename, writer, shard=None):
+    """
+    Process one json input file (only the inputs belonging to the passed shard, if any)
+    The output files are first written locally and then handed over to the passed AsyncOutputWriter
     """
     print('Now processing JSON file: {}'.format(filename))
 
@@ -69,6 +224,8 @@ def processJsonFile(filename):
         """
         for inp in jsonInput["inputs"]:
             # print(inp)
+            if not isInShard(shard, inp["data_file"], getOutputName(inp)):
+                continue
             dataFile = r.TFile.Open(inp["data_file"])
             dataDir = dataFile.GetDirectory(inp["basedir"])
             mcFile = r.TFile.Open(inp["mc_file"])
@@ -83,18 +240,8 @@ def processJsonFile(filename):
 
             ratioGraph = divideGraphs(dataGraph, mcGraph)
 
-            outfilename = "".join([inp["output_path"], "MuonID_", inp["ID"], "_", inp["scenario"], inp["outfile_add"], ".root"])
-            outfile = r.TFile.Open(outfilename, "recreate")
-            outfile.cd()
-            dataGraph.SetName("DATA")
-            dataGraph.Write()
-            mcGraph.SetName("MC")
-            mcGraph.Write()
-            ratioGraph.SetName("RATIO")
-            ratioGraph.Write()
-
-            outfile.Write()
-            outfile.Close()
+            writeGraphs(getOutputName(inp), dataGraph, mcGraph, ratioGraph,
+                        isPrescaled(inp["data_file"]) or isPrescaled(inp["mc_file"]), writer)
 
 
 
@@ -103,15 +250,65 @@ Arg parsing and json read-in
 """
 parser = argparse.ArgumentParser(description="This script takes a JSON file as input and extracts plots from TnP r files. It produces an output ROOT file containing a DATA an MC as well as a RATIO TGraphAsymmErrors that can be read and processed by the makePklFile.py script as well as the plotting scripts")
 parser.add_argument("jsonFiles", nargs='*', help="Path(s) to the JSON file(s)")
+parser.add_argument("-b", "--bulk", nargs=2, action="append", metavar=("DATA_FILE", "MC_FILE"), default=[],
+                    help="Extract all efficiency graphs of all fit_eff_plots canvases from the passed DATA and MC file "
+                    "(reading each file only once) instead of using a JSON file. Can be passed more than once")
+parser.add_argument("-o", "--output_path", default="Results/", help="The output path for the --bulk mode")
+parser.add_argument("--basedir", default="tpTree", help="The base directory in the input files for the --bulk mode")
+parser.add_argument("--graph_regex", default="^hxy_fit_eff",
+                    help="The regex the names of the graphs have to match in the --bulk mode")
+parser.add_argument("--tag_regex", default=r"(abseta_[0-9]+p[0-9]+_[0-9]+p[0-9]+_pt_(?:all|[0-9]+p[0-9]+_[0-9]+p[0-9]+))",
+                    help="Regex whose first group is taken from the DATA filename in the --bulk mode and added to the "
+                    "output names (by default the abseta and pt trail of the split pt_abseta fits)")
+parser.add_argument("-j", "--writer_threads", default=4, type=int,
+                    help="Number of threads that move the output files from a local temporary directory to the output "
+                    "directory in the background (0 moves them synchronously in the main thread)")
+parser.add_argument("--shard", type=parseShard, default=None,
+                    help="Only process the part i/N (0 <= i < N) of all inputs (the split is the same on every node)")
+parser.add_argument("--plan", action="store_true", default=False,
+                    help="Only validate the json files, check that all inputs exist and list the outputs (without ROOT)")
 args = parser.parse_args()
 
+if args.plan:
+    plan = ExecutionPlan("extractPlots.py " + " ".join(args.jsonFiles))
+    for jsonFile in args.jsonFiles:
+        config = loadConfig(plan, jsonFile)
+        if config is not None and plan.validate(config, EXTRACT_PLOTS_SCHEMA):
+            for inp in config["inputs"]:
+                if not isInShard(args.shard, inp["data_file"], getOutputName(inp)):
+                    continue
+                plan.addInput(inp["data_file"])
+                plan.addInput(inp["mc_file"])
+                plan.addOutput(getOutputName(inp))
+    for [dataFilename, mcFilename] in args.bulk:
+        if not isInShard(args.shard, dataFilename, mcFilename):
+            continue
+        plan.addInput(dataFilename)
+        plan.addInput(mcFilename)
+        plan.addOutput("{}MuonID_*__*.root (one per efficiency graph found in both files)".format(args.output_path))
+    sys.exit(plan.report())
+
+# import after the argparsing (and the plan) to not load ROOT unnecessarily
+import ROOT as r
+
 
 
 """
 Process all the json files that have been passed
 """
-if len(args.jsonFiles) != 0:
+if len(args.jsonFiles) != 0 or len(args.bulk) != 0:
+    writer = AsyncOutputWriter(args.writer_threads)
     for jsonFile in args.jsonFiles:
-        processJsonFile(jsonFile)
+        processJsonFile(jsonFile, writer, args.shard)
+    outputNames = {}
+    nameCollisions = False
+    for [dataFilename, mcFilename] in args.bulk:
+        if not isInShard(args.shard, dataFilename, mcFilename):
+            continue
+        nameCollisions |= processBulk(dataFilename, mcFilename, args.basedir, args.output_path,
+                                      re.compile(args.graph_regex), re.compile(args.tag_regex), writer,
+                                      outputNames) is None
+    if writer.close() or nameCollisions:
+        sys.exit(1)
 else:
-    print('Need at least on json file to process')
+    print('Need at least on json file (or --bulk inputs) to process')
@@ -0,0 +1,51 @@
+import argparse
+import glob
+
+from utils.sharding import parseShard, isInShard, getShardFilename
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script collects the fit quality (status, covQual, edm, minNll, ...), '
+                                 'the efficiency and all final parameters of every fit in the output files of the '
+                                 'TagProbeFitTreeAnalyzer into one table (.npz or SQLite). Every file is traversed only '
+                                 'once and only the RooFitResults are read')
+parser.add_argument('inputFiles', nargs='+', help='The output files of the TagProbeFitTreeAnalyzer (globs are expanded)')
+parser.add_argument('-o', '--output', default='TnP_fitResults.db',
+                    help='The output table. .npz files are written with numpy, everything else as SQLite database')
+parser.add_argument('--min_cov_qual', default=3, type=int,
+                    help='Fits with a covariance matrix quality below this value are reported as problematic')
+parser.add_argument('--shard', type=parseShard, default=None,
+                    help='Only harvest the part i/N (0 <= i < N) of the input files (the split is the same on every '
+                    'node). The output is tagged with the shard, merge the outputs with mergeShards.py')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely, 2 lists all '
+                    'problematic fits)')
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import ROOT as r
+from utils.fitResults import FitResultTable
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+
+output = getShardFilename(args.output, args.shard)
+table = FitResultTable()
+for pattern in args.inputFiles:
+    for filename in sorted(glob.glob(pattern)) or [pattern]:
+        if not isInShard(args.shard, filename):
+            continue
+        nFits = table.harvestFile(filename)
+        if args.verbosity > 0:
+            print('{}: {} fit results'.format(filename, nFits))
+
+table.write(output)
+
+flagged = table.getFlagged(args.min_cov_qual)
+if args.verbosity > 0:
+    print('Wrote {} fit results to {}, {} of them are problematic'.format(len(table), output, len(flagged)))
+if args.verbosity > 1:
+    for i in flagged:
+        print('{} {}/{}: status {}, covQual {}, efficiency {:.4f} (at limit: {})'.format(
+            table.fits['inputFile'][i], table.fits['effName'][i], table.fits['bin'][i], table.fits['status'][i],
+            table.fits['covQual'][i], table.fits['eff'][i], bool(table.fits['effAtLimit'][i])))
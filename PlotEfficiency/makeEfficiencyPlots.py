@@ -1,15 +1,43 @@
 import argparse
 import json
+import sys
 from copy import deepcopy
 from utils.structFromDict import *
+from utils.asyncWriter import AsyncOutputWriter
+from utils.memoryMonitor import MemoryMonitor, restartFrom
+from utils.configPlan import ExecutionPlan, loadConfig, MAKE_PLOTS_SCHEMA
+from utils.sharding import parseShard, isInShard
 
 """
 Arg parsing
 """
 parser = argparse.ArgumentParser(description="This script can be used to produce plots from the root files produced with the extractPlots.py script")
 parser.add_argument("jsonFile", help="path to the json file containing the settings")
+parser.add_argument("-j", "--writer_threads", default=4, type=int,
+                    help="Number of threads that move the plots from a local temporary directory to the output directory "
+                    "in the background (0 moves them synchronously in the main thread)")
+parser.add_argument("-m", "--memory_ceiling", default=0, type=float,
+                    help="If the memory usage (in MB) exceeds this value after producing a plot, ROOT is cleaned up and "
+                    "if that does not help the script is restarted to continue with the next plot (0 disables it)")
+parser.add_argument("--shard", type=parseShard, default=None,
+                    help="Only make the part i/N (0 <= i < N) of all plots (the split is the same on every node)")
+parser.add_argument("--start_item", default=0, type=int, help=argparse.SUPPRESS) # used for restarting
+parser.add_argument("--plan", action="store_true", default=False,
+                    help="Only validate the json file, check that all inputs exist and list the outputs (without ROOT)")
 args = parser.parse_args()
 
+if args.plan:
+    plan = ExecutionPlan(args.jsonFile)
+    config = loadConfig(plan, args.jsonFile)
+    if config is not None and plan.validate(config, MAKE_PLOTS_SCHEMA):
+        for finfo in config["input_files"]:
+            if not isInShard(args.shard, config["input_path"] + finfo[0], finfo[1]):
+                continue
+            plan.addInput("".join([config["input_path"], finfo[0]]))
+            for ending in config["file_endings"]:
+                plan.addOutput(".".join(["".join([config["output_path"], finfo[0].replace(".root", "")]), ending]))
+    sys.exit(plan.report())
+
 # import ROOT after doing the argparsing, to not mess it up
 import ROOT as r
 
@@ -59,7 +87,18 @@ def createPad(name, low, high):
     return pad
 
 
-def drawRatioPad(canvas, plotSettings, ratioGraph, binning, axislabel):
+def drawSystBand(graph, color):
+    """
+    Draw a graph with systematic uncertainties as filled band (if it is not None)
+    """
+    if graph is None:
+        return
+    graph.SetFillColorAlpha(color, 0.35)
+    graph.SetLineColor(color)
+    graph.Draw("2 SAME")
+
+
+def drawRatioPad(canvas, plotSettings, ratioGraph, binning, axislabel, ratioSyst=None):
     """
     Draw the lower part of the whole figure, containing the ratio graph onto the passed canvas
     """
@@ -78,6 +117,7 @@ def drawRatioPad(canvas, plotSettings, ratioGraph, binning, axislabel):
 
     drawGrid(pad, binning, plotSettings.rlow, plotSettings.rhigh)
 
+    drawSystBand(ratioSyst, r.kBlue)
     ratioGraph.Draw("P SAME")
     ratioGraph.SetMarkerColor(r.kBlue)
     ratioGraph.SetLineColor(r.kBlue)
@@ -85,10 +125,13 @@ def drawRatioPad(canvas, plotSettings, ratioGraph, binning, axislabel):
 
 
 def makePlot(dataGraph, mcGraph, ratioGraph, plotSet, title, xAxis, padText, binning, outfile_base,
-             fileEndings):
+             fileEndings, prescaled=False, writer=None, systGraphs=None):
     """
     Create and save the plot into each format that is demanded by the fileEndings parameter.
     The name of the output file(s) is simply the outfile_base + a file ending.
+    If prescaled is True, the plot is labeled as being obtained from prescaled (quick-look) inputs.
+    If an AsyncOutputWriter is passed, the files are handed over to it instead of writing them directly.
+    If systGraphs ([data, mc, ratio], entries can be None) are passed, they are drawn as systematic bands.
     """
     canvas = r.TCanvas(outfile_base, "c", 500, 500) # using outfile_base here to avoid runtime-warnings
     effPad = createPad("pad1", 0.3, 1)
@@ -108,9 +151,16 @@ def makePlot(dataGraph, mcGraph, ratioGraph, plotSet, title, xAxis, padText, bin
     latex.SetTextSize(0.05)
     latex.DrawLatex(0.12, 0.92, "CMS preliminary             Run 2016")
     latex.DrawLatex(0.8, 0.92, "#sqrt{s} = 13 TeV")
+    if prescaled:
+        latex.SetTextColor(r.kRed)
+        latex.DrawLatex(0.15, 0.15, "QUICK LOOK (prescaled)")
 
     drawGrid(effPad, binning, plotSet.elow, plotSet.ehigh)
 
+    [dataSyst, mcSyst, ratioSyst] = systGraphs if systGraphs is not None else [None, None, None]
+    drawSystBand(dataSyst, r.kBlack)
+    drawSystBand(mcSyst, r.kRed)
+
     dataGraph.Draw("P SAME")
     dataGraph.SetMarkerStyle(20)
     legend.AddEntry(dataGraph, "Data", "PL")
@@ -120,6 +170,8 @@ def makePlot(dataGraph, mcGraph, ratioGraph, plotSet, title, xAxis, padText, bin
     mcGraph.SetLineColor(r.kRed)
     mcGraph.SetMarkerStyle(22)
     legend.AddEntry(mcGraph, "MC", "PL")
+    if dataSyst is not None:
+        legend.AddEntry(dataSyst, "Data syst.", "F")
     legend.Draw()
 
     text = r.TPaveText(plotSet.tleft, plotSet.tlow, plotSet.tright, plotSet.tup, "NDC")
@@ -128,11 +180,17 @@ def makePlot(dataGraph, mcGraph, ratioGraph, plotSet, title, xAxis, padText, bin
     text.AddText(title)
     text.Draw()
 
-    drawRatioPad(canvas, plotSet, ratioGraph, binning, xAxis)
+    drawRatioPad(canvas, plotSet, ratioGraph, binning, xAxis, ratioSyst)
 
     for ending in fileEndings:
         filename = ".".join([outfile_base, ending])
-        canvas.SaveAs(filename)
+        if writer is not None:
+            writer.saveAs(canvas, filename)
+        else:
+            canvas.SaveAs(filename)
+
+    # the pads and frames are owned by the canvas and are deleted with it, closing also removes it from gROOT
+    canvas.Close()
 
 
 """
@@ -155,8 +213,14 @@ with open(args.jsonFile, 'r') as f:
 
 
 plotDefaults = StructFromDict(**json["plotting_defaults"])
-
-for finfo in json["input_files"]:
+writer = AsyncOutputWriter(args.writer_threads)
+memMonitor = MemoryMonitor(args.memory_ceiling)
+
+inputFiles = json["input_files"]
+for iFile in range(args.start_item, len(inputFiles)):
+    finfo = inputFiles[iFile]
+    if not isInShard(args.shard, json["input_path"] + finfo[0], finfo[1]):
+        continue
     # json is structured as follows: [0] - filename (relative to input_path), [1] - title, [2] - x-axis label
     # [3] - fixed paramters to be put on plot, [4] - dict containing values to be changed compared to default for plotting
     # [5] - binning in x-axis
@@ -167,5 +231,22 @@ for finfo in json["input_files"]:
     plotSet.setValues(**finfo[4])
 
     f = r.TFile.Open(filename)
-    makePlot(f.Get("DATA"), f.Get("MC"), f.Get("RATIO"), plotSet, finfo[1], finfo[2], finfo[3], finfo[5],
-             outfilebase, json["file_endings"])
+    graphs = [f.Get("DATA"), f.Get("MC"), f.Get("RATIO")]
+    # systematic bands are only present in the files written by computeSystematics.py
+    systGraphs = [f.Get(name + "_SYST") or None for name in ["DATA", "MC", "RATIO"]]
+    for g in graphs + [g for g in systGraphs if g is not None]:
+        r.SetOwnership(g, True) # graphs are not attached to the file, python has to delete them
+    makePlot(graphs[0], graphs[1], graphs[2], plotSet, finfo[1], finfo[2], finfo[3], finfo[5],
+             outfilebase, json["file_endings"], bool(f.Get("prescaled")), writer, systGraphs)
+    del graphs, systGraphs
+    f.Close()
+
+    if not memMonitor.update() and iFile + 1 < len(inputFiles):
+        if writer.close():
+            sys.exit(1)
+        restartFrom(iFile + 1)
+
+failed = writer.close()
+print(memMonitor.report())
+if failed:
+    sys.exit(1)
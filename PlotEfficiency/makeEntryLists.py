@@ -0,0 +1,38 @@
+import argparse
+
+from utils.efficiencyManifest import loadManifest, getEfficiencies
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script computes the TEntryList of every distinct denominator '
+                                 'selection in an efficiency manifest and stores it next to the input files, so that '
+                                 'all efficiencies sharing a denominator only have to visit the selected entries')
+parser.add_argument('manifest', help='Path to the efficiency manifest JSON file')
+parser.add_argument('-e', '--efficiency_regex', default='.*',
+                    help='Only process the efficiencies whose name matches this regex')
+parser.add_argument('--store_dir', default=None,
+                    help='Store the entry lists in this directory instead of next to the input files')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely)')
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import ROOT as r
+from utils.entryLists import getChainEntryList, groupByDenominator
+from utils.miscHelpers import condMkDir
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+
+if args.store_dir is not None:
+    condMkDir(args.store_dir)
+
+effs = getEfficiencies(loadManifest(args.manifest), args.efficiency_regex)
+groups = groupByDenominator(effs)
+if args.verbosity > 0:
+    print('Found {} distinct denominators for {} efficiencies'.format(len(groups), len(effs)))
+
+for group in groups:
+    elist = getChainEntryList(group[0], args.store_dir)
+    if args.verbosity > 0:
+        print('{} selected entries shared by: {}'.format(elist.GetN(), ', '.join(e.name for e in group)))
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+from array import array
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script produces a deterministic subsample of the passed input trees '
+                                 'for quick-look fits. The subsample is stratified in bins of the passed variables, so '
+                                 'that sparse bins keep at least a minimum number of entries. Every kept entry gets a '
+                                 'weight (the inverse of the fraction with which it was kept, normalized to a mean of '
+                                 '1 over all kept entries so that the fitted errors match the size of the subsample, '
+                                 'times its input weight) that is used in the quick-look fits. The output files get '
+                                 'the tag \'_quickLook\' appended to their name (as expected by the fit configuration '
+                                 'with quickLook = True)')
+parser.add_argument('inputFiles', nargs='+', help='The input files containing the trees')
+parser.add_argument('-t', '--tree', default='tpTree/fitter_tree', help='The path of the tree inside the files')
+parser.add_argument('-f', '--fraction', default=0.05, type=float, help='The fraction of entries that is kept')
+parser.add_argument('-m', '--min_entries', default=2000, type=int,
+                    help='The minimum number of entries that is kept in every bin (if available)')
+parser.add_argument('-b', '--binning', nargs='*',
+                    default=['pt:2.0,2.5,2.75,3.0,3.25,3.5,3.75,4.0,4.5,5.0,6.0,8.0,10.0,15.0,20.0,30.0,40.0',
+                             'abseta:0.0,0.9,1.2,2.1,2.4'],
+                    help='The binning in which the subsample is stratified in the format var:edge1,edge2,...')
+parser.add_argument('-w', '--weight_branch', default='quickLookWeight',
+                    help='The name of the branch in which the weight of every kept entry is stored')
+parser.add_argument('--input_weight', default='weight',
+                    help='The weight branch of the input tree (if present), which is multiplied into the weights')
+parser.add_argument('-s', '--seed', default=0, type=int, help='Choosing a different seed gives a different subsample')
+parser.add_argument('-o', '--output_dir', default=None,
+                    help='The directory in which the output files are stored (default is next to the input files)')
+parser.add_argument('-c', '--chunk_size', default=1000000, type=int, help='The number of entries read at once')
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import numpy as np
+import ROOT as r
+from utils.treeChunks import iterateChunks, iterateChunksMulti, fillFromArray, enterFromArray
+from utils.prescale import getStratumIndices, getStratumFractions, selectEntries, normalizeWeights
+from utils.miscHelpers import condMkDir, QUICKLOOK_TAG
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+
+
+def parseBinning(binStrings):
+    """
+    Parse the binning from the command line into a list of variables and a list of numpy arrays of edges
+    """
+    variables = []
+    edges = []
+    for b in binStrings:
+        [var, edgeStr] = b.split(':')
+        variables.append(var)
+        edges.append(np.array([float(e) for e in edgeStr.split(',')]))
+    return [variables, edges]
+
+
+def iterateStrata(tree, variables, edges):
+    """
+    Iterate over the tree in chunks and yield the entry numbers and stratum indices of every chunk
+    """
+    first = 0
+    for values in iterateChunksMulti(tree, variables, args.chunk_size):
+        entries = np.arange(first, first + len(values[0]))
+        first += len(values[0])
+        yield [entries, getStratumIndices(values, edges)]
+
+
+def getOutputName(filename):
+    """
+    Get the name of the output file for the passed input file
+    """
+    outname = os.path.basename(filename).replace('.root', QUICKLOOK_TAG + '.root')
+    outdir = args.output_dir if args.output_dir is not None else os.path.dirname(filename)
+    return os.path.join(outdir, outname)
+
+
+[variables, edges] = parseBinning(args.binning)
+nStrata = int(np.prod([len(e) - 1 for e in edges]))
+if args.output_dir is not None:
+    condMkDir(args.output_dir)
+
+for filename in args.inputFiles:
+    infile = r.TFile.Open(filename)
+    tree = infile.Get(args.tree)
+
+    # first pass: count the entries in every stratum
+    counts = np.zeros(nStrata)
+    for [_, strata] in iterateStrata(tree, variables, edges):
+        counts += np.bincount(strata[strata >= 0], minlength=nStrata)
+    fractions = getStratumFractions(counts, args.fraction, args.min_entries)
+
+    # second pass: select the entries (and compute their weights) and copy them
+    hasInputWeight = bool(tree.GetBranch(args.input_weight))
+    inputWeights = iterateChunks(tree, args.input_weight, args.chunk_size) if hasInputWeight else None
+    elist = r.TEntryList('quickLook', 'quickLook', tree)
+    [prescaleWeights, keptInputWeights] = [[np.zeros(0)], [np.zeros(0)]] # stays valid for an empty tree
+    for [entries, strata] in iterateStrata(tree, variables, edges):
+        [kept, keptWeights] = selectEntries(entries, strata, fractions, args.fraction, args.seed)
+        prescaleWeights.append(keptWeights)
+        if hasInputWeight:
+            keptInputWeights.append(next(inputWeights)[kept - entries[0]])
+        enterFromArray(elist, kept)
+    tree.SetEntryList(elist)
+    weights = normalizeWeights(np.concatenate(prescaleWeights))
+    if hasInputWeight:
+        weights *= np.concatenate(keptInputWeights)
+
+    outname = getOutputName(filename)
+    [treeDir, treeName] = os.path.split(args.tree)
+    outfile = r.TFile.Open(outname, 'recreate')
+    outdir = outfile.mkdir(treeDir) if treeDir else outfile
+    outdir.cd()
+    quickTree = tree.CopyTree('')
+    weightBuf = array('f', [0])
+    weightBranch = quickTree.Branch(args.weight_branch, weightBuf, args.weight_branch + '/F')
+    fillFromArray(weightBranch, weightBuf, weights) # the copied entries are in the order of the entry list
+    quickTree.Write()
+    info = {"input": filename, "fraction": args.fraction, "min_entries": args.min_entries, "seed": args.seed,
+            "binning": args.binning, "selected": elist.GetN(), "total": tree.GetEntries(),
+            "weight_branch": args.weight_branch, "input_weight": args.input_weight if hasInputWeight else ""}
+    r.TNamed('quickLook_info', json.dumps(info, sort_keys=True)).Write()
+    outfile.Close()
+    infile.Close()
+
+    print('Kept {} of {} entries of {} in {}'.format(info["selected"], info["total"], filename, outname))
@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+from utils.sharding import mergeShards, MERGERS
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script merges the partial outputs of the shards of a run with '
+                                 '--shard i/N (e.g. results.shard0of4.pkl, ..., results.shard3of4.pkl) into the output '
+                                 'that a single run would have produced (results.pkl). It fails if not all shards are '
+                                 'present. Supported outputs: {}'.format(', '.join(sorted(MERGERS))))
+parser.add_argument('outputs', nargs='+', help='The final output file(s), i.e. the filenames without the shard tag')
+parser.add_argument('--clean', action='store_true', default=False,
+                    help='Remove the partial outputs of the shards after merging them')
+args = parser.parse_args()
+
+status = 0
+for output in args.outputs:
+    try:
+        shardFiles = mergeShards(output)
+    except (IOError, ValueError) as err:
+        print('Could not merge {}: {}'.format(output, err))
+        status = 1
+        continue
+
+    print('Merged {} shards into {}'.format(len(shardFiles), output))
+    if args.clean:
+        for fn in shardFiles:
+            os.remove(fn)
+
+sys.exit(status)
@@ -4,88 +4,105 @@
 # TODO: this works quite nicely for the vtx and eta scenario already, however the pt_abseta scenario is
 # currently a bit of a mess at the moment.
 
+import argparse
 import os
-import subprocess
 import glob
 import re
 
-def saveCanvasOfFile(_file, _regex="fit_canvas", _extension="pdf"):
+from utils.sharding import parseShard, isInShard
+
+
+def loadSaveCanvas():
+    """
+    Load the saveCanvas functionality as a shared library into the current process (compiled via ACLiC, which only
+    recompiles if saveCanvas.C has changed since the last compilation)
+    """
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "saveCanvas.C")
+    r.gSystem.AddIncludePath("-DSAVECANVAS_LIB")
+    if r.gROOT.LoadMacro(source + "+") != 0:
+        raise RuntimeError("Could not compile/load {}".format(source))
+
+
+def toStdVector(values):
     """
-    Saves all the TCanvas found in the file matching the passed regex via a call to the saveCanvas exectuable
+    Convert the passed list of strings into a std::vector<std::string>
     """
-    path_to_exe="/afs/hephy.at/work/t/tmadlener/CMSSW_8_0_12/src/TnPfromJPsi/PlotEfficiency/utils/saveCanvas"
-    DEVNULL = open(os.devnull, 'w') # needed to dump the output of TCanvas::Save into /dev/null
-    print("Saving TCanvas matching \'{}\' from file \'{}\'".format(_regex, _file))
-    status = subprocess.call([path_to_exe, _file, _regex, _extension], stdout=DEVNULL, stderr=subprocess.STDOUT)
-    return status
+    vec = r.std.vector('string')()
+    for v in values:
+        vec.push_back(v)
+    return vec
 
 
-def commonFileNameCleanup(_filename, _ID, _scenario, _trigRgx):
+def escapeRegex(_string):
     """
-    Do the cleanup that is common to both mvAndRename functions below:
-    Remove trigger stuff and the TDirectory information from the pdf filename
+    Escape the passed string such that it is matched literally by a std::regex
     """
-    fn = _trigRgx.sub('', _filename)
-    fn = fn.replace(":tpTree:", "").replace("{}_{}:".format(_ID, _scenario), "")
-    fn = fn.replace("_pair_drM1_bin0_", "").replace("_pair_probeMultiplicity_bin0_", "")
-    return fn
+    return re.sub(r'([.^$*+?()\[\]{}|\\])', r'\\\1', _string)
 
 
-def mvAndRename(_ID, _scenario, _targetdir="fitCanvasPdfs", _extension="pdf"):
+def getRenameRules(_ID, _scenario):
     """
-    The output of saveCanvas is not that nice and has to be cleaned up.
-    Mainly doing some replacing of the trigger parts and moving the created files to a separate directory
+    Get the rules to clean up the names of the canvases:
+    Remove trigger stuff and the TDirectory information from the output filename
     """
-    triggerRegex = re.compile('(_tag)?_Mu7p5_Track2_Jpsi(_(TK|MU)_pass_)?')
-    for filename in glob.glob(":tpTree:{}_{}*:*.{}".format(_ID, _scenario, _extension)):
-        filenameTo = commonFileNameCleanup(filename, _ID, _scenario, triggerRegex)
-        dirTo = "{}/{}_{}".format(_targetdir, _ID, _scenario)
-        if not os.path.exists(dirTo):
-            os.makedirs(dirTo)
-        filenameTo = "/".join([dirTo, filenameTo])
-        os.rename(filename, filenameTo)
+    return [('(_tag)?_Mu7p5_Track2_Jpsi(_(TK|MU)_pass_)?', ''),
+            (':tpTree:', ''),
+            (escapeRegex("{}_{}:".format(_ID, _scenario)), ''),
+            ('_pair_drM1_bin0_', ''),
+            ('_pair_probeMultiplicity_bin0_', '')]
 
 
-def mvAndRenamePt(_ID, _scenario, _file, _targetdir="fitCanvasPdfs", _extension="pdf"):
+def getTargetDir(_ID, _scenario, _file, _targetdir="fitCanvasPdfs"):
     """
-    The output of saveCanvas is not that nice and has to be cleaned up.
-    Mainly doing some replacing of the trigger parts and moving the created files to a separate directory.
+    Get the directory into which the canvases of the passed file are stored.
     For pt we currently run into a memory problem and have to split the input into abseta different bins.
     However this is not reflected in the names of the produced pdfs (since the .root files do not "know"
-    about this splitting, so we have to define a special version for renaming the pt scenario that uses
-    some more information that can be obtained from the root file (_file)
+    about this splitting, so for the pt scenario some more information is obtained from the name of the root file (_file)
     """
+    if "pt_abseta" not in _scenario:
+        return "{}/{}_{}".format(_targetdir, _ID, _scenario)
+
     # compute some additional info from the filename (that follows at least for the moment a common pattern)
-    addInfo = _file.replace(".root", "")
+    addInfo = os.path.basename(_file).replace(".root", "")
     addInfo = addInfo.replace("{}_{}_".format(_ID, _scenario), "")
     addInfo = addInfo.replace("TnP_MuonID_","").replace("_data_all_", "").replace("_signal_mc_", "")
-
-    triggerRegex = re.compile('(_tag)?_Mu7p5_Track2_Jpsi(_(TK|MU)_pass_)?')
-    for filename in glob.glob(":tpTree:{}_{}*:*.{}".format(_ID, _scenario, _extension)):
-        filenameTo = commonFileNameCleanup(filename, _ID, _scenario, triggerRegex)
-
-        dirTo = "{}/{}_{}_{}".format(_targetdir, _ID, _scenario, addInfo)
-        if not os.path.exists(dirTo):
-            os.makedirs(dirTo)
-        filenameTo = "/".join([dirTo, filenameTo])
-        os.rename(filename, filenameTo)
+    return "{}/{}_{}_{}".format(_targetdir, _ID, _scenario, addInfo)
 
 
 def processAllFiles(_dir, _ID, _scenario,
                     _targetdir="fitCanvasPdfs",
                     _canvasRegex="fit_canvas",
-                    _extension="pdf"):
+                    _extension="pdf",
+                    _shard=None):
     """
-    Process all .root files matching the _ID AND _scenario in _dir.
+    Process all .root files matching the _ID AND _scenario in _dir (only the ones belonging to the _shard, if any).
+    All files are processed with one call to the saveCanvas library, which directly writes to the final locations.
     """
-    os.chdir(_dir)
-    for f in glob.glob("TnP_MuonID_*_{0}_{1}*.root".format(_ID, _scenario)):
-        saveCanvasOfFile(f, _canvasRegex, _extension)
-        if "pt_abseta" in _scenario:
-            mvAndRenamePt(_ID, _scenario, f, _targetdir, _extension)
-        else:
-            mvAndRename(_ID, _scenario, _targetdir, _extension)
-
+    files = sorted(f for f in glob.glob(os.path.join(_dir, "TnP_MuonID_*_{0}_{1}*.root".format(_ID, _scenario)))
+                   if isInShard(_shard, os.path.basename(f)))
+    if not files:
+        return 0
+
+    print("Saving TCanvas matching \'{}\' from {} files".format(_canvasRegex, len(files)))
+    rules = getRenameRules(_ID, _scenario)
+    return r.saveCanvases(toStdVector(files),
+                          toStdVector([getTargetDir(_ID, _scenario, f, _targetdir) for f in files]),
+                          toStdVector([_canvasRegex]), toStdVector([_extension]),
+                          toStdVector([rule[0] for rule in rules]), toStdVector([rule[1] for rule in rules]))
+
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description="This script saves all fit canvases of all ROOT files of the IDs and "
+                                 "scenarios defined below")
+parser.add_argument("--shard", type=parseShard, default=None,
+                    help="Only process the part i/N (0 <= i < N) of all files (the split is the same on every node). "
+                    "The files are split as a whole, since every file is processed by the saveCanvas library in one go")
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import ROOT as r
 
 # Define on what to run
 IDs = ["Loose2016", "Medium2016", "Tight2016", "Soft2016"]
@@ -94,10 +111,15 @@ basedir="/afs/hephy.at/work/t/tmadlener/CMSSW_8_0_12/src/data_rootfiles"
 targetdir="/afs/hephy.at/work/t/tmadlener/CMSSW_8_0_12/src/outputfiles/Figures/FitCanvasPdfs/data"
 
 # pdf, ps and svg are currently working, png should too according to the ROOT documentation but doesn't at the moment
-# Workaround to get png is to save the plots as ps and convert them to png using gs
+# Workaround to get png is to save the plots as pdf or ps and convert them to png using rasterizeCanvases.py (gs)
 plotformat="pdf"
 
+r.gROOT.SetBatch()
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # suppress the output of TCanvas::SaveAs
+loadSaveCanvas()
+
 for ID in IDs:
     for scen in scenarios:
         print("Currently processing ID: {}, scenario: {}".format(ID, scen))
-        processAllFiles(basedir, ID, scen, targetdir, "fit_canvas", plotformat)
+        nSaved = processAllFiles(basedir, ID, scen, targetdir, "fit_canvas", plotformat, args.shard)
+        print("Saved {} files".format(nSaved))
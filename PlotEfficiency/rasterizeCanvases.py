@@ -0,0 +1,59 @@
+import argparse
+import os
+import multiprocessing
+
+from utils.raster import VECTOR_EXTENSIONS, findExecutable, getRasterNames, convertFile
+from utils.sharding import parseShard, isInShard
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script converts all exported (vector) canvases (pdf, ps, eps) found '
+                                 'below the passed directory into a full size png and a low resolution thumbnail in '
+                                 'parallel. Files that have already been converted (and are newer than the source) are '
+                                 'skipped')
+parser.add_argument('inputDir', help='The directory that is searched recursively for canvases (e.g. the output_dir of '
+                    'extractFitCanvas.py)')
+parser.add_argument('-o', '--output_dir', default=None,
+                    help='Store the pngs in this directory (mirroring the input structure) instead of next to the sources')
+parser.add_argument('-r', '--resolution', default=100, type=int, help='The resolution (dpi) of the full size png')
+parser.add_argument('-t', '--thumb_resolution', default=20, type=int, help='The resolution (dpi) of the thumbnail')
+parser.add_argument('-j', '--processes', default=multiprocessing.cpu_count(), type=int,
+                    help='The number of parallel conversions')
+parser.add_argument('--gs', default='gs', help='The ghostscript executable')
+parser.add_argument('--shard', type=parseShard, default=None,
+                    help='Only convert the part i/N (0 <= i < N) of the canvases (the split is the same on every node)')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely)')
+args = parser.parse_args()
+
+gs = args.gs if os.path.isfile(args.gs) else findExecutable(args.gs)
+if gs is None:
+    raise RuntimeError('Cannot find ghostscript executable \'{}\''.format(args.gs))
+
+jobs = []
+for [dirpath, dirnames, filenames] in os.walk(args.inputDir):
+    for fn in sorted(filenames):
+        if os.path.splitext(fn)[1] in VECTOR_EXTENSIONS:
+            source = os.path.join(dirpath, fn)
+            if not isInShard(args.shard, os.path.relpath(source, args.inputDir)):
+                continue
+            [png, thumb] = getRasterNames(source, args.inputDir, args.output_dir)
+            jobs.append((source, png, thumb, args.resolution, args.thumb_resolution, gs))
+
+if args.verbosity > 0:
+    print('Found {} canvases to check in {}'.format(len(jobs), args.inputDir))
+
+nCreated = 0
+nFailed = 0
+pool = multiprocessing.Pool(max(args.processes, 1))
+for [source, created, failed] in pool.imap_unordered(convertFile, jobs, chunksize=8):
+    nCreated += created
+    nFailed += failed
+    if failed > 0:
+        print('Could not convert {}'.format(source))
+pool.close()
+pool.join()
+
+if args.verbosity > 0:
+    print('Created {} pngs, {} conversions failed'.format(nCreated, nFailed))
@@ -0,0 +1,99 @@
+import argparse
+import mimetypes
+import os
+import re
+import sys
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from urllib.parse import unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from urllib import unquote
+
+from utils.canvasArchive import readIndex, readMember
+from utils.miscHelpers import condMkDirFile
+
+
+def getMatchingMembers(index, nameRgx):
+    """
+    Get the (sorted) names of all members of the archive index matching the passed regex
+    """
+    rgx = re.compile(nameRgx)
+    return [m for m in sorted(index.keys()) if rgx.search(m)]
+
+
+def createHandler(archives):
+    """
+    Create the request handler class serving the members of the passed archives (dict of archive name -> index):
+    '/' lists all members, '/<archive>/<member>' returns the content of one member
+    """
+    class ArchiveHandler(BaseHTTPRequestHandler):
+        def sendContent(self, content, contentType):
+            self.send_response(200)
+            self.send_header('Content-Type', contentType)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+
+        def do_GET(self):
+            path = unquote(self.path).lstrip('/')
+            if not path:
+                links = ['<li><a href="/{0}/{1}">{0}/{1}</a></li>'.format(os.path.basename(a), m)
+                         for [a, index] in sorted(archives.items()) for m in sorted(index.keys())]
+                page = '<html><body><ul>\n{}\n</ul></body></html>'.format('\n'.join(links))
+                self.sendContent(page.encode('utf-8'), 'text/html')
+                return
+
+            [archiveName, _, member] = path.partition('/')
+            for [a, index] in archives.items():
+                if os.path.basename(a) == archiveName and member in index:
+                    contentType = mimetypes.guess_type(member)[0] or 'application/octet-stream'
+                    self.sendContent(readMember(a, member, index), contentType)
+                    return
+            self.send_error(404, 'No member {} in any archive'.format(path))
+
+    return ArchiveHandler
+
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script reads the canvas archives written by extractFitCanvas.py '
+                                 'with --archive: list their members, extract single plots or serve them via http '
+                                 'without unpacking the archives')
+parser.add_argument('command', choices=['list', 'extract', 'serve'], help='What to do with the archives')
+parser.add_argument('archives', nargs='+', help='The archive files (.zip or .tar)')
+parser.add_argument('-r', '--name_regex', default='.*', help='Only list or extract members matching this regex')
+parser.add_argument('-o', '--output_dir', default='.', help='The directory into which the members are extracted')
+parser.add_argument('-p', '--port', default=8000, type=int, help='The port on which the plots are served')
+args = parser.parse_args()
+
+indices = dict((a, readIndex(a)) for a in args.archives)
+
+if args.command == 'list':
+    for [archiveName, index] in sorted(indices.items()):
+        for member in getMatchingMembers(index, args.name_regex):
+            print('{}: {} ({} bytes)'.format(archiveName, member, index[member][1]))
+
+elif args.command == 'extract':
+    nExtracted = 0
+    for [archiveName, index] in sorted(indices.items()):
+        for member in getMatchingMembers(index, args.name_regex):
+            filename = '/'.join([args.output_dir, member])
+            condMkDirFile(filename)
+            with open(filename, 'wb') as f:
+                f.write(readMember(archiveName, member, index))
+            nExtracted += 1
+    print('Extracted {} members into {}'.format(nExtracted, args.output_dir))
+
+else:
+    server = HTTPServer(('', args.port), createHandler(indices))
+    print('Serving {} members of {} archives on port {}'.format(
+        sum(len(index) for index in indices.values()), len(indices), args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        sys.exit(0)
@@ -0,0 +1,125 @@
+import argparse
+import os
+from array import array
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script computes weights from the ratio of the (normalized) number '
+                                 'of vertices distributions in DATA and MC and stores them for every entry of the MC '
+                                 'tree, either in a friend tree or as a new branch in the MC tree itself. All trees are '
+                                 'processed in chunks so that the memory usage does not depend on their size')
+parser.add_argument('mcFile', help='The MC file containing the tree that should be reweighted')
+parser.add_argument('dataFiles', nargs='+', help='The DATA file(s) from which the target distribution is taken')
+parser.add_argument('-t', '--tree', default='tpTree/fitter_tree', help='The path of the tree inside the files')
+parser.add_argument('-x', '--variable', default='tag_nVertices', help='The variable that is used for reweighting')
+parser.add_argument('-m', '--max_value', default=60, type=int,
+                    help='Values above this are put into the last bin, values below 0 into the first (one bin per '
+                    'integer value)')
+parser.add_argument('-s', '--selection', default='',
+                    help='Selection applied when filling the DATA and MC distributions (not when applying the weights)')
+parser.add_argument('-b', '--branch', default='weight', help='The name of the weight branch')
+parser.add_argument('--max_weight', default=10, type=float,
+                    help='Weights above this value are clamped to it. The default matches the range of the weight '
+                    'variable in the fit configuration, outside of which entries are dropped from the fits')
+parser.add_argument('-o', '--output',
+                    help='The output file containing the friend tree (default: <mcFile>_<branch>Friend.root)')
+parser.add_argument('-i', '--in_place', action='store_true', default=False,
+                    help='Add the weight branch directly to the MC tree instead of writing a friend tree. Only the new '
+                    'branch is written, the existing content of the file is not rewritten')
+parser.add_argument('-c', '--chunk_size', default=1000000, type=int, help='The number of entries read at once')
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import numpy as np
+import ROOT as r
+from utils.treeChunks import iterateChunks, fillHistogram, fillFromArray
+from utils.miscHelpers import condMkDirFile
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+
+
+def getWeights(dataCounts, mcCounts, maxWeight):
+    """
+    Get the weight for every bin from the ratio of the normalized DATA and MC distributions, clamped to maxWeight.
+    Bins without MC entries get a weight of 1.
+    Returns the weights and the mask of the clamped bins
+    """
+    dataNorm = dataCounts / max(dataCounts.sum(), 1)
+    mcNorm = mcCounts / max(mcCounts.sum(), 1)
+    weights = np.ones_like(dataNorm)
+    filled = mcNorm > 0
+    weights[filled] = dataNorm[filled] / mcNorm[filled]
+    clamped = weights > maxWeight
+    weights[clamped] = maxWeight
+    return [weights, clamped]
+
+
+def lookupWeights(values, edges, weights):
+    """
+    Get the weight for every value. Values outside the edges get the weight of the first (last) bin.
+    """
+    indices = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(weights) - 1)
+    return weights[indices]
+
+
+def fillWeightBranch(tree, target, buf):
+    """
+    Compute the weights of all entries of the tree chunk by chunk and fill them into the target (TTree or TBranch with
+    the address buf), one chunk at a time
+    """
+    for values in iterateChunks(tree, args.variable, args.chunk_size):
+        fillFromArray(target, buf, lookupWeights(values, edges, weights))
+
+
+edges = np.arange(-0.5, args.max_value + 1.5)
+
+dataChain = r.TChain(args.tree)
+for f in args.dataFiles:
+    dataChain.Add(f)
+dataCounts = fillHistogram(dataChain, args.variable, edges, args.chunk_size, args.selection, True)
+
+mode = 'update' if args.in_place else 'read'
+mcFile = r.TFile.Open(args.mcFile, mode)
+mcTree = mcFile.Get(args.tree)
+mcCounts = fillHistogram(mcTree, args.variable, edges, args.chunk_size, args.selection, True)
+
+[weights, clamped] = getWeights(dataCounts, mcCounts, args.max_weight)
+print('Weights per {} bin:'.format(args.variable))
+for i, w in enumerate(weights):
+    print('  {:5.1f} - {:5.1f}: {:.4f}{}'.format(edges[i], edges[i + 1], w, ' (clamped)' if clamped[i] else ''))
+if clamped.any():
+    print('Clamped the weights of {} bins ({} MC entries) to {}'.format(
+        int(clamped.sum()), int(mcCounts[clamped].sum()), args.max_weight))
+
+buf = array('f', [0])
+[treeDir, treeName] = os.path.split(args.tree)
+if args.in_place:
+    if mcTree.GetBranch(args.branch):
+        raise RuntimeError('Branch \'{}\' is already present in {}'.format(args.branch, args.mcFile))
+    branch = mcTree.Branch(args.branch, buf, args.branch + '/F')
+    fillWeightBranch(mcTree, branch, buf)
+    mcFile.cd(treeDir)
+    mcTree.Write('', r.TObject.kOverwrite)
+else:
+    outname = args.output
+    if outname is None:
+        outname = args.mcFile.replace('.root', '_{}Friend.root'.format(args.branch))
+    if os.path.dirname(outname):
+        condMkDirFile(outname)
+    outfile = r.TFile.Open(outname, 'recreate')
+    outdir = outfile.mkdir(treeDir) if treeDir else outfile
+    outdir.cd()
+    friend = r.TTree(treeName, 'weights from {} reweighting'.format(args.variable))
+    friend.Branch(args.branch, buf, args.branch + '/F')
+    fillWeightBranch(mcTree, friend, buf)
+    friend.Write()
+
+    hist = r.TH1D('{}_weights'.format(args.variable), '', len(weights), array('d', edges))
+    for i, w in enumerate(weights):
+        hist.SetBinContent(i + 1, w)
+    hist.Write()
+    outfile.Close()
+    print('Wrote friend tree to {}'.format(outname))
+
+mcFile.Close()
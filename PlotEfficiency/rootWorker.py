@@ -0,0 +1,35 @@
+import argparse
+import os
+import sys
+
+from utils.rootWorker import RootWorker, getDefaultSocket, warmUp
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script starts a long-lived worker that keeps ROOT loaded and runs '
+                                 'the scripts of this repository on request (see runInWorker.py), so that the jobs do '
+                                 'not have to pay for the startup of ROOT every time. Only the scripts inside the '
+                                 'repository are run and only the user running the worker can connect to it')
+parser.add_argument('-s', '--socket', default=getDefaultSocket(), help='The path of the Unix socket to listen on')
+parser.add_argument('-j', '--max_jobs', default=4, type=int, help='The maximum number of jobs running at the same time')
+parser.add_argument('-p', '--preload', nargs='*', default=[],
+                    help='Additional python modules to import at startup (e.g. utils.TGA_utils)')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely)')
+args = parser.parse_args()
+
+# make the utils importable in the same way as for the scripts
+thisDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, thisDir)
+warmUp(args.preload)
+
+try:
+    worker = RootWorker(args.socket, os.path.dirname(thisDir), args.max_jobs, args.verbosity)
+except IOError as err:
+    print(err)
+    sys.exit(1)
+if args.verbosity > 0:
+    print('Worker ready, listening on {}'.format(args.socket))
+sys.stdout.flush()
+worker.serve()
@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+
+from utils.rootWorker import getDefaultSocket, submitJob, stopWorker
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script runs one of the scripts of this repository in the worker '
+                                 'started with rootWorker.py. The arguments are the same as for running the script '
+                                 'directly and the output and the exit code of the script are passed through')
+parser.add_argument('-s', '--socket', default=getDefaultSocket(), help='The path of the Unix socket of the worker')
+parser.add_argument('--stop', action='store_true', default=False,
+                    help='Stop the worker (after all running jobs are finished)')
+parser.add_argument('script', nargs='?', help='The script to run, e.g. extractPlots.py (searched in the current '
+                    'directory, PlotEfficiency/ and the repository)')
+parser.add_argument('scriptArgs', nargs=argparse.REMAINDER, help='The arguments that are passed to the script')
+args = parser.parse_args()
+
+if args.stop:
+    stopWorker(args.socket)
+    sys.exit(0)
+
+if args.script is None:
+    parser.error('Need a script to run')
+
+# find the script, so that e.g. 'makeEfficiencyPlots.py' works from everywhere
+thisDir = os.path.dirname(os.path.abspath(__file__))
+candidates = [args.script, os.path.join(thisDir, args.script), os.path.join(os.path.dirname(thisDir), args.script)]
+scripts = [os.path.abspath(c) for c in candidates if os.path.isfile(c)]
+if not scripts:
+    parser.error('Cannot find script {}'.format(args.script))
+
+out = sys.stdout.buffer if hasattr(sys.stdout, 'buffer') else sys.stdout
+sys.exit(submitJob(args.socket, scripts[0], args.scriptArgs, os.getcwd(), out))
@@ -0,0 +1,48 @@
+import argparse
+import json
+
+from utils.efficiencyManifest import loadManifest, getEfficiencies
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script counts the expected number of passing and failing probes in '
+                                 'every bin of all efficiencies in an efficiency manifest. The output JSON file can be '
+                                 'used by the fit configuration (adaptiveFit = True) to choose between binned and '
+                                 'unbinned fits')
+parser.add_argument('manifest', help='Path to the efficiency manifest JSON file')
+parser.add_argument('-o', '--output', default=None,
+                    help='The output JSON file (default: TnP_MuonID_binStats_<scenario>.json, the file that is read by '
+                    'the fit configuration)')
+parser.add_argument('-p', '--prescale', default=10, type=int,
+                    help='Only use every n-th entry of the trees to get a fast estimate of the counts')
+parser.add_argument('-e', '--efficiency_regex', default='.*',
+                    help='Only process the efficiencies whose name matches this regex')
+parser.add_argument('-l', '--entry_lists', action='store_true', default=False,
+                    help='Only visit the entries of the (cached) denominator entry lists (see makeEntryLists.py)')
+parser.add_argument('--store_dir', default=None,
+                    help='The directory in which the entry lists are stored, if not next to the input files')
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import ROOT as r
+from utils.binStatistics import countBinEntries
+from utils.entryLists import getChainEntryList
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+
+manifest = loadManifest(args.manifest)
+output = args.output or 'TnP_MuonID_binStats_{}.json'.format(manifest["scenario"])
+
+stats = {}
+for eff in getEfficiencies(manifest, args.efficiency_regex):
+    entryList = getChainEntryList(eff, args.store_dir) if args.entry_lists else None
+    counts = countBinEntries(eff, args.prescale, entryList)
+    counts["bins"] = [b[0] for b in eff.getBinNames()]
+    stats.setdefault(eff.getOutputFile(), {})[eff.name] = counts
+    print('{} ({}): min. pass {:.0f}, min. fail {:.0f}'.format(eff.name, eff.getOutputFile(),
+                                                              min(counts["pass"]), min(counts["fail"])))
+
+with open(output, 'w') as f:
+    json.dump(stats, f, indent=1, sort_keys=True)
+print('Wrote the bin statistics to {}'.format(output))
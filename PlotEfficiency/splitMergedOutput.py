@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script splits the output files of the TagProbeFitTreeAnalyzer '
+                                 'modules that contain several IDs (mergeIDs = True in the fit configuration) into one '
+                                 'output file per ID with the same names as the non-merged modules would produce')
+parser.add_argument('splitFile', help='Path to the split JSON file written by the fit configuration')
+parser.add_argument('-i', '--input_dir', default='./',
+                    help='The directory containing the merged output files (the per ID files are written there too)')
+parser.add_argument('-r', '--remove', action='store_true', default=False,
+                    help='Remove the merged output files after they have been split')
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import ROOT as r
+from utils.recurseTFile import copyDirectory
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+
+with open(args.splitFile, 'r') as f:
+    splitInfo = json.loads(f.read())
+
+for mergedName in sorted(splitInfo.keys()):
+    mergedFile = r.TFile.Open(os.path.join(args.input_dir, mergedName))
+    if not mergedFile:
+        continue # ROOT already prints an error message
+    basedir = mergedFile.GetDirectory(str(splitInfo[mergedName]["directory"]))
+
+    # collect all efficiencies per output file first, since more than one efficiency can go into the same file
+    outputs = {}
+    for eff, outname in splitInfo[mergedName]["efficiencies"].items():
+        outputs.setdefault(outname, []).append(eff)
+    # efficiencies that do not depend on the ID are copied into the files of all IDs
+    for eff, outnames in splitInfo[mergedName].get("copies", {}).items():
+        for outname in outnames:
+            outputs.setdefault(outname, []).append(eff)
+
+    for outname in sorted(outputs.keys()):
+        print('Writing {} from {}'.format(outname, mergedName))
+        outfile = r.TFile.Open(os.path.join(args.input_dir, outname), 'recreate')
+        outdir = outfile.mkdir(basedir.GetName())
+        for eff in sorted(outputs[outname]):
+            effDir = basedir.GetDirectory(str(eff))
+            if not effDir:
+                print('Cannot find efficiency {} in {}'.format(eff, mergedName))
+                continue
+            copyDirectory(effDir, outdir.mkdir(str(eff), effDir.GetTitle()))
+        outfile.Close()
+
+    mergedFile.Close()
+    if args.remove:
+        os.remove(os.path.join(args.input_dir, mergedName))
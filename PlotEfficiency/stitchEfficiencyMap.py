@@ -0,0 +1,70 @@
+import argparse
+import sys
+
+from utils.efficiencyMap import CATEGORIES, parseAbsetaRange, stitchSlices, writeMapJson
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script stitches the pt efficiencies of all abseta slices of one ID '
+                                 '(i.e. the outputs of extractPlots.py for the split pt_abseta fits) into one 2D map '
+                                 'of efficiencies and errors with explicit pt and abseta edges. The map is checked for '
+                                 'gaps and overlaps and stored as TH2D in a ROOT file and as JSON lookup table')
+parser.add_argument('inputFiles', nargs='+', help='The files produced by extractPlots.py for all abseta slices')
+parser.add_argument('-o', '--output', required=True,
+                    help='The output filename without extension (a .root and a .json file are created)')
+parser.add_argument('-n', '--name', default='pt_abseta', help='The name that is appended to the names of the TH2Ds')
+parser.add_argument('--abseta_regex', default=r'abseta_([0-9]+p[0-9]+)_([0-9]+p[0-9]+)',
+                    help='Regex with two groups to get the abseta range of the slices from the filenames (. replaced '
+                    'by p)')
+parser.add_argument('--tolerance', default=1e-6, type=float,
+                    help='Relative tolerance within which two bin edges are considered equal')
+parser.add_argument('--strict', action='store_true', default=False,
+                    help='Do not write any output if gaps or overlaps are found')
+args = parser.parse_args()
+
+# import after the argparsing to not mess it up
+import ROOT as r
+from utils.efficiencyMap import getGraphPoints, createMapHists
+
+r.gROOT.ProcessLine("gErrorIgnoreLevel = 1001") # avoid stdout pollution of ROOT
+
+slices = []
+for filename in args.inputFiles:
+    absetaRange = parseAbsetaRange(filename, args.abseta_regex)
+    if absetaRange is None:
+        print('Cannot determine the abseta range of {}, skipping it'.format(filename))
+        continue
+
+    f = r.TFile.Open(filename)
+    if f == None: # message already printed by ROOT
+        continue
+    points = {}
+    for cat in CATEGORIES:
+        graph = f.Get(cat)
+        if graph:
+            points[cat] = getGraphPoints(graph)
+        else:
+            print('{} has no {} graph'.format(filename, cat))
+    f.Close()
+    slices.append({'name': filename, 'abseta': absetaRange, 'points': points})
+
+if not slices:
+    print('No abseta slices found')
+    sys.exit(1)
+
+[effMap, problems] = stitchSlices(slices, args.tolerance)
+for problem in problems:
+    print('WARNING: {}'.format(problem))
+if problems and args.strict:
+    sys.exit(1)
+
+outfile = r.TFile.Open(args.output + '.root', 'recreate')
+outfile.cd()
+for hist in createMapHists(effMap, args.name):
+    hist.Write()
+outfile.Close()
+writeMapJson(effMap, args.output + '.json')
+
+print('Stitched {} slices into a map with {} pt x {} abseta bins: {}.root, {}.json'.format(
+    len(slices), len(effMap['pt_edges']) - 1, len(effMap['abseta_edges']) - 1, args.output, args.output))
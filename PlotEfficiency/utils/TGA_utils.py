@@ -1,7 +1,6 @@
 import math
-import ROOT as r
 
-from miscHelpers import getOverlappingBins
+from miscHelpers import alignBins
 
 
 class TGAPoint:
@@ -32,6 +31,7 @@ def getPoint(graph, index):
     """
     get the point index from the passed graph
     """
+    import ROOT as r
     x = r.Double(0)
     y = r.Double(0)
     graph.GetPoint(index, x, y)
@@ -62,26 +62,45 @@ def getXBinning(graph):
     return bins
 
 
+def getXBinEdges(graph):
+    """
+    Get the lower and the upper edges of the bins of all points of the passed graph (as two lists).
+    Contrary to getXBinning this does not assume that the bins are contiguous
+    """
+    lows = []
+    highs = []
+    for i in range(0, graph.GetN()):
+        point = getPoint(graph, i)
+        lows.append(point.x - point.el_x)
+        highs.append(point.x + point.eh_x)
+
+    return [lows, highs]
+
+
 def divideGraphs(gNum, gDenom):
     """
     Divide the y-values of graph gNum by graph gDenom and return a new graph with the result.
-    NOTE: It is assumed that both TGraphAsymmErrors are binned in the same way along the x-direction
-    and the returned graph only has as many points as there are (exactly) overlapping bins in the input graphs.
+    The bins of both graphs are aligned (within a small tolerance) and the returned graph only has as many points as
+    there are matching bins in the input graphs. Partially overlapping bins are reported and skipped.
     The x-values are taken from the numerator graph
     """
+    import ROOT as r
     graph = None
 
     if min(gNum.GetN(), gDenom.GetN()) < 1:
         print("Cannot divide graphs when one graph has zero points")
         return None
 
-    bins = getOverlappingBins(getXBinning(gNum), getXBinning(gDenom))
+    [matches, partial] = alignBins(*(getXBinEdges(gNum) + getXBinEdges(gDenom)))
+    for [iNum, iDenom] in partial:
+        print("Bins of point {} of {} and point {} of {} overlap only partially, skipping them".format(
+            iNum, gNum.GetName(), iDenom, gDenom.GetName()))
 
     graph = r.TGraphAsymmErrors()
     iPoint = 0
-    for i in range(0, len(bins[0]) - 1): # both lists in bins should have the same length!
-        pNum = getPoint(gNum, bins[0][i])
-        pDenom = getPoint(gDenom, bins[1][i])
+    for [iNum, iDenom] in matches:
+        pNum = getPoint(gNum, iNum)
+        pDenom = getPoint(gDenom, iDenom)
 
         if pDenom.y == 0: continue # Still can't divide by 0
 
@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import queue
+except ImportError: # python 2
+    import Queue as queue
+
+from miscHelpers import condMkDirFile
+
+
+class AsyncOutputWriter(object):
+    """
+    Output layer that decouples the (slow) writing to network filesystems (AFS, EOS) from the production of the files.
+    Files are first written to a local temporary directory and then moved to their final location by a bounded pool of
+    writer threads, retrying a few times on failure. flush() waits until all files are at their final location.
+    Files that could not be moved are kept in the temporary directory (also by close()).
+
+    With nThreads = 0 everything is done synchronously in the calling thread.
+    """
+
+    def __init__(self, nThreads=4, maxQueued=100, retries=3, retryDelay=2.0, tmpDir=None):
+        """
+        Initialize: create the temporary directory and start the writer threads.
+        At most maxQueued files are waiting to be moved, submitting more blocks until there is space again.
+        """
+        self.nThreads = nThreads
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.tmpDir = tempfile.mkdtemp(prefix='asyncWriter_', dir=tmpDir)
+        self.counter = 0
+        self.errors = []
+        self.failed = [] # all files that could not be moved, over all calls to flush
+        self.queue = queue.Queue(maxQueued)
+        self.threads = []
+        for i in range(nThreads):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+
+    def getTmpName(self, filename):
+        """
+        Get a unique name in the local temporary directory for the passed final filename (keeping the file extension)
+        """
+        self.counter += 1
+        return os.path.join(self.tmpDir, '{}_{}'.format(self.counter, os.path.basename(filename)))
+
+
+    def submit(self, tmpName, filename):
+        """
+        Hand the file tmpName over to be moved to filename (the directory is created if necessary)
+        """
+        if self.nThreads > 0:
+            self.queue.put((tmpName, filename))
+        else:
+            self._move(tmpName, filename)
+
+
+    def saveAs(self, obj, filename):
+        """
+        Save the passed TObject (e.g. a TCanvas) via SaveAs into a temporary file and submit it to be moved to filename
+        """
+        tmpName = self.getTmpName(filename)
+        obj.SaveAs(tmpName)
+        self.submit(tmpName, filename)
+
+
+    def flush(self):
+        """
+        Wait until all submitted files have been moved. Returns the list of [filename, error, temporary file] of all
+        files that could not be moved (since the last call to flush)
+        """
+        if self.nThreads > 0:
+            self.queue.join()
+        errors = self.errors
+        self.errors = []
+        for [filename, err, tmpName] in errors:
+            print('Could not write {}: {} (kept as {})'.format(filename, err, tmpName))
+        self.failed += errors
+        return errors
+
+
+    def close(self):
+        """
+        Flush, stop all writer threads and remove the temporary directory. If any file could not be moved, the
+        temporary directory is kept. Returns the list of [filename, error, temporary file] of all files that could not
+        be moved (over the whole lifetime of the writer)
+        """
+        self.flush()
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.failed:
+            print('{} files could not be written, they are kept in {}'.format(len(self.failed), self.tmpDir))
+        else:
+            shutil.rmtree(self.tmpDir, ignore_errors=True)
+        return self.failed
+
+
+    def _work(self):
+        """
+        Main loop of the writer threads
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            self._move(item[0], item[1])
+            self.queue.task_done()
+
+
+    def _move(self, tmpName, filename):
+        """
+        Move tmpName to filename, retrying with increasing delays if it fails
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                if os.path.dirname(filename):
+                    condMkDirFile(filename)
+                shutil.move(tmpName, filename)
+                return
+            except (IOError, OSError) as err:
+                if attempt == self.retries:
+                    self.errors.append([filename, str(err), tmpName])
+                else:
+                    time.sleep(self.retryDelay * (attempt + 1))
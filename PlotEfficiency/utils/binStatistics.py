@@ -0,0 +1,42 @@
+from datasetCache import createHist, projectBin
+
+
+def countBinEntries(effDef, prescale=1, entryList=None):
+    """
+    Count the (unweighted) number of passing and failing probes in every bin of the passed EfficiencyDefinition.
+    If prescale is larger than one, only every prescale-th entry is considered and the counts are scaled accordingly.
+    Returns a dictionary with a 'pass' and a 'fail' list with one entry per bin (in the order of getBinNames).
+    """
+    import ROOT as r
+    dims = effDef.getBinnedDimensions()
+    if len(dims) > 2:
+        raise ValueError('Cannot count entries of {} with more than two binned variables'.format(effDef.name))
+
+    chain = r.TChain(effDef.getTreeName())
+    for f in effDef.getInputFiles():
+        chain.Add(f)
+    if entryList is not None:
+        chain.SetEntryList(entryList)
+
+    [mass, mLow, mHigh] = effDef.getMassVariable()
+    denCut = effDef.getDenominatorCut() if entryList is None else '1'
+    passCut = effDef.getPassCut()
+    if prescale > 1:
+        denCut = '{} && Entry$ % {} == 0'.format(denCut, prescale)
+
+    # same layout as the cached datasets but with only one mass bin
+    varexp = ':'.join(reversed([mass] + [d[0] for d in dims]))
+    r.gROOT.cd()
+    counts = {}
+    for [state, sel] in [['pass', '{} && {}'.format(denCut, passCut)],
+                         ['fail', '{} && !({})'.format(denCut, passCut)]]:
+        hist = createHist('count_' + state, 1, mLow, mHigh, dims)
+        chain.Project(hist.GetName(), varexp, sel)
+        counts[state] = []
+        for [binName, indices] in effDef.getBinNames():
+            binHist = projectBin(hist, 'count_bin', indices)
+            counts[state].append(binHist.Integral() * prescale)
+            binHist.Delete()
+        hist.Delete()
+
+    return counts
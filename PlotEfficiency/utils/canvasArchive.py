@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+from miscHelpers import condMkDirFile
+
+ARCHIVE_FORMATS = ['zip', 'tar']
+# the index of the members is stored next to the archive, in a file with the name of the archive plus this suffix
+INDEX_SUFFIX = '.index.json'
+
+
+def getArchiveName(base, fmt):
+    """
+    Get the filename of the archive from the base name (without extension) and the format
+    """
+    return '.'.join([base, fmt])
+
+
+def getArchiveFormat(archiveName):
+    """
+    Get the format of an archive from its filename
+    """
+    fmt = os.path.splitext(archiveName)[1][1:]
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError('Unknown archive format of {} (possible formats: {})'.format(archiveName, ARCHIVE_FORMATS))
+    return fmt
+
+
+def writeIndex(archiveName):
+    """
+    Write the index of the passed archive: the offset of every member in the archive and its size. For tar archives the
+    offset is the one of the data, so that a member can be read directly without scanning the archive.
+    Raises a ValueError if a member name appears more than once, since only one of them could be reached
+    """
+    entries = []
+    if getArchiveFormat(archiveName) == 'zip':
+        with zipfile.ZipFile(archiveName, 'r') as archive:
+            entries = [[info.filename, [info.header_offset, info.file_size]] for info in archive.infolist()]
+    else:
+        archive = tarfile.open(archiveName, 'r')
+        entries = [[info.name, [info.offset_data, info.size]] for info in archive.getmembers() if info.isfile()]
+        archive.close()
+
+    members = dict(entries)
+    if len(members) < len(entries):
+        names = [name for [name, _] in entries]
+        raise ValueError('Duplicate members in {}: {}'.format(
+            archiveName, ', '.join(sorted(set(n for n in names if names.count(n) > 1)))))
+
+    with open(archiveName + INDEX_SUFFIX, 'w') as f:
+        json.dump({'archive': os.path.basename(archiveName), 'members': members}, f, indent=1, sort_keys=True)
+
+
+def readIndex(archiveName):
+    """
+    Read the index of the passed archive (creating it first if it does not exist yet).
+    Returns the dict of member name -> [offset, size]
+    """
+    if not os.path.exists(archiveName + INDEX_SUFFIX):
+        writeIndex(archiveName)
+    with open(archiveName + INDEX_SUFFIX, 'r') as f:
+        return json.loads(f.read())['members']
+
+
+def readMember(archiveName, member, index=None):
+    """
+    Read the content of one member of the archive. For tar archives the offset stored in the index is used to read it
+    directly
+    """
+    if getArchiveFormat(archiveName) == 'zip':
+        with zipfile.ZipFile(archiveName, 'r') as archive:
+            return archive.read(member)
+
+    if index is None:
+        index = readIndex(archiveName)
+    [offset, size] = index[member]
+    with open(archiveName, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+class ArchiveWriter(object):
+    """
+    Output layer that streams the saved objects into archives (zip or tar) instead of creating one file (and possibly
+    directories) for each, which is slow and uses up the inode quota on shared filesystems like AFS.
+    Objects are saved into a local temporary file first and then appended to the current archive (see setArchive).
+    Provides the same saveAs and close interface as the AsyncOutputWriter.
+    """
+
+    def __init__(self, fmt='zip', append=False, tmpDir=None):
+        """
+        Initialize: check the format and create the temporary directory.
+        If append is True, existing archives are continued, otherwise they are replaced
+        """
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError('Unknown archive format \'{}\', possible formats: {}'.format(fmt, ARCHIVE_FORMATS))
+        self.fmt = fmt
+        self.append = append
+        self.tmpDir = tempfile.mkdtemp(prefix='archiveWriter_', dir=tmpDir)
+        self.archives = {}
+        self.members = {} # archive name -> set of member names
+        self.current = None
+        self.currentName = None
+        self.basePath = ''
+        self.prefix = ''
+
+
+    def setArchive(self, archiveBase, basePath, prefix=''):
+        """
+        Save all following objects into the archive with the passed base name (without extension), with member names
+        relative to basePath, prepended by the prefix (e.g. to keep the files of several inputs in one archive apart)
+        """
+        archiveName = getArchiveName(archiveBase, self.fmt)
+        if archiveName not in self.archives:
+            condMkDirFile(archiveName)
+            mode = 'a' if self.append else 'w'
+            if self.fmt == 'zip':
+                self.archives[archiveName] = zipfile.ZipFile(archiveName, mode, zipfile.ZIP_STORED, allowZip64=True)
+                self.members[archiveName] = set(self.archives[archiveName].namelist())
+            else:
+                self.archives[archiveName] = tarfile.open(archiveName, mode)
+                self.members[archiveName] = set(self.archives[archiveName].getnames())
+        self.current = self.archives[archiveName]
+        self.currentName = archiveName
+        self.basePath = basePath
+        self.prefix = prefix
+
+
+    def saveAs(self, obj, filename):
+        """
+        Save the passed TObject (e.g. a TCanvas) via SaveAs and add it to the current archive, as member with the name
+        of filename relative to the basePath (with the prefix). Raises a ValueError if the archive already contains a
+        member with this name
+        """
+        if self.current is None:
+            raise RuntimeError('No archive set for saving {}'.format(filename))
+        member = os.path.join(self.prefix, os.path.relpath(os.path.normpath(filename), os.path.normpath(self.basePath)))
+        if member in self.members[self.currentName]:
+            raise ValueError('{} already contains a member {}'.format(self.currentName, member))
+        self.members[self.currentName].add(member)
+        tmpName = os.path.join(self.tmpDir, os.path.basename(filename))
+        obj.SaveAs(tmpName)
+        if self.fmt == 'zip':
+            self.current.write(tmpName, member)
+        else:
+            self.current.add(tmpName, member)
+        os.remove(tmpName)
+
+
+    def close(self):
+        """
+        Close all archives, write their indices and remove the temporary directory
+        """
+        for [archiveName, archive] in sorted(self.archives.items()):
+            archive.close()
+            writeIndex(archiveName)
+        self.archives = {}
+        self.members = {}
+        self.current = None
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+        return []
@@ -0,0 +1,144 @@
+import os
+import json
+
+# json strings are unicode in python 2
+STRING = (str, type(u''))
+NUMBER = (int, float)
+
+# The schemas of the JSON configurations of the scripts. A dict requires all of its keys, a list with one element is a
+# list with entries of that schema and a list with more elements is a list with exactly these (positional) entries
+EXTRACT_FIT_CANVAS_SCHEMA = {'name_regex': STRING, 'file_extensions': [STRING], 'output_dir': STRING,
+                             'input_path': STRING, 'input_files': [STRING]}
+
+EXTRACT_PLOTS_SCHEMA = {'inputs': [{'data_file': STRING, 'mc_file': STRING, 'output_path': STRING,
+                                    'basedir': STRING, 'ID': STRING, 'scenario': STRING, 'trigger': STRING,
+                                    'outfile_add': STRING}]}
+
+MAKE_PLOTS_SCHEMA = {'plotting_defaults': {'xlow': NUMBER, 'xhigh': NUMBER, 'elow': NUMBER, 'ehigh': NUMBER,
+                                           'rlow': NUMBER, 'rhigh': NUMBER, 'tleft': NUMBER, 'tlow': NUMBER,
+                                           'tright': NUMBER, 'tup': NUMBER, 'lright': NUMBER, 'yOffset': NUMBER},
+                     'file_endings': [STRING], 'input_path': STRING, 'output_path': STRING,
+                     'input_files': [[STRING, STRING, STRING, STRING, dict, [NUMBER]]]}
+
+CREATE_PKL_SCHEMA = {'binnings': dict, 'input_files': {'path': STRING, 'files': [[STRING, STRING, STRING, STRING]]},
+                     'pickle_filename': STRING, 'root_output_filename': STRING}
+
+
+def getTypeName(types):
+    """
+    Get a readable name of the passed type (or tuple of types)
+    """
+    if types is STRING:
+        return 'string'
+    if types is NUMBER:
+        return 'number'
+    return types.__name__
+
+
+def validateSchema(obj, schema, where, errors):
+    """
+    Check that obj follows the passed schema and append a message to errors for everything that does not.
+    where is the location of obj in the configuration (used in the messages)
+    """
+    if isinstance(schema, dict):
+        if not isinstance(obj, dict):
+            errors.append('{}: expected an object'.format(where))
+            return
+        for [key, subSchema] in sorted(schema.items()):
+            if key not in obj:
+                errors.append('{}: missing key \'{}\''.format(where, key))
+            else:
+                validateSchema(obj[key], subSchema, '{}.{}'.format(where, key), errors)
+
+    elif isinstance(schema, list):
+        if not isinstance(obj, list):
+            errors.append('{}: expected a list'.format(where))
+            return
+        if len(schema) == 1:
+            for [i, entry] in enumerate(obj):
+                validateSchema(entry, schema[0], '{}[{}]'.format(where, i), errors)
+        elif len(obj) != len(schema):
+            errors.append('{}: expected {} entries, got {}'.format(where, len(schema), len(obj)))
+        else:
+            for [i, [entry, subSchema]] in enumerate(zip(obj, schema)):
+                validateSchema(entry, subSchema, '{}[{}]'.format(where, i), errors)
+
+    # bool is a subclass of int, but never meant as a number here
+    elif not isinstance(obj, schema) or (schema is NUMBER and isinstance(obj, bool)):
+        errors.append('{}: expected a {}, got {}'.format(where, getTypeName(schema), repr(obj)))
+
+
+class ExecutionPlan(object):
+    """
+    Collect what a script would do (inputs it reads, outputs it writes) and all problems with its configuration,
+    without doing any actual work (and without loading ROOT)
+    """
+
+    def __init__(self, name):
+        """
+        Initialize: empty plan for the script (or configuration) with the passed name
+        """
+        self.name = name
+        self.inputs = []
+        self.outputs = []
+        self.errors = []
+
+
+    def validate(self, config, schema):
+        """
+        Validate the configuration against the schema. Returns True if there are no problems
+        """
+        nErrors = len(self.errors)
+        validateSchema(config, schema, 'config', self.errors)
+        return len(self.errors) == nErrors
+
+
+    def addInput(self, filename):
+        """
+        Register an input file, which is an error if it does not exist
+        """
+        self.inputs.append(filename)
+        if not os.path.exists(filename):
+            self.errors.append('input file {} does not exist'.format(filename))
+
+
+    def addOutput(self, filename):
+        """
+        Register an output file (or a description of the outputs if they can not be known in advance)
+        """
+        self.outputs.append(filename)
+
+
+    def report(self):
+        """
+        Print the plan and all found problems. Returns the exit code (0 if there are no problems, 1 otherwise)
+        """
+        print('Plan for {}:'.format(self.name))
+        print('  {} inputs:'.format(len(self.inputs)))
+        for filename in self.inputs:
+            print('    {}'.format(filename))
+        print('  {} outputs:'.format(len(self.outputs)))
+        for filename in self.outputs:
+            print('    {}'.format(filename))
+        if self.errors:
+            print('  {} problems:'.format(len(self.errors)))
+            for err in self.errors:
+                print('    {}'.format(err))
+        else:
+            print('  no problems found')
+        return 1 if self.errors else 0
+
+
+def loadConfig(plan, filename):
+    """
+    Read the JSON configuration from filename. Problems are added to the plan and None is returned in this case
+    """
+    if not os.path.exists(filename):
+        plan.errors.append('configuration {} does not exist'.format(filename))
+        return None
+    try:
+        with open(filename, 'r') as f:
+            return json.loads(f.read())
+    except ValueError as err:
+        plan.errors.append('configuration {} is not valid JSON: {}'.format(filename, err))
+        return None
@@ -0,0 +1,217 @@
+import os
+import json
+import array
+import hashlib
+
+from miscHelpers import condMkDir
+
+
+def getFileIdentity(filename):
+    """
+    Get something that identifies the content of a file without having to read it.
+    For local files this is the absolute path, the size and the modification time, for remote files (e.g. root://)
+    only the name can be used.
+    """
+    if '://' in filename or not os.path.exists(filename):
+        return [filename]
+    stat = os.stat(filename)
+    return [os.path.abspath(filename), stat.st_size, int(stat.st_mtime)]
+
+
+def getCacheKey(effDef):
+    """
+    Get the key under which the binned datasets of the passed EfficiencyDefinition are stored.
+    It is the hash of the input file identities, the denominator and the pass cuts, the binning, the mass variable and
+    the number of bins for the fit.
+    """
+    desc = effDef.getDescription()
+    desc["inputs"] = [getFileIdentity(f) for f in effDef.getInputFiles()]
+    return hashlib.sha1(json.dumps(desc, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class BinnedDatasetCache(object):
+    """
+    Disk cache for the per-bin pass and fail mass histograms of an efficiency.
+    Every entry is one .root file named after its key. The modification time of a file is used as the time of its last
+    usage, and the least recently used entries are removed as soon as the total size exceeds maxSize (in bytes).
+    """
+
+    def __init__(self, cacheDir, maxSize):
+        """
+        Initialize: store the cache directory (which is created if necessary) and the maximum size in bytes
+        """
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+        condMkDir(cacheDir)
+
+
+    def getPath(self, key):
+        """Get the path of the file in which the entry with the passed key is (or would be) stored"""
+        return os.path.join(self.cacheDir, key + '.root')
+
+
+    def get(self, key):
+        """
+        Get the filename of the cache entry for the passed key or None if it is not present.
+        A hit marks the entry as recently used.
+        """
+        path = self.getPath(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path, None)
+        return path
+
+
+    def put(self, key, filename):
+        """
+        Move the passed file into the cache under the passed key and evict old entries if necessary.
+        The file has to be on the same filesystem as the cache (e.g. created via getTmpPath) for the move to be atomic.
+        """
+        path = self.getPath(key)
+        os.rename(filename, path)
+        self.evict(path)
+        return path
+
+
+    def getTmpPath(self, key):
+        """Get a path in the cache directory that can be used to create a new entry before calling put"""
+        return os.path.join(self.cacheDir, '.{}.{}.tmp.root'.format(key, os.getpid()))
+
+
+    def getOrFill(self, effDef, fillFunc=None):
+        """
+        Get the filename containing the binned datasets of the passed EfficiencyDefinition. If it is not yet in the
+        cache, fillFunc(effDef, filename) is called to create it (default is fillBinnedDatasets, i.e. a scan of the
+        input trees).
+        """
+        key = getCacheKey(effDef)
+        path = self.get(key)
+        if path is not None:
+            return path
+
+        if fillFunc is None:
+            fillFunc = fillBinnedDatasets
+        tmpPath = self.getTmpPath(key)
+        fillFunc(effDef, tmpPath)
+        return self.put(key, tmpPath)
+
+
+    def getEntries(self):
+        """Get a list of [mtime, size, path] of all entries in the cache, least recently used first"""
+        entries = []
+        for fn in os.listdir(self.cacheDir):
+            if fn.endswith('.root') and not fn.startswith('.'):
+                path = os.path.join(self.cacheDir, fn)
+                stat = os.stat(path)
+                entries.append([stat.st_mtime, stat.st_size, path])
+        return sorted(entries)
+
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used entries until the total size of the cache is below maxSize.
+        The entry with the path keep is never removed (even if it alone is larger than maxSize).
+        """
+        entries = self.getEntries()
+        totalSize = sum(e[1] for e in entries)
+        for [_, size, path] in entries:
+            if totalSize <= self.maxSize:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            totalSize -= size
+
+
+def fillBinnedDatasets(effDef, filename, entryList=None):
+    """
+    Scan the input trees of the passed EfficiencyDefinition once for the passing and once for the failing probes and
+    store the mass histograms (with binsForFit bins) of every bin in the file with the passed filename.
+    The histograms are named <binName>__pass and <binName>__fail. Only up to two binned dimensions are supported.
+    If an entryList of the denominator is passed (see entryLists.getChainEntryList), only its entries are visited.
+    """
+    import ROOT as r
+    dims = effDef.getBinnedDimensions()
+    if len(dims) > 2:
+        raise ValueError('Cannot cache {} with more than two binned variables'.format(effDef.name))
+
+    chain = r.TChain(effDef.getTreeName())
+    for f in effDef.getInputFiles():
+        chain.Add(f)
+    if entryList is not None:
+        chain.SetEntryList(entryList)
+
+    [mass, mLow, mHigh] = effDef.getMassVariable()
+    nBins = effDef.getNBinsForFit()
+    weight = effDef.getWeight()
+    denCut = effDef.getDenominatorCut() if entryList is None else '1'
+    passCut = effDef.getPassCut()
+
+    # TTree::Project expects the variables in reversed order (i.e. z:y:x)
+    varexp = ':'.join(reversed([mass] + [d[0] for d in dims]))
+
+    r.gROOT.cd()
+    hists = {}
+    for [state, sel] in [['pass', '{} && {}'.format(denCut, passCut)],
+                         ['fail', '{} && !({})'.format(denCut, passCut)]]:
+        if weight:
+            sel = '{}*({})'.format(weight, sel)
+        hists[state] = createHist('cache_' + state, nBins, mLow, mHigh, dims)
+        chain.Project(hists[state].GetName(), varexp, sel)
+
+    outfile = r.TFile.Open(filename, 'recreate')
+    outfile.cd()
+    for [binName, indices] in effDef.getBinNames():
+        for state in ['pass', 'fail']:
+            projectBin(hists[state], '__'.join([binName, state]), indices).Write()
+
+    info = r.TNamed('cache_info', json.dumps(effDef.getDescription(), sort_keys=True))
+    info.Write()
+    outfile.Close()
+
+    for h in hists.values():
+        h.Delete()
+
+
+def createHist(name, nBins, mLow, mHigh, dims):
+    """
+    Create the (up to three-dimensional) histogram with the mass on the x-axis and the binned variables on the others
+    """
+    import ROOT as r
+    edges = [array.array('d', d[1]) for d in dims]
+    massEdges = array.array('d', [mLow + i * (mHigh - mLow) / nBins for i in range(nBins + 1)])
+    if len(dims) == 0:
+        hist = r.TH1D(name, '', nBins, mLow, mHigh)
+    elif len(dims) == 1:
+        hist = r.TH2D(name, '', nBins, massEdges, len(edges[0]) - 1, edges[0])
+    else:
+        hist = r.TH3D(name, '', nBins, massEdges, len(edges[0]) - 1, edges[0], len(edges[1]) - 1, edges[1])
+    hist.Sumw2()
+    return hist
+
+
+def projectBin(hist, name, indices):
+    """
+    Get the mass histogram of one bin (indices are 0-based bin indices along the binned dimensions)
+    """
+    if len(indices) == 0:
+        return hist.Clone(name)
+    if len(indices) == 1:
+        return hist.ProjectionX(name, indices[0] + 1, indices[0] + 1, 'e')
+    return hist.ProjectionX(name, indices[0] + 1, indices[0] + 1, indices[1] + 1, indices[1] + 1, 'e')
+
+
+def getBinHists(filename, binName):
+    """
+    Get the pass and the fail histogram of the bin with the passed name from a cache file.
+    The histograms are detached from the file, so that it can be closed afterwards.
+    """
+    import ROOT as r
+    f = r.TFile.Open(filename)
+    hists = []
+    for state in ['pass', 'fail']:
+        h = f.Get('__'.join([binName, state]))
+        h.SetDirectory(0)
+        hists.append(h)
+    f.Close()
+    return hists
@@ -0,0 +1,234 @@
+import re
+import json
+
+
+def getCategoryStates(definition):
+    """
+    Get the mapping of state names to values from a category definition of the TagProbeFitTreeAnalyzer,
+    e.g. 'dummy[pass=1,fail=0]' -> {'pass': 1, 'fail': 0}
+    """
+    states = {}
+    match = re.search(r'\[(.*)\]', definition)
+    if match is None:
+        return states
+
+    for state in match.group(1).split(','):
+        [name, value] = state.split('=')
+        states[name.strip()] = int(value)
+
+    return states
+
+
+def rangeCut(var, low, high):
+    """
+    Get the selection string for low <= var < high (i.e. the bin convention of RooFit)
+    """
+    return '({0} >= {1!r} && {0} < {2!r})'.format(var, float(low), float(high))
+
+
+class EfficiencyDefinition(object):
+    """
+    All the information that is needed to redo the selection of one efficiency of a TagProbeFitTreeAnalyzer module
+    as it is stored in the manifest JSON file written by the fit configuration (see fitConfig/fitMuonID_2016.py).
+    Provides all the selections as strings that can directly be passed to TTree::Draw.
+    """
+
+    def __init__(self, module, name):
+        """
+        Initialize from the module dictionary (one entry in the 'modules' list of the manifest) and the name of the
+        efficiency in this module
+        """
+        self.module = module
+        self.name = name
+        self.eff = module["efficiencies"][name]
+        self.binnedVars = self.eff["BinnedVariables"]
+
+
+    def getInputFiles(self):
+        """Get the list of input files"""
+        return [str(f) for f in self.module["input_files"]]
+
+
+    def getOutputFile(self):
+        """
+        Get the name of the output file this efficiency ends up in. For modules containing several IDs (mergeIDs) this
+        is the per ID file that is produced by splitMergedOutput.py
+        """
+        return str(self.module.get("split", {}).get(self.name, self.module["output_file"]))
+
+
+    def getTreeName(self):
+        """Get the path of the TTree inside the input files"""
+        return '/'.join([str(self.module["input_directory"]), str(self.module["tree"])])
+
+
+    def getMassVariable(self):
+        """
+        Get the name, the lower and the upper bound of the (first) unbinned variable, which is the mass in all
+        configurations that are currently used
+        """
+        mass = str(self.eff["UnbinnedVariables"][0])
+        varDef = self.module["variables"][mass]
+        return [mass, float(varDef[1]), float(varDef[2])]
+
+
+    def getNBinsForFit(self):
+        """Get the number of bins that is used in a binned fit"""
+        return int(self.module["bins_for_fit"])
+
+
+    def isBinnedFit(self):
+        """Check if the fits of this efficiency are binned (with getNBinsForFit bins) or unbinned"""
+        return bool(self.module.get("binned_fit", True))
+
+
+    def getWeight(self):
+        """
+        Get the weight variable if it is used for this efficiency or an empty string if not.
+        The TagProbeFitTreeAnalyzer only uses the weight if it is also among the unbinned variables.
+        """
+        weight = str(self.module["weight"])
+        if weight and weight in self.eff["UnbinnedVariables"]:
+            return weight
+        return ''
+
+
+    def getBinnedDimensions(self):
+        """
+        Get the variables that are actually binned (i.e. have more than one bin) together with their bin edges.
+        Returns a list of [variable, edges] sorted by variable name.
+        """
+        dims = []
+        for var in sorted(self.binnedVars.keys()):
+            values = self.binnedVars[var]
+            if isNumeric(values) and len(values) > 2:
+                dims.append([str(var), [float(v) for v in values]])
+        return dims
+
+
+    def getBinNames(self):
+        """
+        Get the names of all bins together with the bin index along each binned dimension.
+        Returns a list of [name, [index per dimension]]. The names are built the same way the TagProbeFitter
+        builds them (e.g. 'pt_bin0__abseta_bin1')
+        """
+        bins = [['', []]]
+        for [var, edges] in self.getBinnedDimensions():
+            bins = [[b[0] + ('__' if b[0] else '') + '{}_bin{}'.format(var, i), b[1] + [i]]
+                    for b in bins for i in range(len(edges) - 1)]
+        return bins
+
+
+    def getDenominatorCut(self):
+        """
+        Get the selection string of the denominator, i.e. all binned variables (range and category cuts) as well as
+        the range of the unbinned variables
+        """
+        cuts = []
+        for var in sorted(self.binnedVars.keys()):
+            values = self.binnedVars[var]
+            if isNumeric(values):
+                cuts.append(rangeCut(var, values[0], values[-1]))
+            else:
+                cuts.append(self.getCategoryCut(var, values))
+
+        for var in self.eff["UnbinnedVariables"]:
+            varDef = self.module["variables"][var]
+            cuts.append('({0} >= {1!r} && {0} <= {2!r})'.format(var, float(varDef[1]), float(varDef[2])))
+
+        return ' && '.join(cuts)
+
+
+    def getPassCut(self):
+        """
+        Get the selection string of the numerator (on top of the denominator) from the EfficiencyCategoryAndState
+        """
+        catAndState = self.eff["EfficiencyCategoryAndState"]
+        cuts = []
+        for i in range(0, len(catAndState), 2):
+            name = catAndState[i]
+            state = catAndState[i + 1]
+            if name in self.module["cuts"]:
+                cuts.append(self.getThresholdCut(name, state))
+            else:
+                cuts.append(self.getCategoryCut(name, [state]))
+
+        return ' && '.join(cuts)
+
+
+    def getCategoryCut(self, category, states):
+        """
+        Get the selection string that requires the category to be in any of the passed states
+        """
+        stateValues = getCategoryStates(self.module["categories"][category][1])
+        return '(' + ' || '.join(['{} == {}'.format(category, stateValues[s]) for s in states]) + ')'
+
+
+    def getThresholdCut(self, cutName, state):
+        """
+        Get the selection string for a cut defined in the Cuts PSet. The cut is applied on either a variable or an
+        expression defined in the Expressions PSet.
+        """
+        [_, varName, threshold] = self.module["cuts"][cutName]
+        if varName in self.module["expressions"]:
+            varName = self.module["expressions"][varName][1]
+        op = '>' if state == 'above' else '<'
+        return '(({}) {} {})'.format(varName, op, threshold)
+
+
+    def getPdfDefinition(self, binName):
+        """
+        Get the name and the list of workspace factory strings of the PDF that is used for the bin with the passed name.
+        The BinToPDFmap contains the default PDF followed by pairs of a regex (matched against the bin name) and a PDF
+        """
+        pdfMap = self.eff.get("BinToPDFmap", [])
+        if not pdfMap:
+            raise ValueError('Efficiency {} has no BinToPDFmap'.format(self.name))
+        pdfName = pdfMap[0]
+        for i in range(1, len(pdfMap) - 1, 2):
+            if re.search(pdfMap[i], binName):
+                pdfName = pdfMap[i + 1]
+        return [str(pdfName), [str(s) for s in self.module["pdfs"][pdfName]]]
+
+
+    def getDescription(self):
+        """
+        Get a dictionary containing everything that defines the content of the selected datasets
+        """
+        return {"trees": [self.getTreeName()],
+                "denominator": self.getDenominatorCut(),
+                "pass": self.getPassCut(),
+                "binning": self.getBinnedDimensions(),
+                "mass": self.getMassVariable(),
+                "binsForFit": self.getNBinsForFit(),
+                "weight": self.getWeight()}
+
+
+def isNumeric(values):
+    """
+    Check if the passed list of values of a binned variable are bin edges (or category states)
+    """
+    return len(values) > 0 and all(isinstance(v, (int, float)) for v in values)
+
+
+def loadManifest(filename):
+    """
+    Load the manifest JSON file
+    """
+    with open(filename, 'r') as f:
+        return json.loads(f.read())
+
+
+def getEfficiencies(manifest, nameRgx='.*'):
+    """
+    Get the EfficiencyDefinitions of all efficiencies in all modules of the manifest, where the name of the
+    efficiency matches the passed regex
+    """
+    rgx = re.compile(nameRgx)
+    effs = []
+    for module in manifest["modules"]:
+        for name in sorted(module["efficiencies"].keys()):
+            if rgx.search(name):
+                effs.append(EfficiencyDefinition(module, name))
+
+    return effs
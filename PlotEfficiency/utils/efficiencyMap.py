@@ -0,0 +1,226 @@
+import re
+import json
+
+# the categories of graphs stored by extractPlots.py
+CATEGORIES = ['DATA', 'MC', 'RATIO']
+# the values stored per bin and category
+MAP_VALUES = ['efficiency', 'err_low', 'err_high']
+
+
+def parseAbsetaRange(filename, regex=r'abseta_([0-9]+p[0-9]+)_([0-9]+p[0-9]+)'):
+    """
+    Get the abseta range [low, high] from a filename containing the trail produced by ptAbsetaOutputFileTrail in the
+    fit configuration (e.g. abseta_0p0_0p9). Returns None if the filename does not match the regex
+    """
+    match = re.search(regex, filename)
+    if match is None:
+        return None
+    return [float(v.replace('p', '.')) for v in match.groups()]
+
+
+def isClose(a, b, tolerance):
+    """
+    Check if the two values are equal within the passed relative tolerance
+    """
+    return abs(a - b) <= tolerance * max(abs(a), abs(b), 1.0)
+
+
+def mergeEdges(edgeLists, tolerance=1e-6):
+    """
+    Get the sorted union of all passed lists of bin edges, where edges that are equal within tolerance are merged
+    """
+    edges = []
+    for e in sorted(v for edgeList in edgeLists for v in edgeList):
+        if not edges or not isClose(edges[-1], e, tolerance):
+            edges.append(e)
+    return edges
+
+
+def findEdge(edges, value, tolerance=1e-6):
+    """
+    Get the index of the edge that is equal to value within tolerance (-1 if there is none)
+    """
+    for i, e in enumerate(edges):
+        if isClose(e, value, tolerance):
+            return i
+    return -1
+
+
+def getPtRange(s):
+    """
+    Get the pt range [low, high] covered by the points of all categories of the passed slice (None if it has none)
+    """
+    points = [p for pts in s['points'].values() for p in pts]
+    if not points:
+        return None
+    return [min(p[0] for p in points), max(p[1] for p in points)]
+
+
+def rangesOverlap(range1, range2, tolerance=1e-6):
+    """
+    Check if the two ranges [low, high] overlap (ranges that only touch within tolerance do not overlap)
+    """
+    [lo, hi] = [max(range1[0], range2[0]), min(range1[1], range2[1])]
+    return lo < hi and not isClose(lo, hi, tolerance)
+
+
+def getAbsetaGrid(slices, tolerance=1e-6):
+    """
+    Sort the passed slices by abseta and check them for gaps and overlaps. Slices with the same abseta range (e.g. the
+    pt splits of one abseta slice) go into the same row, as long as their pt ranges do not overlap.
+    Returns the abseta edges (gaps between slices become an additional empty row), the row index of every slice (in
+    the order of the passed slices) and a list of problems found
+    """
+    order = sorted(range(len(slices)), key=lambda i: slices[i]['abseta'])
+    edges = []
+    rows = [-1] * len(slices)
+    problems = []
+    rowPtRanges = [] # [name, pt range] of all slices in the current row
+    for i in order:
+        [lo, hi] = slices[i]['abseta']
+        ptRange = getPtRange(slices[i])
+        if len(edges) > 1 and isClose(edges[-2], lo, tolerance) and isClose(edges[-1], hi, tolerance):
+            overlapping = [name for [name, other] in rowPtRanges
+                           if ptRange is not None and other is not None and rangesOverlap(ptRange, other, tolerance)]
+            if overlapping:
+                problems.append('overlap in pt and abseta: {} overlaps with {}'.format(slices[i]['name'],
+                                                                                    overlapping[0]))
+                continue
+            rows[i] = len(edges) - 2
+            rowPtRanges.append([slices[i]['name'], ptRange])
+            continue
+        if edges and not isClose(edges[-1], lo, tolerance):
+            if lo > edges[-1]:
+                problems.append('gap in abseta: [{}, {}] not covered'.format(edges[-1], lo))
+                edges.append(lo)
+            else:
+                problems.append('overlap in abseta: [{}, {}] of {} overlaps with the previous slice'.format(
+                    lo, hi, slices[i]['name']))
+                continue
+        if not edges:
+            edges.append(lo)
+        rows[i] = len(edges) - 1
+        rowPtRanges = [[slices[i]['name'], ptRange]]
+        edges.append(hi)
+    return [edges, rows, problems]
+
+
+def stitchSlices(slices, tolerance=1e-6):
+    """
+    Stitch the passed abseta slices into one dense map. Slices with the same abseta range but different pt ranges are
+    merged into one row.
+    Each slice is a dict with the keys 'name', 'abseta' ([low, high]) and 'points', which contains a list of
+    [pt low, pt high, efficiency, err_low, err_high] for every category.
+    Returns the map (a dict with the pt and abseta edges and for every category the values as nested lists indexed
+    [abseta bin][pt bin], with nan for missing bins) and the list of problems found (gaps, overlaps, bins that do not
+    align with the common pt binning)
+    """
+    nan = float('nan')
+    [absetaEdges, rows, problems] = getAbsetaGrid(slices, tolerance)
+    ptEdges = mergeEdges([[p[0], p[1]] for [i, s] in enumerate(slices) if rows[i] >= 0
+                          for points in s['points'].values() for p in points], tolerance)
+
+    effMap = {'pt_edges': ptEdges, 'abseta_edges': absetaEdges}
+    for cat in CATEGORIES:
+        effMap[cat] = dict((v, [[nan] * (len(ptEdges) - 1) for j in range(len(absetaEdges) - 1)]) for v in MAP_VALUES)
+
+    for [iSlice, s] in enumerate(slices):
+        if rows[iSlice] < 0:
+            continue
+        for [cat, points] in s['points'].items():
+            for p in points:
+                [iLo, iHi] = [findEdge(ptEdges, p[0], tolerance), findEdge(ptEdges, p[1], tolerance)]
+                if iHi - iLo != 1:
+                    problems.append('{} {}: pt bin [{}, {}] does not align with the common pt binning'.format(
+                        s['name'], cat, p[0], p[1]))
+                    continue
+                for [v, val] in zip(MAP_VALUES, p[2:]):
+                    if effMap[cat][v][rows[iSlice]][iLo] == effMap[cat][v][rows[iSlice]][iLo]: # not nan
+                        problems.append('{} {}: pt bin [{}, {}] is filled more than once'.format(
+                            s['name'], cat, p[0], p[1]))
+                        break
+                    effMap[cat][v][rows[iSlice]][iLo] = val
+
+    for cat in CATEGORIES:
+        nMissing = sum(1 for row in effMap[cat]['efficiency'] for val in row if val != val)
+        if nMissing > 0:
+            problems.append('{}: {} of {} bins are not filled'.format(
+                cat, nMissing, (len(ptEdges) - 1) * (len(absetaEdges) - 1)))
+
+    return [effMap, problems]
+
+
+def writeMapJson(effMap, filename):
+    """
+    Write the map into a JSON file (nan is stored as null)
+    """
+    def toJson(val):
+        if isinstance(val, list):
+            return [toJson(v) for v in val]
+        if isinstance(val, dict):
+            return dict((k, toJson(v)) for [k, v] in val.items())
+        if isinstance(val, float) and val != val:
+            return None
+        return val
+
+    with open(filename, 'w') as f:
+        json.dump(toJson(effMap), f, sort_keys=True)
+
+
+def readMapJson(filename):
+    """
+    Read a map written by writeMapJson (null is converted back to nan)
+    """
+    def fromJson(val):
+        if isinstance(val, list):
+            return [fromJson(v) for v in val]
+        if isinstance(val, dict):
+            return dict((k, fromJson(v)) for [k, v] in val.items())
+        if val is None:
+            return float('nan')
+        return val
+
+    with open(filename, 'r') as f:
+        return fromJson(json.load(f))
+
+
+def getGraphPoints(graph):
+    """
+    Get the list of [x low, x high, y, err low, err high] of all points of the passed TGraphAsymmErrors
+    """
+    from TGA_utils import getPoint
+    points = []
+    for i in range(graph.GetN()):
+        p = getPoint(graph, i)
+        points.append([p.x - p.el_x, p.x + p.eh_x, float(p.y), p.el_y, p.eh_y])
+    return points
+
+
+def createMapHists(effMap, name):
+    """
+    Create a TH2D (x: pt, y: abseta) for every category of the passed map, with the efficiency as content and the
+    larger of the two errors as error, plus one TH2D with the low and one with the high errors.
+    Missing bins are left empty.
+    """
+    import ROOT as r
+    from array import array
+    ptEdges = array('d', effMap['pt_edges'])
+    absetaEdges = array('d', effMap['abseta_edges'])
+
+    hists = []
+    for cat in CATEGORIES:
+        [hist, histLow, histHigh] = [r.TH2D('_'.join([cat, name] + suffix), ';p_{T} [GeV];|#eta|',
+                                            len(ptEdges) - 1, ptEdges, len(absetaEdges) - 1, absetaEdges)
+                                     for suffix in [[], ['err_low'], ['err_high']]]
+        for j in range(len(absetaEdges) - 1):
+            for i in range(len(ptEdges) - 1):
+                [eff, low, high] = [effMap[cat][v][j][i] for v in MAP_VALUES]
+                if eff != eff:
+                    continue
+                hist.SetBinContent(i + 1, j + 1, eff)
+                hist.SetBinError(i + 1, j + 1, max(low, high))
+                histLow.SetBinContent(i + 1, j + 1, low)
+                histHigh.SetBinContent(i + 1, j + 1, high)
+        hists += [hist, histLow, histHigh]
+
+    return hists
@@ -0,0 +1,100 @@
+import os
+import json
+import hashlib
+
+from datasetCache import getFileIdentity
+
+
+def getDenominatorKey(filename, treeName, cut):
+    """
+    Get the fingerprint of a denominator selection on the passed tree in the passed file.
+    Since the identity of the file (size and modification time) enters, a changed input file gets a new fingerprint.
+    """
+    desc = [getFileIdentity(filename), treeName, cut]
+    return hashlib.sha1(json.dumps(desc).encode('utf-8')).hexdigest()
+
+
+def getStoreFileName(filename, storeDir=None):
+    """
+    Get the name of the file in which the entry lists of the passed input file are stored. By default this is a file
+    next to the input file, if storeDir is set (e.g. because the input directory is not writable) it is in there.
+    """
+    storeName = os.path.splitext(os.path.basename(filename))[0] + '.entrylists.root'
+    if storeDir is not None:
+        return os.path.join(storeDir, storeName)
+    return os.path.join(os.path.dirname(filename), storeName)
+
+
+def computeEntryList(filename, treeName, cut, name):
+    """
+    Compute the TEntryList of all entries of the tree in the passed file that pass the cut.
+    The returned list is not attached to any file.
+    """
+    import ROOT as r
+    f = r.TFile.Open(filename)
+    tree = f.Get(treeName)
+    r.gROOT.cd()
+    tree.Draw('>>' + name, cut, 'entrylist')
+    elist = r.gROOT.FindObject(name)
+    elist.SetDirectory(0)
+    f.Close()
+    return elist
+
+
+def getFileEntryList(filename, treeName, cut, storeDir=None):
+    """
+    Get the TEntryList of the denominator cut on the passed input file. If it has already been computed it is read
+    from the store file, otherwise it is computed and stored there.
+    """
+    import ROOT as r
+    key = getDenominatorKey(filename, treeName, cut)
+    name = 'elist_' + key
+
+    storeName = getStoreFileName(filename, storeDir)
+    store = r.TFile.Open(storeName, 'update')
+    elist = store.Get(name)
+    if elist:
+        elist.SetDirectory(0)
+    else:
+        elist = computeEntryList(filename, treeName, cut, name)
+        store.cd()
+        elist.Write(name)
+        r.TNamed('info_' + key, json.dumps([treeName, cut])).Write()
+    store.Close()
+
+    elist.SetTreeName(treeName)
+    elist.SetFileName(filename)
+    return elist
+
+
+def getChainEntryList(effDef, storeDir=None):
+    """
+    Get the TEntryList of the denominator of the passed EfficiencyDefinition for all of its input files.
+    It can directly be used with TChain::SetEntryList on a chain built from the same input files.
+    """
+    import ROOT as r
+    treeName = effDef.getTreeName()
+    cut = effDef.getDenominatorCut()
+    chainList = r.TEntryList('den_' + effDef.name, cut)
+    chainList.SetDirectory(0)
+    for filename in effDef.getInputFiles():
+        chainList.Add(getFileEntryList(filename, treeName, cut, storeDir))
+
+    return chainList
+
+
+def groupByDenominator(effDefs):
+    """
+    Group the passed EfficiencyDefinitions by their denominator (input files, tree and cut).
+    Returns a list of lists of EfficiencyDefinitions, where all members of one list share the same denominator.
+    """
+    groups = {}
+    order = []
+    for eff in effDefs:
+        key = json.dumps([eff.getInputFiles(), eff.getTreeName(), eff.getDenominatorCut()])
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(eff)
+
+    return [groups[k] for k in order]
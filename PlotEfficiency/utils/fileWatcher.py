@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import errno
+import select
+import struct
+import fnmatch
+import threading
+import ctypes
+import ctypes.util
+
+try:
+    import queue
+except ImportError: # python 2
+    import Queue as queue
+
+# inotify event masks (see inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+EVENT_HEADER = struct.Struct('iIII')
+# filesystem types (as in /proc/mounts) on which inotify does not see the writes of other nodes (e.g. of batch jobs)
+NETWORK_FILESYSTEMS = ['afs', 'nfs', 'nfs4', 'fuse.eos', 'eos', 'cifs', 'smbfs', 'smb3', 'lustre', 'gpfs', 'ceph',
+                       'fuse.ceph', 'glusterfs', 'fuse.glusterfs', 'fuse.sshfs', '9p']
+
+
+class PollingWatcher(object):
+    """
+    Watch a directory for files matching a pattern by listing it regularly.
+    A file is reported as ready (once) when its size and modification time have not changed for settleTime seconds.
+    """
+
+    def __init__(self, directory, pattern, settleTime=30.0, pollInterval=5.0):
+        """
+        Initialize: store the settings, nothing has been seen yet
+        """
+        self.directory = directory
+        self.pattern = pattern
+        self.settleTime = settleTime
+        self.pollInterval = pollInterval
+        self.candidates = {} # filename -> [size, mtime, time since when unchanged]
+        self.reported = set()
+        self.lastPoll = 0
+
+
+    def poll(self, timeout):
+        """
+        Wait at most timeout seconds and return the list of files that became ready since the last call
+        """
+        time.sleep(max(0, min(timeout, self.lastPoll + self.pollInterval - time.time())))
+        self.lastPoll = time.time()
+
+        ready = []
+        for fn in sorted(os.listdir(self.directory)):
+            if fn in self.reported or not fnmatch.fnmatch(fn, self.pattern):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, fn))
+            except OSError: # removed in the meantime
+                continue
+            state = [stat.st_size, stat.st_mtime]
+            if self.candidates.get(fn, [None, None])[:2] != state:
+                self.candidates[fn] = state + [self.lastPoll]
+            elif self.lastPoll - self.candidates[fn][2] >= self.settleTime:
+                del self.candidates[fn]
+                self.reported.add(fn)
+                ready.append(os.path.join(self.directory, fn))
+        return ready
+
+
+class InotifyWatcher(object):
+    """
+    Watch a directory for files matching a pattern via inotify (Linux only).
+    A file is reported as ready when it has been closed after writing or when it has been moved into the directory.
+    """
+
+    def __init__(self, directory, pattern):
+        """
+        Initialize: set up the inotify watch. Raises an OSError if inotify is not available
+        """
+        self.directory = directory
+        self.pattern = pattern
+        libcName = ctypes.util.find_library('c')
+        if libcName is None:
+            raise OSError('Cannot find libc')
+        self.libc = ctypes.CDLL(libcName, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init'):
+            raise OSError('inotify is not available')
+        self.fd = self.libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init failed')
+        if self.libc.inotify_add_watch(self.fd, directory.encode('utf-8'), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for {}'.format(directory))
+        self.reported = set()
+
+
+    def poll(self, timeout):
+        """
+        Wait at most timeout seconds and return the list of files that became ready since the last call
+        """
+        try:
+            [readable, w, x] = select.select([self.fd], [], [], timeout)
+        except select.error as err:
+            if err.args[0] == errno.EINTR:
+                return []
+            raise
+        if not readable:
+            return []
+
+        data = os.read(self.fd, 65536)
+        ready = []
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            [wd, mask, cookie, length] = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            fn = data[pos:pos + length].rstrip(b'\0').decode('utf-8')
+            pos += length
+            # every file is only reported once (as by the polling watcher), also if it was already listed (e.g. when
+            # it was completed between setting up the watch and the initial listing of the directory)
+            if fn not in self.reported and fnmatch.fnmatch(fn, self.pattern):
+                self.reported.add(fn)
+                ready.append(os.path.join(self.directory, fn))
+        return ready
+
+
+def getFilesystemType(directory, mountsFile='/proc/mounts'):
+    """
+    Get the type of the filesystem the directory is on from the mount with the longest matching mount point (None if
+    it cannot be determined, e.g. when not running on Linux)
+    """
+    path = os.path.realpath(directory)
+    best = ['', None]
+    try:
+        with open(mountsFile, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # spaces etc. are escaped as octal numbers in the mount points
+                mountPoint = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+                inside = path == mountPoint or path.startswith(os.path.join(mountPoint, ''))
+                if inside and len(mountPoint) >= len(best[0]):
+                    best = [mountPoint, fields[2]]
+    except IOError:
+        return None
+    return best[1]
+
+
+def createWatcher(directory, pattern, settleTime=30.0, pollInterval=5.0, usePolling=False):
+    """
+    Create an InotifyWatcher if possible (and usePolling is False), otherwise a PollingWatcher.
+    Directories on network filesystems are always polled, since inotify only sees the writes of the local node there
+    """
+    fsType = getFilesystemType(directory)
+    if not usePolling and fsType in NETWORK_FILESYSTEMS:
+        print('{} is on a network filesystem ({}), on which inotify does not see the writes of other nodes, '
+              'polling instead'.format(directory, fsType))
+        usePolling = True
+    if not usePolling:
+        try:
+            return InotifyWatcher(directory, pattern)
+        except (OSError, AttributeError) as err:
+            print('Cannot use inotify ({}), falling back to polling'.format(err))
+    return PollingWatcher(directory, pattern, settleTime, pollInterval)
+
+
+class BoundedWorkQueue(object):
+    """
+    Run functions in a fixed number of worker threads. At most maxQueued functions can wait to be run, submitting more
+    blocks until there is space again (so that a fast producer can not run away from the workers).
+    """
+
+    def __init__(self, nWorkers=2, maxQueued=10):
+        """
+        Initialize: start the worker threads
+        """
+        self.queue = queue.Queue(maxQueued)
+        self.threads = []
+        for i in range(max(nWorkers, 1)):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+
+    def submit(self, func, *args):
+        """
+        Schedule func(*args) to be run by one of the workers
+        """
+        self.queue.put((func, args))
+
+
+    def close(self):
+        """
+        Wait until all submitted functions have been run and stop the workers
+        """
+        self.queue.join()
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+    def _work(self):
+        """
+        Main loop of the worker threads
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            try:
+                item[0](*item[1])
+            except Exception as err: # keep the worker alive
+                print('Error in {}: {}'.format(getattr(item[0], '__name__', item[0]), err))
+            self.queue.task_done()
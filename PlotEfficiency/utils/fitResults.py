@@ -0,0 +1,233 @@
+import os
+import sqlite3
+
+# the columns of the table of fit results (one row per RooFitResult)
+FIT_COLUMNS = ['inputFile', 'effName', 'bin', 'status', 'covQual', 'edm', 'minNll', 'numInvalidNLL', 'nMinimizerCalls',
+               'eff', 'effErrLo', 'effErrHi', 'effAtLimit']
+# the columns of the table of final parameters (one row per floating parameter, fit is the row in the fit table)
+PARAM_COLUMNS = ['fit', 'name', 'value', 'error', 'atLimit']
+
+# the name of the efficiency parameter in the fits of the TagProbeFitTreeAnalyzer
+EFF_PAR_NAME = 'efficiency'
+# the name under which the TagProbeFitTreeAnalyzer stores the RooFitResult in the directory of every bin
+FIT_RESULT_NAME = 'fitresults'
+# the distance (relative to the range) below which a parameter is considered to be at its limit. Small enough that
+# efficiencies on the plateau (above 0.999) are not flagged
+LIMIT_TOLERANCE = 1e-5
+
+
+def isAtLimit(par, tolerance=LIMIT_TOLERANCE):
+    """
+    Check if the value of the passed RooRealVar is at one of its limits (within tolerance relative to its range)
+    """
+    margin = tolerance * (par.getMax() - par.getMin())
+    return par.getVal() - par.getMin() < margin or par.getMax() - par.getVal() < margin
+
+
+def getErrors(par):
+    """
+    Get the low and high errors of the passed RooRealVar (the symmetric error if no asymmetric errors are available)
+    """
+    if par.hasAsymError():
+        return [abs(par.getErrorLo()), par.getErrorHi()]
+    return [par.getError(), par.getError()]
+
+
+def getFinalParameters(fitResult):
+    """
+    Get the list of all final floating parameters of the passed RooFitResult
+    """
+    pars = fitResult.floatParsFinal()
+    return [pars.at(i) for i in range(pars.getSize())]
+
+
+def splitFitPath(path):
+    """
+    Get the efficiency name and the bin name from the path of a fit result inside the file, which is
+    <basedir>/<efficiency>/<bin>/fitresults
+    """
+    parts = path.split('/')
+    if len(parts) < 3:
+        return ['', '']
+    return [parts[-3], parts[-2]]
+
+
+class FitResultTable(object):
+    """
+    Columnar table of fit qualities and final parameters that can be filled from RooFitResults and written to (or read
+    from) .npz or SQLite files
+    """
+
+    def __init__(self, fits=None, params=None):
+        """
+        Initialize: empty table or from the passed dicts of columns
+        """
+        self.fits = fits if fits is not None else dict((c, []) for c in FIT_COLUMNS)
+        self.params = params if params is not None else dict((c, []) for c in PARAM_COLUMNS)
+
+
+    def __len__(self):
+        return len(self.fits['inputFile'])
+
+
+    def addFitResult(self, filename, path, fitResult):
+        """
+        Add one row for the passed RooFitResult found at path in filename
+        """
+        [effName, binName] = splitFitPath(path)
+        effPar = fitResult.floatParsFinal().find(EFF_PAR_NAME)
+        if effPar:
+            [errLo, errHi] = getErrors(effPar)
+            eff = [effPar.getVal(), errLo, errHi, isAtLimit(effPar)]
+        else:
+            eff = [float('nan'), float('nan'), float('nan'), False]
+
+        row = [filename, effName, binName, fitResult.status(), fitResult.covQual(), fitResult.edm(),
+               fitResult.minNll(), fitResult.numInvalidNLL(), fitResult.numStatusHistory()] + eff
+        for [col, val] in zip(FIT_COLUMNS, row):
+            self.fits[col].append(val)
+
+        iFit = len(self) - 1
+        for par in getFinalParameters(fitResult):
+            for [col, val] in zip(PARAM_COLUMNS, [iFit, par.GetName(), par.getVal(), par.getError(), isAtLimit(par)]):
+                self.params[col].append(val)
+
+
+    def harvestFile(self, filename):
+        """
+        Add all RooFitResults found in the passed file (reading no other objects). Returns the number of added rows
+        """
+        import ROOT as r
+        from recurseTFile import recurseOnKeys
+        nBefore = len(self)
+        f = r.TFile.Open(filename)
+        if f == None: # message already printed by ROOT
+            return 0
+        recurseOnKeys(f, 'RooFitResult', lambda res, path: self.addFitResult(filename, path, res))
+        f.Close()
+        return len(self) - nBefore
+
+
+    def extend(self, other):
+        """
+        Append all rows of the other FitResultTable (shifting its references from the parameters to the fits)
+        """
+        offset = len(self)
+        for col in FIT_COLUMNS:
+            self.fits[col] += list(other.fits[col])
+        for col in PARAM_COLUMNS:
+            self.params[col] += list(other.params[col]) if col != 'fit' else [i + offset for i in other.params[col]]
+
+
+    def getFlagged(self, minCovQual=3):
+        """
+        Get the indices of all fits that did not converge (status != 0), have a bad covariance matrix
+        (covQual < minCovQual) or an efficiency at a parameter limit
+        """
+        return [i for i in range(len(self)) if self.fits['status'][i] != 0 or self.fits['covQual'][i] < minCovQual
+                or self.fits['effAtLimit'][i]]
+
+
+    def write(self, filename):
+        """
+        Write the table to filename. The format is deduced from the extension (.npz or .db/.sqlite)
+        """
+        if os.path.splitext(filename)[1] == '.npz':
+            self.writeNpz(filename)
+        else:
+            self.writeSqlite(filename)
+
+
+    def writeNpz(self, filename):
+        """
+        Write all columns as arrays into a compressed .npz file (the parameter columns prefixed with 'param_')
+        """
+        import numpy as np
+        arrays = dict((c, np.array(v)) for [c, v] in self.fits.items())
+        arrays.update(dict(('param_' + c, np.array(v)) for [c, v] in self.params.items()))
+        np.savez_compressed(filename, **arrays)
+
+
+    def writeSqlite(self, filename):
+        """
+        Write the tables 'fits' and 'params' into a SQLite database (replacing them if already present)
+        """
+        conn = sqlite3.connect(filename)
+        for [table, columns, data] in [['fits', FIT_COLUMNS, self.fits], ['params', PARAM_COLUMNS, self.params]]:
+            conn.execute('DROP TABLE IF EXISTS {}'.format(table))
+            conn.execute('CREATE TABLE {} ({})'.format(table, ', '.join(columns)))
+            conn.executemany('INSERT INTO {} VALUES ({})'.format(table, ', '.join(['?'] * len(columns))),
+                             zip(*[data[c] for c in columns]))
+        conn.execute('CREATE INDEX IF NOT EXISTS params_fit ON params (fit)')
+        conn.commit()
+        conn.close()
+
+
+class FitResultFilter(object):
+    """
+    Decide from a RooFitResult whether the corresponding fit needs a closer look, i.e. if it did not converge
+    (status != 0), has a bad covariance matrix (covQual < minCovQual), an efficiency at a parameter limit (within
+    limitTolerance relative to its range) or outside effRange ([min, max], None disables the check).
+    If spotCheck > 0, every spotCheck-th good fit is selected as well.
+    """
+
+    def __init__(self, minCovQual=3, effRange=None, spotCheck=0, limitTolerance=LIMIT_TOLERANCE):
+        """
+        Initialize: store the criteria and reset the counters
+        """
+        self.minCovQual = minCovQual
+        self.effRange = effRange
+        self.spotCheck = spotCheck
+        self.limitTolerance = limitTolerance
+        self.nFits = 0
+        self.nGood = 0
+        self.nSelected = 0
+
+
+    def isProblematic(self, fitResult):
+        """
+        Check the passed RooFitResult against all criteria
+        """
+        if fitResult.status() != 0 or fitResult.covQual() < self.minCovQual:
+            return True
+        effPar = fitResult.floatParsFinal().find(EFF_PAR_NAME)
+        if not effPar:
+            return False
+        if isAtLimit(effPar, self.limitTolerance):
+            return True
+        return self.effRange is not None and not self.effRange[0] <= effPar.getVal() <= self.effRange[1]
+
+
+    def __call__(self, fitResult):
+        """
+        Check if the fit of the passed RooFitResult is selected (None, i.e. no fit result, is always selected)
+        """
+        self.nFits += 1
+        if fitResult == None or self.isProblematic(fitResult):
+            self.nSelected += 1
+            return True
+        self.nGood += 1
+        if self.spotCheck > 0 and self.nGood % self.spotCheck == 0:
+            self.nSelected += 1
+            return True
+        return False
+
+
+def readFitResultTable(filename):
+    """
+    Read a FitResultTable from a file written by FitResultTable.write
+    """
+    if os.path.splitext(filename)[1] == '.npz':
+        import numpy as np
+        data = np.load(filename)
+        fits = dict((c, data[c].tolist()) for c in FIT_COLUMNS)
+        params = dict((c, data['param_' + c].tolist()) for c in PARAM_COLUMNS)
+        return FitResultTable(fits, params)
+
+    conn = sqlite3.connect(filename)
+    tables = []
+    for [table, columns] in [['fits', FIT_COLUMNS], ['params', PARAM_COLUMNS]]:
+        rows = conn.execute('SELECT {} FROM {}'.format(', '.join(columns), table)).fetchall()
+        tables.append(dict((c, [row[i] for row in rows]) for [i, c] in enumerate(columns)))
+    conn.close()
+    return FitResultTable(tables[0], tables[1])
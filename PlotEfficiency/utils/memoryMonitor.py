@@ -0,0 +1,101 @@
+import os
+import sys
+import gc
+import resource
+
+
+def getRSS():
+    """
+    Get the current resident set size of this process in MB (from /proc if available, else the peak value)
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024.0**2
+    except (IOError, OSError, ValueError):
+        return getPeakRSS()
+
+
+def getPeakRSS():
+    """
+    Get the peak resident set size of this process in MB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': # reported in bytes instead of kB
+        return peak / 1024.0**2
+    return peak / 1024.0
+
+
+def cleanupROOT():
+    """
+    Remove everything that ROOT keeps registered globally and that is not needed anymore between two items of a batch
+    (canvases, files, objects in memory)
+    """
+    import ROOT as r
+    for f in list(r.gROOT.GetListOfFiles()):
+        f.Close()
+    r.gROOT.GetListOfCanvases().Delete()
+    r.gROOT.GetList().Delete()
+    gc.collect()
+
+
+class MemoryMonitor(object):
+    """
+    Keep track of the memory usage while processing a batch of items.
+    After every item update() has to be called. If the memory usage is above the ceiling (in MB, 0 disables it) the
+    cleanup function is called, and if that does not help, the process can be restarted via restartFrom, which releases
+    all memory that has not been freed otherwise.
+    """
+
+    def __init__(self, ceiling=0, cleanup=cleanupROOT):
+        """
+        Initialize: store the ceiling and the cleanup function and get the starting memory usage
+        """
+        self.ceiling = ceiling
+        self.cleanup = cleanup
+        self.start = getRSS()
+        self.last = self.start
+        self.nItems = 0
+        self.maxIncrease = 0
+
+
+    def update(self):
+        """
+        Register that an item has been processed. Returns False if the memory usage is still above the ceiling after
+        calling the cleanup function.
+        """
+        self.nItems += 1
+        current = getRSS()
+        self.maxIncrease = max(self.maxIncrease, current - self.last)
+        self.last = current
+
+        if self.ceiling > 0 and current > self.ceiling:
+            self.cleanup()
+            self.last = getRSS()
+            return self.last <= self.ceiling
+
+        return True
+
+
+    def report(self):
+        """
+        Get a string summarizing the memory usage
+        """
+        perItem = (self.last - self.start) / max(self.nItems, 1)
+        return 'Memory: peak {:.0f} MB, current {:.0f} MB, {:.1f} MB per item on average (max. {:.1f} MB) for {} items'.format(
+            getPeakRSS(), self.last, perItem, self.maxIncrease, self.nItems)
+
+
+def restartFrom(index, option='--start_item'):
+    """
+    Replace the current process by a new instance of the same script with the same arguments, but starting at the item
+    with the passed index (passed via option, which is replaced if already present). Does not return.
+    """
+    argv = list(sys.argv)
+    if option in argv:
+        pos = argv.index(option)
+        del argv[pos:pos + 2]
+    argv += [option, str(index)]
+    print('Memory ceiling exceeded, restarting at item {}'.format(index))
+    sys.stdout.flush()
+    os.execv(sys.executable, [sys.executable] + argv)
@@ -1,5 +1,8 @@
 import os
 
+# tag that is appended to the names of all files produced from prescaled (quick-look) inputs
+QUICKLOOK_TAG = '_quickLook'
+
 def condMkDir(path):
     """
     check if the folder with the given path exists and if not create it
@@ -21,22 +24,46 @@ def condMkDirFile(filename):
     condMkDir(path)
 
 
-def getCommonBinning(bins1, bins2):
+def alignBins(lows1, highs1, lows2, highs2, relTol=1e-6):
     """
-    Get the binning that is common to both passed binnings
+    Align the bins of two binnings, each given by the (sorted) lower and upper edges of its bins (lists or numpy
+    arrays), in one simultaneous pass over both.
+    Two edges are considered equal if they differ by less than relTol times the width of the narrower of the two bins,
+    so that edges obtained via floating point arithmetic (e.g. x +- ex) still match.
+    Returns a list of index pairs [i1, i2] of matching bins and a list of index pairs of bins that overlap only
+    partially (i.e. that can not be compared directly)
     """
-    # NOTE: For the moment it seems that we can get away without dealing with numerical effects here
-    # Using this to find the same elements in both lists: http://stackoverflow.com/a/1388842/3604607
-    # Turning the set back into a list again sorted from lowest to highest value, which should be our use case
-    return sorted(frozenset(bins1).intersection(bins2))
+    [lows1, highs1, lows2, highs2] = [e.tolist() if hasattr(e, 'tolist') else e for e in [lows1, highs1, lows2, highs2]]
+    matches = []
+    partial = []
+    i1 = 0
+    i2 = 0
+    while i1 < len(lows1) and i2 < len(lows2):
+        tol = relTol * min(highs1[i1] - lows1[i1], highs2[i2] - lows2[i2])
+        sameLow = abs(lows1[i1] - lows2[i2]) <= tol
+        sameHigh = abs(highs1[i1] - highs2[i2]) <= tol
+        if sameLow and sameHigh:
+            matches.append([i1, i2])
+            i1 += 1
+            i2 += 1
+            continue
+
+        if lows1[i1] < highs2[i2] - tol and lows2[i2] < highs1[i1] - tol:
+            partial.append([i1, i2])
+        # move on with the bin that ends first (or with both, if they end at the same edge)
+        if sameHigh:
+            i1 += 1
+            i2 += 1
+        elif highs1[i1] < highs2[i2]:
+            i1 += 1
+        else:
+            i2 += 1
 
+    return [matches, partial]
 
-def getOverlappingBins(bins1, bins2):
+
+def isPrescaled(filename):
     """
-    Get the indices in both passed binnings of those bins that do overlap.
+    Check if the passed file has been produced from prescaled (quick-look) inputs (see makeQuickLookTree.py)
     """
-    coBins = set(getCommonBinning(bins1, bins2))
-    iB1 = [i for i, item in enumerate(bins1) if item in coBins]
-    iB2 = [i for i, item in enumerate(bins2) if item in coBins]
-
-    return [iB1, iB2]
+    return QUICKLOOK_TAG in os.path.basename(filename)
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+def getUniform(entries, seed=0):
+    """
+    Get a deterministic pseudo random number in [0, 1) for every entry number (numpy array of ints).
+    The numbers only depend on the entry number and the seed (multiplicative hashing), so that the same subsample is
+    selected independent of the order or chunking in which the entries are processed.
+    """
+    x = (np.asarray(entries, dtype=np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B9)) & np.uint64(0xFFFFFFFF)
+    x = (x * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+    x ^= x >> np.uint64(16)
+    x = (x * np.uint64(0x45D9F3B)) & np.uint64(0xFFFFFFFF)
+    x ^= x >> np.uint64(16)
+    return x.astype(np.float64) / 2.0**32
+
+
+def getStratumIndices(values, binning):
+    """
+    Get the index of the stratum (i.e. the bin in the multi-dimensional binning) for every entry.
+    values is a list of numpy arrays (one per variable) and binning a list of numpy arrays of bin edges.
+    Entries outside the binning get the index -1.
+    """
+    indices = []
+    inside = np.ones(len(values[0]), dtype=bool)
+    for [vals, edges] in zip(values, binning):
+        idx = np.searchsorted(edges, vals, side='right') - 1
+        inside &= (idx >= 0) & (idx < len(edges) - 1)
+        indices.append(np.clip(idx, 0, len(edges) - 2))
+
+    flat = np.ravel_multi_index(indices, [len(e) - 1 for e in binning])
+    flat[~inside] = -1
+    return flat
+
+
+def getStratumFractions(counts, fraction, minEntries):
+    """
+    Get the fraction of entries that is kept in every stratum. It is at least the passed fraction, but larger for sparse
+    strata so that at least minEntries (or all entries) are kept.
+    """
+    fractions = np.full(len(counts), float(fraction))
+    filled = counts > 0
+    fractions[filled] = np.minimum(1.0, np.maximum(fraction, float(minEntries) / counts[filled]))
+    return fractions
+
+
+def selectEntries(entries, strata, fractions, fraction, seed=0):
+    """
+    Get the entries that are kept given their strata and the fraction to keep per stratum, together with their weights
+    (the inverse of the fraction with which they are kept), which undo the oversampling of sparse strata.
+    Entries outside all strata (index -1) are kept with the passed (global) fraction.
+    """
+    keepFraction = np.where(strata >= 0, fractions[np.maximum(strata, 0)], fraction)
+    keep = getUniform(entries, seed) < keepFraction
+    return [entries[keep], 1.0 / keepFraction[keep]]
+
+
+def normalizeWeights(weights):
+    """
+    Normalize the weights of all kept entries (see selectEntries) to a mean of 1. This keeps the correction of the
+    oversampled strata, but the sum of weights (and thus the fitted errors, which are not corrected with SumW2) matches
+    the size of the subsample instead of the full sample
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.mean() if len(weights) else weights
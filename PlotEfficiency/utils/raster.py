@@ -0,0 +1,74 @@
+import os
+import subprocess
+
+from miscHelpers import condMkDirFile
+
+# the vector formats that can be converted by ghostscript
+VECTOR_EXTENSIONS = ['.pdf', '.ps', '.eps']
+
+
+def findExecutable(name):
+    """
+    Get the full path of the executable with the passed name if it can be found in the PATH or None
+    """
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        exe = os.path.join(path, name)
+        if os.path.isfile(exe) and os.access(exe, os.X_OK):
+            return exe
+    return None
+
+
+def needsUpdate(source, target):
+    """
+    Check if the target has to be (re)created, i.e. if it does not exist or is older than the source
+    """
+    return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+
+def getRasterNames(source, inputDir, outputDir=None):
+    """
+    Get the names of the full size and the thumbnail png for the passed source file. If an outputDir is passed, the
+    directory structure below inputDir is mirrored there, otherwise the pngs are stored next to the source.
+    """
+    base = os.path.splitext(source)[0]
+    if outputDir is not None:
+        base = os.path.join(outputDir, os.path.relpath(base, inputDir))
+    return [base + '.png', base + '_thumb.png']
+
+
+def rasterize(source, target, dpi, gs='gs'):
+    """
+    Convert the first page of the source to a png with the passed resolution via ghostscript. Returns the exit status.
+    If the conversion fails, a (partially written) target is removed, so that it is not taken as up to date later.
+    """
+    if os.path.dirname(target):
+        condMkDirFile(target)
+    devnull = open(os.devnull, 'w')
+    status = subprocess.call([gs, '-q', '-dSAFER', '-dBATCH', '-dNOPAUSE', '-dFirstPage=1', '-dLastPage=1',
+                              '-dTextAlphaBits=4', '-dGraphicsAlphaBits=4', '-dEPSCrop',
+                              '-sDEVICE=png16m', '-r{}'.format(dpi), '-sOutputFile={}'.format(target), source],
+                             stdout=devnull, stderr=subprocess.STDOUT)
+    devnull.close()
+    if status != 0 and os.path.exists(target):
+        os.remove(target)
+    return status
+
+
+def convertFile(job):
+    """
+    Create the full size png and the thumbnail of one source file if they are missing or outdated.
+    job is a tuple of (source, png, thumbnail, dpi, thumbnail dpi, ghostscript executable), so that this can be used
+    directly with multiprocessing.Pool.imap_unordered.
+    Returns a tuple of (source, number of created files, number of failed conversions)
+    """
+    [source, png, thumb, dpi, thumbDpi, gs] = job
+    nCreated = 0
+    nFailed = 0
+    for [target, res] in [[png, dpi], [thumb, thumbDpi]]:
+        if not needsUpdate(source, target):
+            continue
+        if rasterize(source, target, res, gs) == 0:
+            nCreated += 1
+        else:
+            nFailed += 1
+    return (source, nCreated, nFailed)
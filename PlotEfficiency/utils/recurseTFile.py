@@ -8,11 +8,67 @@ def recurseOnFile(f, func, dirFunc = None):
     * func is any function that takes a TObject as its single argument.
     * dirFunc is any function taking a TDirectory as its single argument that is executed on each directory but
       should be outside of the recursion (e.g. obtaining the current path)
+
+    The objects are owned by python, i.e. they are deleted as soon as func does not keep a reference to them anymore,
+    so that the memory usage does not grow with the number of objects in the file.
     """
+    import ROOT as r
     for key in f.GetListOfKeys():
         obj = key.ReadObj()
         if not obj.InheritsFrom('TDirectory'):
+            r.SetOwnership(obj, True)
             func(obj)
         else:
-            dirFunc(obj)
+            if dirFunc is not None:
+                dirFunc(obj)
             recurseOnFile(obj, func, dirFunc)
+        del obj
+
+
+def copyDirectory(src, dst):
+    """
+    Recursively copy all objects and subdirectories of the TDirectory src into the TDirectory dst.
+    Only the highest cycle of every key is copied.
+    """
+    import ROOT as r
+    copied = set()
+    for key in src.GetListOfKeys():
+        name = key.GetName()
+        if name in copied:
+            continue
+        copied.add(name)
+
+        obj = key.ReadObj()
+        if obj.InheritsFrom('TDirectory'):
+            subdir = dst.mkdir(name, obj.GetTitle())
+            copyDirectory(obj, subdir)
+        else:
+            r.SetOwnership(obj, True)
+            dst.cd()
+            if obj.InheritsFrom('TTree'):
+                obj = obj.CloneTree(-1, 'fast')
+            obj.Write(name)
+
+
+def recurseOnKeys(f, className, func, path=''):
+    """
+    Traverse all TDirectories of f, but only read the objects whose key is of class className (i.e. without reading
+    e.g. all the canvases). func is called with the object and its path inside the file (without the file name).
+    Only the highest cycle of every key is read.
+    """
+    import ROOT as r
+    seen = set()
+    for key in f.GetListOfKeys():
+        name = key.GetName()
+        if name in seen:
+            continue
+        seen.add(name)
+
+        keyClass = r.TClass.GetClass(key.GetClassName())
+        if keyClass and keyClass.InheritsFrom('TDirectory'):
+            recurseOnKeys(key.ReadObj(), className, func, '/'.join([path, name]) if path else name)
+        elif key.GetClassName() == className:
+            obj = key.ReadObj()
+            r.SetOwnership(obj, True)
+            func(obj, '/'.join([path, name]) if path else name)
+            del obj
@@ -0,0 +1,293 @@
+import json
+import pickle
+
+import numpy as np
+
+from miscHelpers import alignBins
+
+# the categories stored for every bin in the pkl files of createPklFile.py
+CATEGORIES = ['data', 'mc', 'data/mc']
+# the per-bin quantities computed when comparing to the reference
+COMPARISON_VALUES = ['diff', 'ratio', 'pull']
+# the possible ways of combining the deviations of the variations from the nominal result into a systematic uncertainty
+SYST_METHODS = ['envelope', 'rms', 'quadrature']
+
+
+def loadResultSet(filename):
+    """
+    Read the pkl file of createPklFile.py into a dict with one entry per ID, scenario and category, containing the
+    list of [low edge, high edge, efficiency, err_low, err_high, x, bin name] of all its bins (sorted by the low edge)
+    """
+    with open(filename, 'rb') as f:
+        valdict = pickle.load(f)
+
+    results = {}
+    for [ID, scenarios] in valdict.items():
+        for [scenario, bins] in scenarios.items():
+            for [binStr, cats] in bins.items():
+                [lo, hi] = [float(v) for v in binStr.split('_')]
+                if lo >= hi: # points outside of the binning are stored with reversed edges
+                    continue
+                for [cat, vals] in cats.items():
+                    results.setdefault((ID, scenario, cat), []).append(
+                        [lo, hi, vals['efficiency'], vals['err_low'], vals['err_high'], vals[scenario], binStr])
+    for bins in results.values():
+        bins.sort()
+    return results
+
+
+class AlignedResults(object):
+    """
+    Several result sets (see loadResultSet) aligned bin by bin to the first one (the reference), stored as arrays of
+    shape (number of sets, number of bins), with one column per bin of the reference.
+    Bins of the other sets that do not match a reference bin (e.g. because of a different binning) are not
+    compared, reference bins without a match are nan in the other sets.
+    """
+
+    def __init__(self, resultSets, labels, relTol=1e-6):
+        """
+        Initialize: align all result sets to the first one
+        """
+        self.labels = labels
+        self.keys = [] # [ID, scenario, category, low edge, high edge] of every column
+        self.x = [] # the x values and names of the bins of the reference
+        self.binNames = []
+        self.problems = []
+        columns = []
+        for group in sorted(resultSets[0]):
+            refBins = resultSets[0][group]
+            groupCols = [[b[2:5] for b in refBins]]
+            for [label, results] in zip(labels[1:], resultSets[1:]):
+                bins = results.get(group, [])
+                cols = [[np.nan] * 3 for b in refBins]
+                [matches, partial] = alignBins([b[0] for b in refBins], [b[1] for b in refBins],
+                                               [b[0] for b in bins], [b[1] for b in bins], relTol)
+                for [iRef, i] in matches:
+                    cols[iRef] = bins[i][2:5]
+                if len(matches) < len(refBins) or partial:
+                    self.problems.append('{}: {} of {} bins of {} do not match the reference'.format(
+                        label, len(refBins) - len(matches), len(refBins), '/'.join(group)))
+                groupCols.append(cols)
+            self.keys += [list(group) + b[:2] for b in refBins]
+            self.x += [b[5] for b in refBins]
+            self.binNames += [b[6] for b in refBins]
+            columns.append(np.array(groupCols, dtype=np.float64).reshape(len(resultSets), len(refBins), 3))
+
+        for [label, results] in zip(labels[1:], resultSets[1:]):
+            for group in sorted(set(results).difference(resultSets[0])):
+                self.problems.append('{}: {} is not in the reference'.format(label, '/'.join(group)))
+
+        table = np.concatenate(columns, axis=1) if columns else np.zeros((len(resultSets), 0, 3))
+        [self.eff, self.errLow, self.errHigh] = [table[:, :, i] for i in range(3)]
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def compareToReference(aligned):
+    """
+    Compute the difference, ratio and pull of every bin of every set with respect to the reference in one go.
+    The pull uses the errors facing each other (i.e. the high error of the lower and the low error of the higher value).
+    Returns a dict with one array of shape (number of sets - 1, number of bins) per entry of COMPARISON_VALUES
+    """
+    ref = aligned.eff[0]
+    others = aligned.eff[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = others - ref
+        ratio = others / ref
+        above = diff > 0
+        errRef = np.where(above, aligned.errHigh[0], aligned.errLow[0])
+        errOther = np.where(above, aligned.errLow[1:], aligned.errHigh[1:])
+        pull = diff / np.sqrt(errRef**2 + errOther**2)
+    return {'diff': diff, 'ratio': ratio, 'pull': pull}
+
+
+def flagBins(comparison, maxPull=None, maxDiff=None, maxRatioDev=None):
+    """
+    Flag all bins whose absolute pull, absolute difference or absolute deviation of the ratio from 1 exceeds the
+    respective threshold (None disables a threshold). Bins with nan are never flagged
+    """
+    flags = np.zeros(comparison['diff'].shape, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        for [values, threshold] in [[comparison['pull'], maxPull], [comparison['diff'], maxDiff],
+                                    [comparison['ratio'] - 1, maxRatioDev]]:
+            if threshold is not None:
+                flags |= np.abs(values) > threshold
+    return flags
+
+
+def toJsonValue(val):
+    """
+    Convert a numpy scalar into a python float (nan into None, i.e. null)
+    """
+    val = float(val)
+    return None if val != val else val
+
+
+def writeComparisonReport(filename, aligned, comparison, flags, thresholds):
+    """
+    Write a JSON report with the number of compared and flagged bins and the largest pull of every set and the list
+    of all flagged bins
+    """
+    report = {'reference': aligned.labels[0], 'thresholds': thresholds, 'problems': aligned.problems,
+              'summary': {}, 'flagged': []}
+    for [iSet, label] in enumerate(aligned.labels[1:]):
+        pulls = np.abs(comparison['pull'][iSet])
+        compared = pulls == pulls
+        report['summary'][label] = {'compared': int(compared.sum()), 'flagged': int(flags[iSet].sum()),
+                                    'max_abs_pull': toJsonValue(pulls[compared].max()) if compared.any() else None}
+
+    for [iSet, iBin] in zip(*np.nonzero(flags)):
+        [ID, scenario, cat, lo, hi] = aligned.keys[iBin]
+        entry = {'set': aligned.labels[iSet + 1], 'ID': ID, 'scenario': scenario, 'category': cat, 'bin': [lo, hi],
+                 'reference': toJsonValue(aligned.eff[0, iBin]), 'efficiency': toJsonValue(aligned.eff[iSet + 1, iBin])}
+        for val in COMPARISON_VALUES:
+            entry[val] = toJsonValue(comparison[val][iSet, iBin])
+        report['flagged'].append(entry)
+
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+def getFlaggedGroups(aligned, flags):
+    """
+    Get the [ID, scenario, category] of all groups with at least one flagged bin (in any set) together with the
+    indices of all their bins and the indices of their flagged bins
+    """
+    anyFlagged = flags.any(axis=0)
+    groups = {}
+    for [iBin, key] in enumerate(aligned.keys):
+        group = groups.setdefault(tuple(key[:3]), [[], []])
+        group[0].append(iBin)
+        if anyFlagged[iBin]:
+            group[1].append(iBin)
+    return [[list(group), bins, flagged] for [group, [bins, flagged]] in sorted(groups.items()) if flagged]
+
+
+def createOverlayGraphs(aligned, bins):
+    """
+    Create one TGraphAsymmErrors per result set with the passed bins (indices of columns)
+    """
+    import ROOT as r
+    graphs = []
+    for [iSet, label] in enumerate(aligned.labels):
+        graph = r.TGraphAsymmErrors()
+        graph.SetName(label)
+        iPoint = 0
+        for iBin in bins:
+            eff = aligned.eff[iSet, iBin]
+            if eff != eff:
+                continue
+            [lo, hi] = aligned.keys[iBin][3:]
+            graph.SetPoint(iPoint, 0.5 * (lo + hi), eff)
+            graph.SetPointError(iPoint, 0.5 * (hi - lo), 0.5 * (hi - lo), aligned.errLow[iSet, iBin],
+                                aligned.errHigh[iSet, iBin])
+            iPoint += 1
+        graphs.append(graph)
+    return graphs
+
+
+def combineResults(aligned, lumis=None, mcFrom=None):
+    """
+    Combine the efficiencies of all result sets (e.g. of different run periods) bin by bin into a weighted mean
+    without refitting. If lumis (one per result set) are passed they are used as weights, otherwise every bin is
+    weighted by its statistical power, i.e. the inverse of its squared (average) fitted error.
+    The low and high errors are propagated separately (sqrt(sum((w * err)^2)) / sum(w)). Result sets without a value
+    (or, when weighting by statistics, without an error) in a bin are left out in that bin.
+    If mcFrom (the index of a result set) is passed, the mc bins are taken from that set instead of being combined,
+    since the errors of the same MC sample used in every set are fully correlated and must not be averaged down.
+    Returns the combined efficiencies, low and high errors and the mask of the result sets combined in every bin
+    """
+    eff = aligned.eff
+    with np.errstate(divide='ignore'):
+        if lumis is not None:
+            weights = np.repeat(np.asarray(lumis, dtype=np.float64)[:, np.newaxis], eff.shape[1], axis=1)
+        else:
+            weights = 1 / (0.5 * (aligned.errLow + aligned.errHigh))**2
+    valid = (eff == eff) & np.isfinite(weights) & (weights > 0)
+    if mcFrom is not None:
+        isMC = np.array([key[2] == 'mc' for key in aligned.keys], dtype=bool)
+        valid[:, isMC] &= (np.arange(len(eff)) == mcFrom)[:, np.newaxis]
+    weights = np.where(valid, weights, 0)
+    sumW = weights.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        combined = np.where(valid, weights * eff, 0).sum(axis=0) / sumW
+        [errLow, errHigh] = [np.sqrt(np.where(valid, (weights * err)**2, 0).sum(axis=0)) / sumW
+                             for err in [aligned.errLow, aligned.errHigh]]
+    return [combined, errLow, errHigh, valid]
+
+
+def recomputeRatios(aligned, eff, errLow, errHigh):
+    """
+    Replace the (combined) data/mc values of all bins by the ratio of the (combined) data and mc efficiencies, with the
+    relative errors added in quadrature (as in divideGraphs). Bins without data or mc counterpart are left unchanged
+    """
+    index = dict(((k[0], k[1], k[2], name), i) for [i, [k, name]] in enumerate(zip(aligned.keys, aligned.binNames)))
+    [iRatio, iData, iMC] = [[], [], []]
+    for [[ID, scenario, cat, name], i] in index.items():
+        if cat == 'data/mc' and (ID, scenario, 'data', name) in index and (ID, scenario, 'mc', name) in index:
+            iRatio.append(i)
+            iData.append(index[(ID, scenario, 'data', name)])
+            iMC.append(index[(ID, scenario, 'mc', name)])
+
+    [eff, errLow, errHigh] = [np.array(a) for a in [eff, errLow, errHigh]]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = eff[iData] / eff[iMC]
+        for err in [errLow, errHigh]:
+            err[iRatio] = ratio * np.sqrt((err[iData] / eff[iData])**2 + (err[iMC] / eff[iMC])**2)
+    eff[iRatio] = ratio
+    return [eff, errLow, errHigh]
+
+
+def systematicBands(aligned, method='envelope'):
+    """
+    Compute the systematic uncertainty of every bin of the reference (the nominal result) from the deviations of all
+    other result sets (the variations, at least one) in one go. Variations without a value in a bin are left out in
+    that bin.
+    envelope: the largest deviation downwards and upwards (asymmetric)
+    rms: the root mean square of all deviations (symmetric)
+    quadrature: the deviations downwards and upwards summed in quadrature separately (asymmetric)
+    Returns the low and high systematic uncertainty and the index of the variation with the largest absolute
+    deviation (-1 if no variation deviates) of every bin
+    """
+    if method not in SYST_METHODS:
+        raise ValueError('Unknown method \'{}\', possible methods: {}'.format(method, SYST_METHODS))
+    dev = aligned.eff[1:] - aligned.eff[0]
+    valid = dev == dev
+    dev = np.where(valid, dev, 0)
+    down = np.where(dev < 0, -dev, 0)
+    up = np.where(dev > 0, dev, 0)
+    if method == 'envelope':
+        [systLow, systHigh] = [down.max(axis=0), up.max(axis=0)]
+    elif method == 'rms':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            systLow = np.sqrt((dev**2).sum(axis=0) / valid.sum(axis=0))
+        systHigh = systLow
+    else:
+        [systLow, systHigh] = [np.sqrt((down**2).sum(axis=0)), np.sqrt((up**2).sum(axis=0))]
+
+    noVariation = ~valid.any(axis=0) | (aligned.eff[0] != aligned.eff[0])
+    noDeviation = noVariation | ~(dev != 0).any(axis=0)
+    dominant = np.where(noDeviation, -1, np.abs(dev).argmax(axis=0))
+    [systLow, systHigh] = [np.where(noVariation, np.nan, syst) for syst in [systLow, systHigh]]
+    return [systLow, systHigh, dominant]
+
+
+def writeResultSet(filename, aligned, eff, errLow, errHigh, extra=None):
+    """
+    Write the passed values of all bins of the aligned results into a pkl file with the same structure as the ones of
+    createPklFile.py (using the bin names and x values of the reference). extra can contain further values to be
+    stored for every bin (name -> array of values)
+    """
+    valdict = {}
+    for [i, [ID, scenario, cat, lo, hi]] in enumerate(aligned.keys):
+        bins = valdict.setdefault(ID, {}).setdefault(scenario, {})
+        vals = {scenario: aligned.x[i], 'efficiency': float(eff[i]), 'err_low': float(errLow[i]),
+                'err_high': float(errHigh[i])}
+        for [name, values] in (extra or {}).items():
+            vals[name] = float(values[i])
+        bins.setdefault(aligned.binNames[i], {})[cat] = vals
+    with open(filename, 'wb') as f:
+        pickle.dump(valdict, f)
@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import time
+import errno
+import select
+import socket
+import struct
+import runpy
+import atexit
+import tempfile
+import traceback
+
+# the classes for which the dictionaries are loaded when warming up the worker
+WARM_CLASSES = ['TFile', 'TTree', 'TCanvas', 'TPad', 'TGraphAsymmErrors', 'TH1D', 'TH2D', 'TLegend', 'TLatex',
+                'TLine', 'TNamed', 'RooFitResult', 'RooRealVar']
+
+# the separator between the output of a job and its exit status (written by the worker after the job has finished)
+STATUS_SEPARATOR = b'\x00'
+
+
+def getDefaultSocket():
+    """
+    Get the default path of the socket of the worker (one per user)
+    """
+    return os.path.join(tempfile.gettempdir(), 'rootWorker_{}.sock'.format(os.getuid()))
+
+
+def sendMessage(sock, message):
+    """
+    Send the passed (json serializable) message prefixed with its length
+    """
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(struct.pack('!I', len(data)) + data)
+
+
+def recvExactly(sock, nBytes):
+    """
+    Receive exactly nBytes from the socket
+    """
+    data = b''
+    while len(data) < nBytes:
+        chunk = sock.recv(nBytes - len(data))
+        if not chunk:
+            raise IOError('Connection closed while receiving')
+        data += chunk
+    return data
+
+
+def recvMessage(sock):
+    """
+    Receive one message sent by sendMessage
+    """
+    [length] = struct.unpack('!I', recvExactly(sock, 4))
+    return json.loads(recvExactly(sock, length).decode('utf-8'))
+
+
+def isWorkerRunning(socketPath):
+    """
+    Check if a worker is listening on socketPath (i.e. the socket file is not just left over from a crashed worker)
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socketPath)
+        return True
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+def isAllowedScript(script, allowedDir):
+    """
+    Check if the script lies inside allowedDir (after resolving all symlinks)
+    """
+    allowedDir = os.path.join(os.path.realpath(allowedDir), '')
+    return os.path.realpath(script).startswith(allowedDir)
+
+
+def warmUp(modules=[]):
+    """
+    Do everything that every script has to do before it can start working: import ROOT, load the dictionaries of the
+    commonly used classes (and RooFit) and import the passed python modules
+    """
+    import ROOT as r
+    r.gROOT.SetBatch()
+    r.gSystem.Load('libRooFit')
+    for cls in WARM_CLASSES:
+        r.TClass.GetClass(cls)
+    for module in modules:
+        __import__(module)
+
+
+def runScript(conn, request):
+    """
+    Run the script of the request in the current (forked) process, with the output going to the passed connection.
+    Returns the exit code of the script.
+    """
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(conn.fileno(), 1)
+    os.dup2(conn.fileno(), 2)
+
+    code = 0
+    try:
+        os.chdir(request['cwd'])
+        sys.argv = [request['script']] + request['args']
+        sys.path[0] = os.path.dirname(request['script'])
+        runpy.run_path(request['script'], run_name='__main__')
+    except SystemExit as exc:
+        if exc.code is None:
+            code = 0
+        elif isinstance(exc.code, int):
+            code = exc.code
+        else:
+            print(exc.code)
+            code = 1
+    except Exception:
+        traceback.print_exc()
+        code = 1
+
+    # run the exit handlers (e.g. the ones of ROOT closing all files), since the process is left via os._exit
+    atexit._run_exitfuncs()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return code
+
+
+def getExitCode(status):
+    """
+    Convert the status returned by os.waitpid into an exit code (128 + signal if the process has been killed)
+    """
+    if os.WIFSIGNALED(status):
+        return 128 + os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class RootWorker(object):
+    """
+    Long-lived local worker that keeps ROOT loaded and runs the scripts of this repository on request.
+    Requests are received via a Unix socket. Every job runs in a forked child process, so that it starts with ROOT
+    already loaded, but can not affect the state of the worker or of other jobs. The output of the job is sent back to
+    the client, followed by the exit status once the job has finished. At most maxJobs jobs run at the same time.
+    Only the user running the worker can connect to the socket and only scripts inside allowedDir are run.
+    """
+
+    def __init__(self, socketPath, allowedDir, maxJobs=4, verbosity=1):
+        """
+        Initialize: create the listening socket (removing a stale socket file, but refusing to take over the socket of
+        a worker that is still running)
+        """
+        self.socketPath = socketPath
+        self.allowedDir = allowedDir
+        self.maxJobs = maxJobs
+        self.verbosity = verbosity
+        self.jobs = {} # pid -> [connection, script, start time]
+        self.running = True
+
+        if os.path.exists(socketPath):
+            if isWorkerRunning(socketPath):
+                raise IOError('Another worker is already listening on {}'.format(socketPath))
+            os.remove(socketPath)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        oldMask = os.umask(0o177) # no window in which others can connect
+        try:
+            self.listener.bind(socketPath)
+        finally:
+            os.umask(oldMask)
+        os.chmod(socketPath, 0o600)
+        self.listener.listen(16)
+
+
+    def serve(self):
+        """
+        Main loop: accept and start new jobs and finish the ones that are done until a stop request is received
+        """
+        while self.running or self.jobs:
+            self.reap(block=len(self.jobs) >= self.maxJobs or not self.running)
+            if not self.running or len(self.jobs) >= self.maxJobs:
+                continue
+            try:
+                [readable, w, x] = select.select([self.listener], [], [], 0.2)
+            except select.error as err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                raise
+            if readable:
+                [conn, addr] = self.listener.accept()
+                self.handle(conn)
+
+        self.listener.close()
+        os.remove(self.socketPath)
+
+
+    def handle(self, conn):
+        """
+        Handle one request: either stop the worker or start the job in a forked child
+        """
+        try:
+            request = recvMessage(conn)
+        except (IOError, ValueError) as err:
+            print('Invalid request: {}'.format(err))
+            conn.close()
+            return
+
+        if request.get('stop', False):
+            self.running = False
+            conn.sendall(STATUS_SEPARATOR + b'0\n')
+            conn.close()
+            return
+
+        if not isAllowedScript(request['script'], self.allowedDir):
+            print('Refused to run {}, which is not in {}'.format(request['script'], self.allowedDir))
+            conn.sendall('Refused to run {}, only scripts in {} can be run\n'.format(
+                request['script'], self.allowedDir).encode('utf-8') + STATUS_SEPARATOR + b'1\n')
+            conn.close()
+            return
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            # close the connections of all other jobs, otherwise their clients only get EOF once this job is done
+            self.listener.close()
+            for job in self.jobs.values():
+                job[0].close()
+            os._exit(runScript(conn, request))
+
+        self.jobs[pid] = [conn, request['script'], time.time()]
+        if self.verbosity > 0:
+            print('Started {} {} (pid {})'.format(request['script'], ' '.join(request['args']), pid))
+            sys.stdout.flush()
+
+
+    def reap(self, block=False):
+        """
+        Collect all finished jobs and send their exit status to the clients (waiting for one job if block is True)
+        """
+        while self.jobs:
+            try:
+                [pid, status] = os.waitpid(-1, 0 if block else os.WNOHANG)
+            except OSError as err:
+                if err.errno == errno.EINTR:
+                    continue
+                raise
+            if pid == 0:
+                return
+            block = False
+
+            [conn, script, start] = self.jobs.pop(pid)
+            code = getExitCode(status)
+            try:
+                conn.sendall(STATUS_SEPARATOR + '{}\n'.format(code).encode('utf-8'))
+            except (IOError, OSError): # client is gone
+                pass
+            conn.close()
+            if self.verbosity > 0:
+                print('Finished {} (pid {}) with exit code {} after {:.1f} s'.format(script, pid, code,
+                                                                                     time.time() - start))
+                sys.stdout.flush()
+
+
+def submitJob(socketPath, script, args, cwd, out):
+    """
+    Send a job to the worker listening on socketPath and write its output to the (binary) stream out while it is
+    running. Returns the exit code of the job.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socketPath)
+    sendMessage(sock, {'script': script, 'args': args, 'cwd': cwd})
+
+    # everything from the first separator on is held back, since it could be the beginning of the exit status
+    tail = b''
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        if tail or STATUS_SEPARATOR in data:
+            pos = data.find(STATUS_SEPARATOR) if not tail else 0
+            out.write(data[:pos])
+            tail += data[pos:]
+        else:
+            out.write(data)
+        out.flush()
+    sock.close()
+
+    [output, sep, status] = tail.rpartition(STATUS_SEPARATOR)
+    out.write(output)
+    out.flush()
+    try:
+        return int(status.strip())
+    except ValueError:
+        print('The worker did not report an exit status')
+        return 1
+
+
+def stopWorker(socketPath):
+    """
+    Ask the worker listening on socketPath to stop after all running jobs are finished
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socketPath)
+    sendMessage(sock, {'stop': True})
+    sock.recv(16)
+    sock.close()
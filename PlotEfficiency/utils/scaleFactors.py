@@ -0,0 +1,196 @@
+import json
+import pickle
+
+import numpy as np
+
+# How to treat values outside the range of the binning:
+# 'clamp': use the first or last bin, 'nan': return nan, 'one': return 1 with zero errors, 'raise': raise a ValueError
+OVERFLOW_POLICIES = ['clamp', 'nan', 'one', 'raise']
+# maximum number of cells of the grid used for finding the bins (see createBinFinder), above it a binary search is used
+MAX_GRID_CELLS = 1000000
+
+
+def createBinFinder(edges, clamp):
+    """
+    Create the tables for finding the bins of many values without a binary search: a regular grid with cells of a
+    quarter of the smallest bin width stores for every cell the bin of the point one cell below it. The bin of every
+    value in a cell is then either this bin or the next one, which is decided by one comparison with the upper edge.
+    With clamp the bins are clamped to the binning, otherwise they are shifted by one (0 is the underflow and
+    nBins + 1 the overflow). The upper edge of the last (or overflow) bin is nan, since nothing compares larger.
+    Returns [offset, inverse cell width, number of cells, bin of every cell, upper edge of every bin] or None if the
+    grid would have more than MAX_GRID_CELLS cells
+    """
+    nBins = len(edges) - 1
+    width = np.diff(edges).min() / 4
+    nCells = int(np.ceil((edges[-1] - edges[0]) / width)) + 3
+    if nCells > MAX_GRID_CELLS:
+        return None
+    # cell i covers [edges[0] + (i - 1) * width, edges[0] + i * width), the first and last cells everything outside
+    cellBins = np.searchsorted(edges, edges[0] + (np.arange(nCells) - 2) * width, side='right')
+    if clamp:
+        return [edges[0] - width, 1 / width, nCells, np.clip(cellBins - 1, 0, nBins - 1),
+                np.append(edges[1:-1], np.nan)]
+    return [edges[0] - width, 1 / width, nCells, cellBins, np.append(edges, np.nan)]
+
+
+def findBins(edges, finder, x, clamp):
+    """
+    Get the bin of every value (see createBinFinder for the convention and the finder)
+    """
+    if finder is None:
+        idx = np.searchsorted(edges, x, side='right')
+        return np.clip(idx - 1, 0, len(edges) - 2, out=idx) if clamp else idx
+
+    [offset, scale, nCells, cellBins, upperEdges] = finder
+    cell = x - offset
+    cell *= scale
+    np.fmin(cell, nCells - 1, out=cell) # nan (compared after fmin) ends up in the last cell, as with a binary search
+    np.fmax(cell, 0, out=cell)
+    idx = cellBins.take(cell.astype(np.intp))
+    idx += x >= upperEdges.take(idx)
+    return idx
+
+
+class BinnedLookup(object):
+    """
+    Table of values with asymmetric errors in bins of one or more variables, that can be evaluated for whole numpy
+    arrays (e.g. of all muons) at once, using only numpy (no ROOT).
+    edges is a list with the bin edges of every axis, values, errLow and errHigh are arrays with one dimension per axis
+    (in the same order). Bins without value (e.g. failed fits) can be nan.
+    """
+
+    def __init__(self, edges, values, errLow, errHigh, names=None, overflow='clamp'):
+        """
+        Initialize: convert everything to numpy arrays and check the consistency of the shapes
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy \'{}\', possible values: {}'.format(overflow, OVERFLOW_POLICIES))
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        shape = tuple(len(e) - 1 for e in self.edges)
+        for e in self.edges:
+            if len(e) < 2 or np.any(np.diff(e) <= 0):
+                raise ValueError('Bin edges have to be strictly increasing: {}'.format(e))
+
+        # store the tables flat, so that one fancy indexing operation is enough for a lookup
+        self.values = np.asarray(values, dtype=np.float64).reshape(shape).ravel()
+        self.errLow = np.asarray(errLow, dtype=np.float64).reshape(shape).ravel()
+        self.errHigh = np.asarray(errHigh, dtype=np.float64).reshape(shape).ravel()
+        self.shape = shape
+        self.names = names if names is not None else ['x{}'.format(i) for i in range(len(shape))]
+        self.overflow = overflow
+        self.finders = [createBinFinder(e, overflow == 'clamp') for e in self.edges]
+
+
+    def getIndices(self, coords):
+        """
+        Get the flat bin index for every entry of the passed coordinates (one array per axis) and a mask of the entries
+        that are inside the range of all axes (None for the clamp policy, which does not need it)
+        """
+        if len(coords) != len(self.edges):
+            raise ValueError('Need {} coordinate arrays ({}), got {}'.format(len(self.edges), self.names, len(coords)))
+
+        clamp = self.overflow == 'clamp'
+        flat = None
+        inRange = None
+        for [edges, finder, nBins, x] in zip(self.edges, self.finders, self.shape, coords):
+            idx = findBins(edges, finder, np.atleast_1d(np.asarray(x, dtype=np.float64)), clamp)
+            if not clamp:
+                valid = (idx >= 1) & (idx <= nBins)
+                inRange = valid if inRange is None else inRange & valid
+                idx -= 1
+                np.clip(idx, 0, nBins - 1, out=idx)
+            if flat is None:
+                flat = idx
+            else:
+                flat *= nBins
+                flat += idx
+        return [flat, inRange]
+
+
+    def applyOverflow(self, result, inRange):
+        """
+        Apply the overflow policy to the looked up values (first entry of result) and errors (the other entries) of the
+        entries outside the range of the binning
+        """
+        if inRange is None or np.all(inRange):
+            return result
+
+        outside = ~inRange
+        if self.overflow == 'raise':
+            raise ValueError('{} values are outside the range of the binning'.format(np.count_nonzero(outside)))
+        result[0][outside] = np.nan if self.overflow == 'nan' else 1.0
+        for err in result[1:]:
+            err[outside] = np.nan if self.overflow == 'nan' else 0.0
+        return result
+
+
+    def evaluateWithErrors(self, coords):
+        """
+        Get the values and the low and high errors for the passed coordinates (one array per axis)
+        """
+        [idx, inRange] = self.getIndices(coords)
+        return self.applyOverflow([self.values.take(idx), self.errLow.take(idx), self.errHigh.take(idx)], inRange)
+
+
+    def evaluate(self, coords, variation=0):
+        """
+        Get the values for the passed coordinates (one array per axis), shifted by variation times the high (variation
+        > 0) or the low (variation < 0) error. Only the needed tables are looked up
+        """
+        [idx, inRange] = self.getIndices(coords)
+        values = self.values.take(idx)
+        if variation > 0:
+            values += variation * self.errHigh.take(idx)
+        elif variation < 0:
+            values += variation * self.errLow.take(idx)
+        return self.applyOverflow([values], inRange)[0]
+
+
+def getEdgesFromBins(bins):
+    """
+    Get the list of bin edges from a list of [low, high] (sorted by low) and check that the bins are contiguous
+    """
+    edges = [bins[0][0]]
+    for [lo, hi] in bins:
+        if not np.isclose(lo, edges[-1]):
+            raise ValueError('Bins are not contiguous: {} is followed by a bin starting at {}'.format(edges[-1], lo))
+        edges.append(hi)
+    return edges
+
+
+def fromPickle(filename, ID, scenario, category='data/mc', overflow='clamp'):
+    """
+    Create a 1D BinnedLookup from the pkl file of createPklFile.py for the passed ID, scenario and category
+    ('data', 'mc' or 'data/mc')
+    """
+    with open(filename, 'rb') as f:
+        valdict = pickle.load(f)
+
+    bins = []
+    for [binStr, cats] in valdict[ID][scenario].items():
+        [lo, hi] = [float(v) for v in binStr.split('_')]
+        if lo >= hi or category not in cats: # points outside of the binning are stored with reversed edges
+            continue
+        bins.append([lo, hi, cats[category]['efficiency'], cats[category]['err_low'], cats[category]['err_high']])
+    if not bins:
+        raise ValueError('No bins for {} {} {} in {}'.format(ID, scenario, category, filename))
+
+    bins.sort()
+    table = np.array([b[2:] for b in bins], dtype=np.float64)
+    return BinnedLookup([getEdgesFromBins([b[:2] for b in bins])], table[:, 0], table[:, 1], table[:, 2],
+                        [scenario], overflow)
+
+
+def fromMapJson(filename, category='RATIO', overflow='clamp'):
+    """
+    Create a 2D BinnedLookup (axes: abseta, pt) from the JSON map of stitchEfficiencyMap.py for the passed category
+    ('DATA', 'MC' or 'RATIO')
+    """
+    with open(filename, 'r') as f:
+        effMap = json.load(f)
+
+    # missing bins are stored as null, which becomes nan when converted to float
+    [values, errLow, errHigh] = [np.array(effMap[category][v], dtype=np.float64)
+                                 for v in ['efficiency', 'err_low', 'err_high']]
+    return BinnedLookup([effMap['abseta_edges'], effMap['pt_edges']], values, errLow, errHigh, ['abseta', 'pt'],
+                        overflow)
@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from miscHelpers import condMkDirFile
+
+# the tag that is inserted before the extension of the outputs of a shard, e.g. results.shard2of8.pkl
+SHARD_TAG = '.shard{}of{}'
+SHARD_TAG_RGX = re.compile(r'\.shard(\d+)of(\d+)$')
+
+
+def parseShard(value):
+    """
+    Parse the value of a --shard option ('i/N', with 0 <= i < N) into [i, N]. Meant to be used as argparse type
+    """
+    try:
+        [index, nShards] = [int(v) for v in value.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('shard has to be given as i/N, got \'{}\''.format(value))
+    if nShards < 1 or not 0 <= index < nShards:
+        raise argparse.ArgumentTypeError('shard index has to be in [0, N), got \'{}\''.format(value))
+    return [index, nShards]
+
+
+def getShardIndex(nShards, *keys):
+    """
+    Get the shard (in [0, nShards)) of the work item identified by the passed keys (e.g. input file and entry).
+    A hash of the keys is used (not python's hash, which is randomized between processes), so that every process
+    on every node assigns the same items to the same shards without any communication.
+    """
+    digest = hashlib.md5('\0'.join(str(k) for k in keys).encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) % nShards
+
+
+def isInShard(shard, *keys):
+    """
+    Check if the work item identified by the keys belongs to the passed shard ([i, N], None means everything)
+    """
+    return shard is None or getShardIndex(shard[1], *keys) == shard[0]
+
+
+def getShardFilename(filename, shard):
+    """
+    Get the name of the partial output of the passed shard for an output file (unchanged if shard is None)
+    """
+    if shard is None:
+        return filename
+    [base, ext] = os.path.splitext(filename)
+    return ''.join([base, SHARD_TAG.format(*shard), ext])
+
+
+def findShardFiles(filename):
+    """
+    Find the partial outputs of all shards for the (final) output file. Raises an IOError if not all shards are present
+    (or if the found files come from runs with different numbers of shards). Returns the files ordered by shard index
+    """
+    [base, ext] = os.path.splitext(filename)
+    shardFiles = {}
+    nShards = set()
+    [directory, name] = os.path.split(base)
+    for fn in os.listdir(directory or '.'):
+        [fnBase, fnExt] = os.path.splitext(fn)
+        match = SHARD_TAG_RGX.search(fnBase)
+        if match and fnExt == ext and fnBase[:match.start()] == name:
+            shardFiles[int(match.group(1))] = os.path.join(directory, fn)
+            nShards.add(int(match.group(2)))
+
+    if not shardFiles:
+        raise IOError('Found no shards of {}'.format(filename))
+    if len(nShards) > 1:
+        raise IOError('Found shards of {} from runs with different numbers of shards: {}'.format(
+            filename, sorted(nShards)))
+    missing = sorted(set(range(nShards.pop())).difference(shardFiles))
+    if missing:
+        raise IOError('Shards {} of {} are missing'.format(missing, filename))
+    return [shardFiles[i] for i in sorted(shardFiles)]
+
+
+def writeManifest(filename, files):
+    """
+    Write a manifest (JSON file with the sorted list of the passed output files)
+    """
+    if os.path.dirname(filename):
+        condMkDirFile(filename)
+    with open(filename, 'w') as f:
+        json.dump({'files': sorted(files)}, f, indent=2)
+
+
+def readManifest(filename):
+    """
+    Read the list of files from a manifest written by writeManifest
+    """
+    with open(filename, 'r') as f:
+        return json.loads(f.read())['files']
+
+
+def mergeDicts(merged, other, path=''):
+    """
+    Recursively merge the nested dict other into merged. Raises a ValueError if both contain different values for
+    the same key (i.e. if the shards did not split the work into disjoint parts)
+    """
+    for [key, value] in other.items():
+        if key not in merged:
+            merged[key] = value
+        elif isinstance(merged[key], dict) and isinstance(value, dict):
+            mergeDicts(merged[key], value, '/'.join([path, str(key)]))
+        elif merged[key] != value and merged[key] == merged[key]: # nan != nan, but is the same value here
+            raise ValueError('Conflicting values for {}/{}'.format(path, key))
+    return merged
+
+
+def mergePklFiles(filenames, outFilename):
+    """
+    Merge the (nested) dicts stored in the passed pickle files (e.g. by createPklFile.py) into one pickle file
+    """
+    import pickle
+    merged = {}
+    for fn in filenames:
+        with open(fn, 'rb') as f:
+            mergeDicts(merged, pickle.load(f))
+    with open(outFilename, 'wb') as f:
+        pickle.dump(merged, f)
+
+
+def mergeRootFiles(filenames, outFilename):
+    """
+    Copy all (top level) objects of the passed ROOT files into one ROOT file
+    """
+    import ROOT as r
+    outfile = r.TFile.Open(outFilename, 'recreate')
+    for fn in filenames:
+        f = r.TFile.Open(fn)
+        for key in f.GetListOfKeys():
+            obj = key.ReadObj()
+            outfile.cd()
+            obj.Write(key.GetName())
+        f.Close()
+    outfile.Close()
+
+
+def mergeManifests(filenames, outFilename):
+    """
+    Merge the lists of files of the passed manifests into one manifest
+    """
+    files = []
+    for fn in filenames:
+        files += readManifest(fn)
+    writeManifest(outFilename, files)
+
+
+def mergeFitTables(filenames, outFilename):
+    """
+    Merge the fit result tables (see fitResults.py) of the passed files into one table
+    """
+    from fitResults import FitResultTable, readFitResultTable
+    table = FitResultTable()
+    for fn in filenames:
+        table.extend(readFitResultTable(fn))
+    table.write(outFilename)
+
+
+# the merge functions for the different kinds of outputs, by extension
+MERGERS = {'.pkl': mergePklFiles, '.root': mergeRootFiles, '.json': mergeManifests, '.npz': mergeFitTables,
+           '.db': mergeFitTables, '.sqlite': mergeFitTables}
+
+
+def mergeShards(filename):
+    """
+    Find the partial outputs of all shards of the passed output file and merge them into it.
+    Returns the list of merged files
+    """
+    ext = os.path.splitext(filename)[1]
+    if ext not in MERGERS:
+        raise ValueError('Do not know how to merge {} files (known: {})'.format(ext, ', '.join(sorted(MERGERS))))
+    shardFiles = findShardFiles(filename)
+    MERGERS[ext](shardFiles, filename)
+    return shardFiles
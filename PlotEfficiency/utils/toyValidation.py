@@ -0,0 +1,231 @@
+import numpy as np
+
+from fitResults import EFF_PAR_NAME
+
+# the components of the pass and fail PDFs that are built by the TagProbeFitter from the factory strings of a PDF
+SHAPE_COMPONENTS = ['signalPass', 'signalFail', 'backgroundPass', 'backgroundFail']
+# number of points on which the shapes are evaluated for generating the toys
+GRID_POINTS = 2000
+# the summary values of the pull distribution of every bin
+PULL_SUMMARY = ['nToys', 'nFailed', 'pullMean', 'pullMeanErr', 'pullWidth', 'pullWidthErr', 'coverage', 'bias']
+
+
+def buildWorkspace(pdfStrings, massName, low, high):
+    """
+    Build the fit model in the same way as the TagProbeFitter does: all factory strings of the PDF, the signal shared
+    between pass and fail if it is not defined separately, and the extended pass and fail PDFs parametrized via
+    the efficiency and the total signal yield
+    """
+    import ROOT as r
+    w = r.RooWorkspace('w')
+    w.factory('{}[{},{}]'.format(massName, low, high))
+    for factoryStr in pdfStrings:
+        w.factory(factoryStr)
+    for comp in ['signalPass', 'signalFail']:
+        if not w.pdf(comp):
+            w.factory('SUM::{}(signal)'.format(comp))
+    w.factory("expr::nSignalPass('efficiency*numSignalAll', efficiency, numSignalAll[0.,1e10])")
+    w.factory("expr::nSignalFail('(1-efficiency)*numSignalAll', efficiency, numSignalAll)")
+    w.factory('SUM::pdfPass(nSignalPass*signalPass, numBackgroundPass[0.,1e10]*backgroundPass)')
+    w.factory('SUM::pdfFail(nSignalFail*signalFail, numBackgroundFail[0.,1e10]*backgroundFail)')
+    return w
+
+
+def setParameters(w, values):
+    """
+    Set the values of all variables of the workspace that are in the passed dict (name -> value)
+    """
+    for [name, val] in values.items():
+        var = w.var(name)
+        if var:
+            var.setVal(val)
+
+
+def getShapes(w, massName, low, high, nPoints=GRID_POINTS):
+    """
+    Evaluate the (normalized) shapes of all SHAPE_COMPONENTS on a grid of nPoints mass values.
+    Returns the grid and a dict with the array of values of every component
+    """
+    import ROOT as r
+    mass = w.var(massName)
+    normSet = r.RooArgSet(mass)
+    grid = np.linspace(low, high, nPoints)
+    shapes = dict((comp, np.zeros(nPoints)) for comp in SHAPE_COMPONENTS)
+    for [i, x] in enumerate(grid):
+        mass.setVal(x)
+        for comp in SHAPE_COMPONENTS:
+            shapes[comp][i] = w.pdf(comp).getVal(normSet)
+    return [grid, shapes]
+
+
+def sampleFromShape(grid, shape, size, rng):
+    """
+    Draw size random values from the shape (tabulated on the grid) via the inverse of its cumulative distribution
+    """
+    cdf = np.concatenate([[0.], np.cumsum(0.5 * (shape[1:] + shape[:-1]) * np.diff(grid))])
+    return np.interp(rng.uniform(0, cdf[-1], size), cdf, grid)
+
+
+def getExpectedYields(values):
+    """
+    Get the expected number of events of every component from the fitted yields and efficiency
+    """
+    nSignal = values['numSignalAll']
+    return {'signalPass': values[EFF_PAR_NAME] * nSignal, 'signalFail': (1 - values[EFF_PAR_NAME]) * nSignal,
+            'backgroundPass': values['numBackgroundPass'], 'backgroundFail': values['numBackgroundFail']}
+
+
+def generateComponents(grid, shapes, yields, nToys, rng):
+    """
+    Generate the events of every component of nToys toys at once. The number of events of every component in every
+    toy is drawn from a Poisson distribution around its expected yield.
+    Returns a dict with the [toy indices, mass values] of all events of every component
+    """
+    events = {}
+    for comp in SHAPE_COMPONENTS:
+        counts = rng.poisson(max(yields[comp], 0), nToys)
+        events[comp] = [np.repeat(np.arange(nToys), counts), sampleFromShape(grid, shapes[comp], counts.sum(), rng)]
+    return events
+
+
+def generateToys(grid, shapes, yields, nToys, nBins, low, high, rng):
+    """
+    Generate the binned pass and fail mass distributions of nToys toys at once.
+    Returns two arrays of shape (nToys, nBins) with the pass and the fail histograms
+    """
+    hists = {'Pass': np.zeros(nToys * nBins), 'Fail': np.zeros(nToys * nBins)}
+    for [comp, [toys, masses]] in generateComponents(grid, shapes, yields, nToys, rng).items():
+        massBins = np.clip(((masses - low) / (high - low) * nBins).astype(int), 0, nBins - 1)
+        hists[comp[-4:]] += np.bincount(toys * nBins + massBins, minlength=nToys * nBins)
+    return [hists['Pass'].reshape(nToys, nBins), hists['Fail'].reshape(nToys, nBins)]
+
+
+def generateUnbinnedToys(grid, shapes, yields, nToys, rng):
+    """
+    Generate the unbinned pass and fail mass values of nToys toys at once.
+    Returns two lists with the array of mass values of every toy for pass and fail
+    """
+    events = generateComponents(grid, shapes, yields, nToys, rng)
+    toys = []
+    for state in ['Pass', 'Fail']:
+        [toyIdx, masses] = [np.concatenate([events[comp][i] for comp in SHAPE_COMPONENTS if comp.endswith(state)])
+                            for i in range(2)]
+        order = np.argsort(toyIdx, kind='mergesort')
+        toys.append(np.split(masses[order], np.cumsum(np.bincount(toyIdx, minlength=nToys))[:-1]))
+    return toys
+
+
+def createDataHist(name, mass, counts, low, high):
+    """
+    Create a RooDataHist for the mass from an array of bin contents
+    """
+    import ROOT as r
+    hist = r.TH1D(name, name, len(counts), low, high)
+    for [i, n] in enumerate(counts):
+        hist.SetBinContent(i + 1, n)
+    return r.RooDataHist(name, name, r.RooArgList(mass), hist)
+
+
+def createDataSet(name, mass, values):
+    """
+    Create a RooDataSet for the mass from an array of mass values
+    """
+    import ROOT as r
+    argSet = r.RooArgSet(mass)
+    data = r.RooDataSet(name, name, argSet)
+    for val in values:
+        mass.setVal(val)
+        data.add(argSet)
+    return data
+
+
+def fitToy(w, dataPass, dataFail, values, minos=False):
+    """
+    Fit the pass and fail data (binned or unbinned) of one toy simultaneously (sum of the extended NLLs), starting
+    from the values used for generating. Returns [status, efficiency, low error, high error]
+    """
+    import ROOT as r
+    setParameters(w, values)
+    nllPass = w.pdf('pdfPass').createNLL(dataPass, r.RooFit.Extended(True))
+    nllFail = w.pdf('pdfFail').createNLL(dataFail, r.RooFit.Extended(True))
+    nll = r.RooAddition('nll', 'nll', r.RooArgList(nllPass, nllFail))
+
+    minimizer = r.RooMinimizer(nll)
+    minimizer.setPrintLevel(-1)
+    minimizer.setVerbose(False)
+    status = minimizer.migrad()
+    minimizer.hesse()
+    eff = w.var(EFF_PAR_NAME)
+    if minos:
+        minimizer.minos(r.RooArgSet(eff))
+    if eff.hasAsymError():
+        return [status, eff.getVal(), abs(eff.getErrorLo()), eff.getErrorHi()]
+    return [status, eff.getVal(), eff.getError(), eff.getError()]
+
+
+def runToyJob(job):
+    """
+    Generate and fit the toys of one job (a dict with the keys key, pdf, mass, binned, nBins, values, nToys, seed,
+    minos). The toys are binned histograms or unbinned datasets, depending on how the bin was fitted. Meant to be run
+    in a process pool. Returns the key and the arrays of fit status, efficiency and its errors
+    """
+    import ROOT as r
+    r.gROOT.ProcessLine("gErrorIgnoreLevel = 2001") # avoid stdout pollution of ROOT
+    r.RooMsgService.instance().setGlobalKillBelow(r.RooFit.ERROR)
+    r.TH1.AddDirectory(False) # the histograms of all toys have the same name
+
+    [massName, low, high] = job['mass']
+    w = buildWorkspace(job['pdf'], massName, low, high)
+    setParameters(w, job['values'])
+    [grid, shapes] = getShapes(w, massName, low, high)
+    rng = np.random.RandomState(job['seed'])
+    yields = getExpectedYields(job['values'])
+    if job['binned']:
+        toys = generateToys(grid, shapes, yields, job['nToys'], job['nBins'], low, high, rng)
+    else:
+        toys = generateUnbinnedToys(grid, shapes, yields, job['nToys'], rng)
+
+    mass = w.var(massName)
+    results = []
+    for i in range(job['nToys']):
+        if job['binned']:
+            data = [createDataHist(name, mass, toys[j][i], low, high)
+                    for [j, name] in enumerate(['dataPass', 'dataFail'])]
+        else:
+            data = [createDataSet(name, mass, toys[j][i]) for [j, name] in enumerate(['dataPass', 'dataFail'])]
+        results.append(fitToy(w, data[0], data[1], job['values'], job['minos']))
+    results = np.array(results, dtype=np.float64).reshape(-1, 4)
+    return [job['key'], results]
+
+
+def getPulls(trueEff, results):
+    """
+    Get the pulls of the efficiency from the toy fit results ([status, efficiency, low error, high error] per toy)
+    of all converged fits, using the error in the direction of the true value
+    """
+    converged = results[:, 0] == 0
+    [eff, errLow, errHigh] = [results[converged, i] for i in range(1, 4)]
+    err = np.where(eff < trueEff, errHigh, errLow)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pulls = (eff - trueEff) / err
+    return pulls[np.isfinite(pulls)]
+
+
+def summarizePulls(trueEff, results):
+    """
+    Summarize the pull distribution of one bin: number of toys and failed fits, mean and width of the pulls (with
+    their statistical errors), the fraction of toys whose 1 sigma interval covers the true value and the mean
+    bias of the efficiency
+    """
+    pulls = getPulls(trueEff, results)
+    n = len(pulls)
+    summary = dict((val, float('nan')) for val in PULL_SUMMARY)
+    summary['nToys'] = len(results)
+    summary['nFailed'] = len(results) - int(np.sum(results[:, 0] == 0))
+    if n > 1:
+        width = pulls.std(ddof=1)
+        summary.update({'pullMean': float(pulls.mean()), 'pullMeanErr': float(width / np.sqrt(n)),
+                        'pullWidth': float(width), 'pullWidthErr': float(width / np.sqrt(2 * (n - 1))),
+                        'coverage': float(np.mean(np.abs(pulls) < 1)),
+                        'bias': float(np.mean(results[results[:, 0] == 0, 1]) - trueEff)})
+    return summary
@@ -0,0 +1,95 @@
+import numpy as np
+
+# compiled loop setting a float buffer to every value of an array and filling a TTree or TBranch after each, so that
+# filling millions of entries does not need one python call per entry
+FILL_HELPER = """
+#include "TTree.h"
+#include "TBranch.h"
+void fillFromArray(TTree* target, float* buf, const double* values, Long64_t n)
+{ for (Long64_t i = 0; i < n; ++i) { *buf = values[i]; target->Fill(); } }
+void fillFromArray(TBranch* target, float* buf, const double* values, Long64_t n)
+{ for (Long64_t i = 0; i < n; ++i) { *buf = values[i]; target->Fill(); } }
+"""
+
+# compiled loop entering all entry numbers of an array into a TEntryList
+ENTRY_LIST_HELPER = """
+#include "TEntryList.h"
+void enterFromArray(TEntryList* elist, const Long64_t* entries, Long64_t n)
+{ for (Long64_t i = 0; i < n; ++i) { elist->Enter(entries[i]); } }
+"""
+
+
+def getDrawnValues(tree, n, index=0):
+    """
+    Get the first n values of the index-th expression that have been filled by the last TTree::Draw call as a numpy
+    array (copy)
+    """
+    buf = tree.GetVal(index)
+    if hasattr(buf, 'SetSize'): # older PyROOT versions return a buffer of unknown size
+        buf.SetSize(n)
+    else:
+        buf.reshape((n,))
+    return np.frombuffer(buf, dtype=np.float64, count=n).copy()
+
+
+def iterateChunks(tree, expression, chunkSize=1000000, selection=''):
+    """
+    Iterate over the passed tree in chunks of chunkSize entries and yield the values of the expression for every chunk
+    as a numpy array. Only the branches needed to evaluate the expression are read and the memory usage only depends on
+    the chunkSize, not on the size of the tree. If a selection is passed, only the values of the selected entries are
+    returned, otherwise there is exactly one value per entry.
+    """
+    tree.SetEstimate(chunkSize + 1)
+    nEntries = tree.GetEntries()
+    for first in range(0, nEntries, chunkSize):
+        n = tree.Draw(expression, selection, 'goff', chunkSize, first)
+        yield getDrawnValues(tree, max(n, 0))
+
+
+def iterateChunksMulti(tree, expressions, chunkSize=1000000, selection=''):
+    """
+    Same as iterateChunks but for several expressions at once (at most four). Yields a list with one numpy array per
+    expression for every chunk.
+    """
+    tree.SetEstimate(chunkSize + 1)
+    nEntries = tree.GetEntries()
+    for first in range(0, nEntries, chunkSize):
+        n = tree.Draw(':'.join(expressions), selection, 'goff', chunkSize, first)
+        yield [getDrawnValues(tree, max(n, 0), i) for i in range(len(expressions))]
+
+
+def fillHistogram(tree, expression, edges, chunkSize=1000000, selection='', foldOverflow=False):
+    """
+    Fill the values of the expression into a histogram with the passed edges (numpy array) by iterating over the tree
+    in chunks. Returns the array of bin contents (under- and overflow are dropped, unless foldOverflow is True, in which
+    case they are put into the first and last bin).
+    """
+    counts = np.zeros(len(edges) - 1)
+    for values in iterateChunks(tree, expression, chunkSize, selection):
+        if foldOverflow:
+            values = np.clip(values, edges[0], edges[-1])
+        counts += np.histogram(values, bins=edges)[0]
+    return counts
+
+
+def fillFromArray(target, buf, values):
+    """
+    Fill all values into the target (a TTree or a TBranch), whose branch address is buf (array('f', [0])), with one
+    call into compiled code
+    """
+    import ROOT as r
+    if not hasattr(r, 'fillFromArray'):
+        r.gInterpreter.Declare(FILL_HELPER)
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    r.fillFromArray(target, buf, values, len(values))
+
+
+def enterFromArray(elist, entries):
+    """
+    Enter all entry numbers (numpy array) into the TEntryList with one call into compiled code
+    """
+    import ROOT as r
+    if not hasattr(r, 'enterFromArray'):
+        r.gInterpreter.Declare(ENTRY_LIST_HELPER)
+    entries = np.ascontiguousarray(entries, dtype=np.int64)
+    r.enterFromArray(elist, entries, len(entries))
@@ -0,0 +1,122 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+
+import numpy as np
+
+from utils.efficiencyManifest import loadManifest, getEfficiencies
+from utils.fitResults import readFitResultTable
+from utils.toyValidation import runToyJob, summarizePulls, EFF_PAR_NAME, PULL_SUMMARY
+
+
+def getFitValues(table):
+    """
+    Get the dict of final parameter values (name -> value) of every fit in the table (indexed by the row of the fit)
+    """
+    values = [{} for i in range(len(table))]
+    for [iFit, name, val] in zip(table.params['fit'], table.params['name'], table.params['value']):
+        values[iFit][name] = val
+    return values
+
+
+def findEfficiency(effs, inputFile, effName):
+    """
+    Find the EfficiencyDefinition of the passed efficiency in the passed output file of the fits (None if there is
+    none). If no efficiency of the manifest writes into a file with this name, the efficiency name alone has to be
+    unique
+    """
+    candidates = [e for e in effs if e.name == effName]
+    inFile = [e for e in candidates if os.path.basename(e.getOutputFile()) == os.path.basename(inputFile)]
+    if inFile:
+        return inFile[0]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script checks the fit model for bias and coverage with toys: for '
+                                 'every fitted bin the pass and fail mass distributions of many toys are generated '
+                                 'from the fitted model (all toys of a job at once), the toys are refitted in a '
+                                 'process pool with the same model (binned with the binsForFit of the module or '
+                                 'unbinned, as in the production fit) and the '
+                                 'pulls of the efficiency are summarized per bin')
+parser.add_argument('manifest', help='The efficiency manifest JSON file written by the fit configuration (contains '
+                    'the PDFs)')
+parser.add_argument('fitTable', help='The fit result table of the fits written by harvestFitResults.py (contains the '
+                    'fitted parameters)')
+parser.add_argument('-o', '--output', default='toyValidation.json', help='The output JSON file with the pull summaries')
+parser.add_argument('-n', '--n_toys', default=1000, type=int, help='The number of toys per bin')
+parser.add_argument('-c', '--chunk_size', default=100, type=int,
+                    help='The number of toys that are generated and fitted in one job')
+parser.add_argument('-j', '--processes', default=multiprocessing.cpu_count(), type=int,
+                    help='The number of parallel processes')
+parser.add_argument('-e', '--efficiency_regex', default='.*', help='Only validate efficiencies matching this regex')
+parser.add_argument('-b', '--bin_regex', default='.*', help='Only validate bins matching this regex')
+parser.add_argument('--seed', default=12345, type=int, help='The random seed (every job uses its own stream)')
+parser.add_argument('--minos', action='store_true', default=False, help='Run MINOS for the efficiency in the toy fits')
+parser.add_argument('--toy_results', default=None,
+                    help='Also store the fit results (status, efficiency, low and high error) of all toys of all bins in '
+                    'this .npz file')
+parser.add_argument('-v', '--verbosity', default=1, type=int,
+                    help='In- or Decrease the amount of output to stdout (0 disables it completely)')
+args = parser.parse_args()
+
+effs = getEfficiencies(loadManifest(args.manifest), args.efficiency_regex)
+table = readFitResultTable(args.fitTable)
+fitValues = getFitValues(table)
+binRgx = re.compile(args.bin_regex)
+
+jobs = []
+for iFit in range(len(table)):
+    [inputFile, effName, binName] = [table.fits[c][iFit] for c in ['inputFile', 'effName', 'bin']]
+    if table.fits['status'][iFit] != 0 or not binRgx.search(binName):
+        continue
+    eff = findEfficiency(effs, inputFile, effName)
+    if eff is None or EFF_PAR_NAME not in fitValues[iFit]:
+        continue
+    job = {'key': iFit, 'pdf': eff.getPdfDefinition(binName)[1], 'mass': eff.getMassVariable(),
+           'binned': eff.isBinnedFit(), 'nBins': eff.getNBinsForFit(), 'values': fitValues[iFit], 'minos': args.minos}
+    for first in range(0, args.n_toys, args.chunk_size):
+        jobs.append(dict(job, nToys=min(args.chunk_size, args.n_toys - first), seed=[args.seed, len(jobs)]))
+
+nBins = len(set(job['key'] for job in jobs))
+if args.verbosity > 0:
+    print('Running {} toys for each of {} bins in {} jobs'.format(args.n_toys, nBins, len(jobs)))
+
+start = time.time()
+results = {}
+pool = multiprocessing.Pool(max(args.processes, 1))
+for [iJob, [key, toyResults]] in enumerate(pool.imap_unordered(runToyJob, jobs)):
+    results.setdefault(key, []).append(toyResults)
+    if args.verbosity > 0 and (iJob + 1) % max(len(jobs) // 20, 1) == 0:
+        print('{} of {} jobs done after {:.0f} s'.format(iJob + 1, len(jobs), time.time() - start))
+pool.close()
+pool.join()
+
+summaries = []
+allResults = {}
+for iFit in sorted(results):
+    toyResults = np.concatenate(results[iFit])
+    trueEff = fitValues[iFit][EFF_PAR_NAME]
+    summary = summarizePulls(trueEff, toyResults)
+    summary.update({'inputFile': table.fits['inputFile'][iFit], 'effName': table.fits['effName'][iFit],
+                    'bin': table.fits['bin'][iFit], 'efficiency': trueEff})
+    summaries.append(summary)
+    allResults[':'.join([os.path.basename(summary['inputFile']), summary['effName'], summary['bin']])] = toyResults
+
+with open(args.output, 'w') as f:
+    json.dump(summaries, f, indent=2, sort_keys=True)
+if args.toy_results is not None:
+    np.savez_compressed(args.toy_results, **allResults)
+
+if args.verbosity > 0:
+    print('Fitted {} toys in {:.0f} s, summary written to {}'.format(nBins * args.n_toys, time.time() - start,
+                                                                     args.output))
+    print(' '.join(['{:>12}'.format(val) for val in PULL_SUMMARY]) + '  bin')
+    for summary in summaries:
+        print(' '.join(['{:12.4g}'.format(summary[val]) for val in PULL_SUMMARY]) +
+              '  {effName}/{bin} ({inputFile})'.format(**summary))
@@ -0,0 +1,234 @@
+import argparse
+import fnmatch
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from utils.fileWatcher import createWatcher, BoundedWorkQueue
+from utils.miscHelpers import condMkDir
+
+# the directory containing the scripts that are run for every file
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def runScript(script, scriptArgs, logPrefix):
+    """
+    Run one of the scripts of this repository in a separate process. Returns True if it succeeded
+    """
+    cmd = [sys.executable, os.path.join(SCRIPT_DIR, script)] + scriptArgs
+    start = time.time()
+    status = subprocess.call(cmd)
+    print('{}: {} finished with status {} after {:.1f} s'.format(logPrefix, script, status, time.time() - start))
+    return status == 0
+
+
+def writeTmpJson(config, tmpDir, name):
+    """
+    Write the passed configuration to a json file in the tmpDir and return its name
+    """
+    [fd, filename] = tempfile.mkstemp(prefix=name + '_', suffix='.json', dir=tmpDir)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(config, f, indent=2)
+    return filename
+
+
+def getPairKey(filename, dataTag, mcTag):
+    """
+    Get the key that identifies the DATA and MC file that belong together (i.e. the filename without the DATA or MC
+    tag) and whether the file is the DATA or MC file. Returns [None, None] if the file is neither
+    """
+    basename = os.path.basename(filename)
+    for [tag, kind] in [[dataTag, 'data'], [mcTag, 'mc']]:
+        if tag in basename:
+            return [basename.replace(tag, '__'), kind]
+    return [None, None]
+
+
+class WatchPipeline(object):
+    """
+    Process the output files of the fits as soon as they are complete: extract the fit canvases of every file, extract
+    the efficiency graphs as soon as the DATA and the MC file are both available and plot everything that the plot
+    configuration contains and that has become available.
+    """
+
+    def __init__(self, args, tmpDir):
+        """
+        Initialize: store the settings and read the extraction and plot configurations (if any)
+        """
+        self.args = args
+        self.tmpDir = tmpDir
+        self.lock = threading.Lock()
+        self.pairs = {} # pair key -> {'data': filename, 'mc': filename}
+        self.plotted = set()
+        self.extractConfig = None
+        if args.extract_config:
+            with open(args.extract_config, 'r') as f:
+                self.extractConfig = json.loads(f.read())
+        self.plotConfig = None
+        if args.plot_config:
+            with open(args.plot_config, 'r') as f:
+                self.plotConfig = json.loads(f.read())
+            self.plotConfig['input_path'] = args.output_path
+
+
+    def addFile(self, filename, workQueue):
+        """
+        Submit all work that becomes possible with the passed (complete) file to the work queue
+        """
+        print('{} is complete'.format(filename))
+        if 'canvas' in self.args.stages:
+            workQueue.submit(self.extractCanvases, filename)
+
+        [key, kind] = getPairKey(filename, self.args.data_tag, self.args.mc_tag)
+        if key is None or 'graphs' not in self.args.stages:
+            return
+        with self.lock:
+            pair = self.pairs.setdefault(key, {})
+            pair[kind] = filename
+            if len(pair) < 2:
+                return
+        workQueue.submit(self.extractGraphs, key, pair['data'], pair['mc'])
+
+
+    def extractCanvases(self, filename):
+        """
+        Extract the fit canvases from one file via extractFitCanvas.py
+        """
+        config = {'name_regex': self.args.name_regex, 'file_extensions': self.args.file_extensions,
+                  'output_dir': os.path.join(self.args.output_path, 'Figures', 'FitCanvas', ''),
+                  'input_path': os.path.dirname(filename) + '/', 'input_files': [os.path.basename(filename)]}
+        jsonFile = writeTmpJson(config, self.tmpDir, 'extractFitCanvas')
+        runScript('extractFitCanvas.py', [jsonFile, '-v', '0'], os.path.basename(filename))
+
+
+    def getExtractInputs(self, dataFile, mcFile):
+        """
+        Get the inputs of the extraction configuration that use the passed DATA and MC file (compared by filename),
+        with their files and output path replaced by the watched files and the --output_path
+        """
+        inputs = []
+        for inp in self.extractConfig['inputs']:
+            if (os.path.basename(inp['data_file']) == os.path.basename(dataFile) and
+                    os.path.basename(inp['mc_file']) == os.path.basename(mcFile)):
+                inputs.append(dict(inp, data_file=dataFile, mc_file=mcFile, output_path=self.args.output_path))
+        return inputs
+
+
+    def extractGraphs(self, key, dataFile, mcFile):
+        """
+        Extract the efficiency graphs from a DATA and MC file via extractPlots.py and plot what has become available.
+        With an extraction configuration only its inputs using these files are extracted (with the output names of
+        the json mode), otherwise all graphs are extracted in the --bulk mode
+        """
+        if self.extractConfig is None:
+            scriptArgs = ['--bulk', dataFile, mcFile, '-o', self.args.output_path]
+        else:
+            inputs = self.getExtractInputs(dataFile, mcFile)
+            if not inputs:
+                print('{}: no input of {} uses these files, not extracting them'.format(key, self.args.extract_config))
+                return
+            scriptArgs = [writeTmpJson({'inputs': inputs}, self.tmpDir, 'extractPlots')]
+        if runScript('extractPlots.py', scriptArgs, key):
+            self.makePlots(key)
+
+
+    def makePlots(self, logPrefix):
+        """
+        Plot all entries of the plot configuration whose inputs exist now and that have not been plotted yet
+        """
+        if self.plotConfig is None:
+            return
+        with self.lock:
+            entries = [e for e in self.plotConfig['input_files'] if e[0] not in self.plotted and
+                       os.path.exists(os.path.join(self.args.output_path, e[0]))]
+            self.plotted.update(e[0] for e in entries)
+        if not entries:
+            return
+
+        config = dict(self.plotConfig)
+        config['input_files'] = entries
+        jsonFile = writeTmpJson(config, self.tmpDir, 'makePlots')
+        runScript('makeEfficiencyPlots.py', [jsonFile], logPrefix)
+
+
+"""
+Arg parsing
+"""
+parser = argparse.ArgumentParser(description='This script watches the output directory of the fits and processes '
+                                 'every output file as soon as it is complete (i.e. while the other fits are still '
+                                 'running): the fit canvases are extracted, the efficiency graphs are extracted as soon '
+                                 'as the DATA and the MC file are available and the plots are made.')
+parser.add_argument('directory', help='The directory to watch')
+parser.add_argument('-p', '--pattern', default='TnP_MuonID__*.root', help='The pattern the filenames have to match')
+parser.add_argument('-o', '--output_path', default='Results/', help='The output path for the graphs and figures')
+parser.add_argument('-s', '--stages', nargs='+', choices=['canvas', 'graphs'], default=['canvas', 'graphs'],
+                    help='The stages to run for every file (plotting follows the graph extraction)')
+parser.add_argument('--extract_config', default=None,
+                    help='json file in the format of extractPlots.py. If given, the graphs of its inputs are extracted '
+                    'as soon as their DATA and MC file are complete (matched by filename, the output_path is replaced '
+                    'by the --output_path), with the output names of the json mode. Otherwise all graphs are '
+                    'extracted with extractPlots.py --bulk')
+parser.add_argument('--plot_config', default=None,
+                    help='json file in the format of makeEfficiencyPlots.py. Its entries are plotted as soon as their '
+                    'input files have been extracted (the input_path is replaced by the --output_path). The input '
+                    'files have to be named as the outputs of extractPlots.py, i.e. as in the --extract_config or, '
+                    'without it, as in the --bulk mode')
+parser.add_argument('-nr', '--name_regex', default='fit_canvas',
+                    help='The regex that the name of a fit canvas has to match in order to be saved')
+parser.add_argument('-f', '--file_extensions', nargs='+', default=['pdf'],
+                    help='The file formats in which the fit canvases are saved')
+parser.add_argument('--data_tag', default='__data_all__', help='The part of the filename that marks the DATA files')
+parser.add_argument('--mc_tag', default='__signal_mc__', help='The part of the filename that marks the MC files')
+parser.add_argument('-j', '--workers', default=2, type=int, help='Number of files that are processed in parallel')
+parser.add_argument('-q', '--queue_size', default=4, type=int,
+                    help='Maximum number of jobs waiting for a worker (watching pauses while the queue is full)')
+parser.add_argument('--polling', action='store_true', default=False,
+                    help='Poll the directory instead of using inotify. This is done automatically for directories on '
+                    'network filesystems (AFS, EOS, NFS, ... as found in /proc/mounts), on which inotify does not see '
+                    'the files written by batch jobs on other nodes')
+parser.add_argument('--poll_interval', default=5.0, type=float, help='Seconds between two polls of the directory')
+parser.add_argument('--settle_time', default=30.0, type=float,
+                    help='Seconds the size of a file must not change before it is considered complete when polling')
+parser.add_argument('--skip_existing', action='store_true', default=False,
+                    help='Ignore files that are already in the directory when starting (otherwise they are processed '
+                    'first, assuming that they are complete)')
+parser.add_argument('-n', '--n_files', default=0, type=int,
+                    help='Stop after this many files have been processed (0 watches until interrupted)')
+args = parser.parse_args()
+
+if not os.path.isdir(args.directory):
+    parser.error('{} is not a directory'.format(args.directory))
+condMkDir(args.output_path)
+
+tmpDir = tempfile.mkdtemp(prefix='watchFitOutputs_')
+pipeline = WatchPipeline(args, tmpDir)
+watcher = createWatcher(args.directory, args.pattern, args.settle_time, args.poll_interval, args.polling)
+workQueue = BoundedWorkQueue(args.workers, args.queue_size)
+
+# files that exist already are assumed to be complete (the polling watcher would report them again otherwise)
+seen = set()
+existing = [os.path.join(args.directory, fn) for fn in sorted(os.listdir(args.directory)) if
+            fnmatch.fnmatch(fn, args.pattern)]
+watcher.reported.update(os.path.basename(fn) for fn in existing)
+if not args.skip_existing:
+    for filename in existing:
+        seen.add(filename)
+        pipeline.addFile(filename, workQueue)
+
+print('Watching {} for {} using {}'.format(args.directory, args.pattern, watcher.__class__.__name__))
+try:
+    while args.n_files == 0 or len(seen) < args.n_files:
+        for filename in watcher.poll(args.poll_interval):
+            seen.add(filename)
+            pipeline.addFile(filename, workQueue)
+except KeyboardInterrupt:
+    print('Stopping, waiting for the submitted jobs to finish')
+
+workQueue.close()
+for filename in os.listdir(tmpDir):
+    os.remove(os.path.join(tmpDir, filename))
+os.rmdir(tmpDir)
@@ -1,10 +1,12 @@
 #!/usr/bin/env python
-import ROOT
+import sys
 import pickle
 import json
 import argparse
 
 from PlotEfficiency.utils.TGA_utils import *
+from PlotEfficiency.utils.configPlan import ExecutionPlan, loadConfig, CREATE_PKL_SCHEMA
+from PlotEfficiency.utils.sharding import parseShard, isInShard, getShardFilename
 
 """
 Definitions of helper functions
@@ -68,6 +70,15 @@ def cleanGraph(graph, binning, valdict, ID, scenario, category):
         graph.RemovePoint(i)
 
 
+def isInShardPkl(shard, fileInfo):
+    """
+    Check if the input file belongs to the passed shard. The files are split by ID and scenario (and not by filename),
+    so that all files filling the same part of the dict are processed by the same shard and the partial dicts of the
+    shards can simply be merged
+    """
+    return isInShard(shard, fileInfo[1], fileInfo[2])
+
+
 def setNameTitle(graph, cat, ID, scenario, scenario_add):
     """
     Set Name and Title of graph to '_' separated string of all input arguments
@@ -106,8 +117,30 @@ Setup argument parser
 """
 parser = argparse.ArgumentParser(description="This script generates a pkl file from all files specified in the JSON file")
 parser.add_argument("jsonFile", help="Path to the JSON file")
+parser.add_argument("--shard", type=parseShard, default=None,
+                    help="Only process the part i/N (0 <= i < N) of all input files (the split is the same on every node). "
+                    "The output files are tagged with the shard, merge them with PlotEfficiency/mergeShards.py")
+parser.add_argument("--plan", action="store_true", default=False,
+                    help="Only validate the JSON file, check that all inputs exist and list the outputs (without ROOT)")
 args = parser.parse_args()
 
+if args.plan:
+    plan = ExecutionPlan(args.jsonFile)
+    config = loadConfig(plan, args.jsonFile)
+    if config is not None and plan.validate(config, CREATE_PKL_SCHEMA):
+        for fileInfo in config["input_files"]["files"]:
+            if not isInShardPkl(args.shard, fileInfo):
+                continue
+            plan.addInput("".join([config["input_files"]["path"], fileInfo[0]]))
+            if fileInfo[2] not in config["binnings"]:
+                plan.errors.append("no binning for scenario {} of {}".format(fileInfo[2], fileInfo[0]))
+        plan.addOutput(getShardFilename(config["pickle_filename"], args.shard))
+        plan.addOutput(getShardFilename(config["root_output_filename"], args.shard))
+    sys.exit(plan.report())
+
+# import after the argparsing (and the plan) to not load ROOT unnecessarily
+import ROOT
+
 
 """
 Read JSON file
@@ -120,14 +153,16 @@ with open(args.jsonFile, 'r') as f:
 Create pickle file
 """
 valdict = {}
-outfile = ROOT.TFile.Open(json["root_output_filename"], "recreate")
+outfile = ROOT.TFile.Open(getShardFilename(json["root_output_filename"], args.shard), "recreate")
 
 path = json["input_files"]["path"]
 for fileInfo in json["input_files"]["files"]:
+    if not isInShardPkl(args.shard, fileInfo):
+        continue
     fn = "".join([path, fileInfo[0]])
     getFile(fn, valdict, outfile, json["binnings"], fileInfo[1], fileInfo[2], fileInfo[3])
 
-with open(json["pickle_filename"], "w") as pklFile:
+with open(getShardFilename(json["pickle_filename"], args.shard), "w") as pklFile:
     pickle.dump(valdict, pklFile)
 
 outfile.Close()
@@ -490,6 +490,18 @@ if "mc" in scenario:
      process.TnP_MuonID.InputFileNames = ['/scratch/tmadlener/data/TagAndProbe/2016/TnPTree_80X_TuneCUEP8M1_withnVtxWeights.root']
 
 
+# Run on the prescaled subsamples produced by PlotEfficiency/makeQuickLookTree.py instead of the full inputs, for fast
+# iterations on binnings and PDFs. The quickLookTag is appended to all output files to flag them as prescaled.
+# The fits use the weights of the subsamples (which include the weight of the inputs), since sparse bins are kept with a
+# higher fraction than the others.
+quickLook = False
+quickLookTag = "_quickLook"
+if quickLook:
+     process.TnP_MuonID.InputFileNames = cms.vstring(*[f.replace(".root", quickLookTag + ".root") for f in process.TnP_MuonID.InputFileNames])
+     process.TnP_MuonID.WeightVariable = cms.string("quickLookWeight")
+     process.TnP_MuonID.Variables.quickLookWeight = cms.vstring("quick-look weight", "0", "1e9", "")
+     UnbinnedVars = cms.vstring("mass", "quickLookWeight")
+
 if "25ns" in process.TnP_MuonID.InputFileNames[0]:
      mode = "25ns_"
 else: mode = ""
@@ -515,6 +527,41 @@ Mu16_test = False
 if "Mu16" in process.TnP_MuonID.InputFileNames[0]:
      Mu16_test = True
 
+# Put all IDS sharing a binning into one module, so that the input tree is only read once per binning instead of once
+# per ID and binning. The efficiencies of the different IDs are written to one merged output file, which has to be split
+# into the usual per ID files afterwards with PlotEfficiency/splitMergedOutput.py using the split file written below.
+mergeIDs = False
+splitFileName = "TnP_MuonID_split_%s.json" % scenario
+splitOutputs = {}
+sharedEffs = {} # the efficiencies of every merged module that do not depend on the ID
+
+# Choose between a binned and an unbinned fit (and the number of bins for binned fits) for every module from the expected
+# number of entries in its bins, obtained by running PlotEfficiency/scanBinStatistics.py on the efficiency manifest.
+# Modules without information in the statistics file use the settings of the Template.
+adaptiveFit = False
+binStatsFileName = "TnP_MuonID_binStats_%s.json" % scenario
+unbinnedBelow = 2000  # fit unbinned if the pass or fail sample in any bin has less entries than this
+entriesPerFitBin = 50 # desired (minimal) number of entries per mass bin in binned fits
+minBinsForFit = 20
+maxBinsForFit = 100
+binStats = {}
+if adaptiveFit:
+     import os
+     import json
+     if os.path.exists(binStatsFileName):
+          with open(binStatsFileName, "r") as binStatsFile:
+               binStats = json.load(binStatsFile)
+     else:
+          print "WARNING: adaptiveFit is set, but there is no bin statistics file " + binStatsFileName + ", all modules use the settings of the Template"
+
+def getFitMode(effStats):
+     """Get binnedFit and binsForFit from the statistics (of all efficiencies) of one output file.
+     The smallest pass or fail sample in any bin decides."""
+     minEntries = min(min(s["pass"] + s["fail"]) for s in effStats.values())
+     if minEntries < unbinnedBelow:
+          return [False, Template.binsForFit.value()]
+     return [True, max(minBinsForFit, min(maxBinsForFit, int(minEntries / entriesPerFitBin)))]
+
 print "Going to define TagProbeFitTreeAnalyzer for " + ', '.join(IDS) + " efficiency (trigger efficiency is " + str(triggerEff) + ")\nusing as input file: " + process.TnP_MuonID.InputFileNames[0]
 
 for ID in IDS:
@@ -522,15 +569,35 @@ for ID in IDS:
      if len(args) > 1 and ID != args[1]: continue
      for NAME, BINNING in ALLBINS:
           if len(args) > 2 and NAME not in args[2:]: continue
-          module = process.TnP_MuonID.clone(OutputFileName = cms.string(
-                    "TnP_MuonID__%s_%s_%s_%s.root" %(scenario, mode, ID, NAME)))
+          outputFileName = "TnP_MuonID__%s_%s_%s_%s.root" %(scenario, mode, ID, NAME)
           if "Mu8" in process.TnP_MuonID.InputFileNames[0]:
                #module.OutputFileName = module.OutputFileName.replace(".root","_Mu8.root")
-               module.OutputFileName = cms.string(
-                    "TnP_MuonID__%s_%s_%s_%s_Mu8.root" %(scenario, mode, ID, NAME))
+               outputFileName = "TnP_MuonID__%s_%s_%s_%s_Mu8.root" %(scenario, mode, ID, NAME)
           if "pt_abseta" in NAME:
-               module.OutputFileName = cms.string(
-                    "TnP_MuonID__{}_{}_{}_{}_{}.root".format(scenario, mode, ID, NAME, ptAbsetaOutputFileTrail(BINNING)))
+               outputFileName = "TnP_MuonID__{}_{}_{}_{}_{}.root".format(scenario, mode, ID, NAME, ptAbsetaOutputFileTrail(BINNING))
+          if quickLook:
+               outputFileName = outputFileName.replace(".root", quickLookTag + ".root")
+
+          fitPars = {}
+          fitModeLabel = ""
+          if outputFileName in binStats:
+               [binned, nBins] = getFitMode(binStats[outputFileName])
+               fitPars = dict(binnedFit = cms.bool(binned), binsForFit = cms.uint32(nBins))
+               fitModeLabel = "_binned%d" % nBins if binned else "_unbinned"
+
+          if mergeIDs:
+               # the abseta splits of the pt_abseta binnings stay in separate modules to keep the memory usage as it is
+               # IDs can only share a module if they are fitted in the same way
+               mergedLabel = "TnP_MuonID__merged_"+NAME+ptAbsetaOutputFileTrail(BINNING)+fitModeLabel
+               if not hasattr(process, mergedLabel):
+                    setattr(process, mergedLabel, process.TnP_MuonID.clone(OutputFileName = cms.string(
+                              outputFileName.replace("_%s_%s" % (ID, NAME), "_merged_%s" % NAME).replace(".root", fitModeLabel + ".root")),
+                                                                         **fitPars))
+                    setattr(process, "run_merged_"+NAME+ptAbsetaOutputFileTrail(BINNING)+fitModeLabel, cms.Path(getattr(process, mergedLabel)))
+               module = getattr(process, mergedLabel)
+               effsBefore = set(module.Efficiencies.parameterNames_())
+          else:
+               module = process.TnP_MuonID.clone(OutputFileName = cms.string(outputFileName), **fitPars)
 
           #DEN = BINNING.clone()
           #setattr(module.Efficiencies, ID+"_"+NAME, cms.PSet(
@@ -641,6 +708,20 @@ for ID in IDS:
                #         UnbinnedVariables = UnbinnedVars,
                #         BinnedVariables = DEN.clone(mcTrue = cms.vstring("true"))
                #     ))
+          if mergeIDs:
+               # efficiencies that do not depend on the ID (e.g. the trigger efficiencies) are only run once and end up
+               # in the output file of the first ID, from where they are copied into the output files of all other IDs
+               mergedSplit = splitOutputs.setdefault(module.OutputFileName.value(),
+                                                     {"directory": module.InputDirectoryName.value(), "efficiencies": {},
+                                                      "copies": {}})
+               newEffs = set(module.Efficiencies.parameterNames_()) - effsBefore
+               shared = sharedEffs.setdefault(module.OutputFileName.value(), set())
+               for eff in sorted(shared - newEffs):
+                    mergedSplit["copies"].setdefault(eff, []).append(outputFileName)
+               shared.update(eff for eff in newEffs if not eff.startswith(ID + "_"))
+               for eff in newEffs:
+                    mergedSplit["efficiencies"][eff] = outputFileName
+               continue
           # comment out the following two lines to not run this efficiency
           # tmadlener, 12.08.2016: It seems that if I have different binnings with the same name, only the last binning will be used
           #            To prevent this I simply add a 'unique' identifier here, in order to have all of them executed
@@ -648,6 +729,12 @@ for ID in IDS:
           setattr(process, "TnP_MuonID__"+ID+"_"+NAME+ptAbsetaOutputFileTrail(BINNING), module)
           setattr(process, "run_"+ID+"_"+NAME+ptAbsetaOutputFileTrail(BINNING), cms.Path(module))
 
+if mergeIDs:
+     import json
+     with open(splitFileName, "w") as splitFile:
+          json.dump(splitOutputs, splitFile, indent=1, sort_keys=True)
+     print "Wrote the information for splitting the merged outputs to " + splitFileName
+
 
 
 
@@ -763,4 +850,50 @@ if triggerEff:
           # setattr(process, "p_TnP_vertexing_"+X, cms.Path(module))
 
 
+########## Efficiency manifest ##########
+# Write a description of every efficiency that is run into a JSON file, so that the tools in PlotEfficiency (e.g.
+# cacheBinnedDatasets.py) can reproduce the selections without having to set up CMSSW
+writeManifest = True
+manifestFileName = "TnP_efficiencies_%s.json" % scenario
+
+def psetToDict(pset):
+     """Convert the passed PSet into a (nested) dictionary of plain python values."""
+     values = {}
+     for name in pset.parameterNames_():
+          par = getattr(pset, name)
+          if isinstance(par, cms.PSet):
+               values[name] = psetToDict(par)
+          else:
+               values[name] = par.value()
+     return values
+
+def moduleToDict(label, module):
+     """Get all the information of a TagProbeFitTreeAnalyzer module that is necessary to redo its selections."""
+     modDict = psetToDict(module)
+     return {"label": label,
+             "input_files": list(modDict["InputFileNames"]),
+             "input_directory": modDict["InputDirectoryName"],
+             "tree": modDict["InputTreeName"],
+             "output_file": modDict["OutputFileName"],
+             "weight": modDict["WeightVariable"],
+             "binned_fit": modDict["binnedFit"],
+             "bins_for_fit": modDict["binsForFit"],
+             "variables": modDict["Variables"],
+             "categories": modDict["Categories"],
+             "expressions": modDict["Expressions"],
+             "cuts": modDict["Cuts"],
+             "pdfs": modDict["PDFs"],
+             "efficiencies": modDict["Efficiencies"],
+             "split": splitOutputs.get(modDict["OutputFileName"], {}).get("efficiencies", {})}
+
+if writeManifest:
+     import json
+     manifest = {"scenario": scenario, "modules": []}
+     for pathName in sorted(process.paths_().keys()):
+          for label in process.paths_()[pathName].moduleNames():
+               manifest["modules"].append(moduleToDict(label, getattr(process, label)))
+     with open(manifestFileName, "w") as manifestFile:
+          json.dump(manifest, manifestFile, indent=1, sort_keys=True)
+     print "Wrote efficiency manifest to " + manifestFileName
+
 print "End of configuration file"